@@ -2,6 +2,8 @@ from typing import Optional
 
 
 class Ability:
+    __slots__ = ('name', 'description', 'number', 'number_2', 'creature_type', 'is_keyword', 'cached_json')
+
     def __init__(self, name: str, description: str, number: Optional[int] = None, 
                  number_2: Optional[int] = None, creature_type: Optional[str] = None,
                  is_keyword: bool = False):
@@ -11,8 +13,12 @@ class Ability:
         self.number_2 = number_2
         self.creature_type = creature_type
         self.is_keyword = is_keyword
+        self.cached_json = self.build_json()
 
     def to_json(self):
+        return self.cached_json
+
+    def build_json(self):
         return {
             "name": self.name,
             "description": self.description,
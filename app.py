@@ -8,31 +8,35 @@ from bot import bot_take_mulligan, find_bot_move, get_bot_deck
 from card import Card
 from card_balance_change_record import CardBalanceChangeRecord
 from card_outcome import CardOutcome
-from card_templates_list import CARD_TEMPLATES, get_random_card_template_of_rarity, get_sample_card_templates_of_rarity, record_card_balance_changes
+from card_template import get_card_template_version
+from card_templates_list import CARD_TEMPLATES, get_random_card_template_of_rarity, get_sample_card_templates_of_rarity, load_card_template_versions, record_card_balance_changes
 from common_decks import create_common_decks
 from database import SessionLocal
 from db_card import DbCard
 from db_deck import DbDeck, add_db_deck, delete_db_deck
 from db_game import DbGame
 from deck import Deck
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_socketio import SocketIO, send, emit, join_room, leave_room
 from flask_cors import CORS
 from draft_choice import DraftChoice
 from draft_pick import DraftPick
 from game import Game
+import json
 import traceback
 from functools import wraps
 import random
 from _thread import start_new_thread
+from game_replay import GameReplay
 from game_state import GameState
 from game_state_record import GameStateRecord
 from lane_rewards import LANE_REWARDS
 from threading import Timer
 
-from redis_utils import rdel, rget_json, rlock, rset_json
+from game_storage import rget_game, rget_game_fields, rget_game_json, rget_game_json_bytes, rset_game, rset_game_fields
+from redis_utils import rdel, rget, rget_bytes, rget_json, rlock, rset_json, rtransaction
 from settings import COMMON_DECK_USERNAME, COYOTE_TIME, EXTRA_TIME_ON_FIRST_TURN, LOCAL, OPEN_GAME_LIFETIME_HOURS
-from utils import generate_unique_id, get_game_lock_redis_key, get_game_redis_key, get_game_with_hidden_information_redis_key, get_staged_game_lock_redis_key, get_staged_game_redis_key, get_staged_moves_redis_key, parse_optional_int
+from utils import generate_unique_id, get_game_animations_redis_key, get_game_lock_redis_key, get_game_with_hidden_information_redis_key, get_staged_game_lock_redis_key, get_staged_game_redis_key, get_staged_moves_redis_key, parse_optional_int
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -45,6 +49,11 @@ handler = RotatingFileHandler('app.log', maxBytes=1_000_000, backupCount=10)
 handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
 logger.addHandler(handler)
 
+# Neither the card pool nor the lane rewards change while the server is up, so the response is encoded once from the templates' cached bytes
+CARD_POOL_JSON_BYTES = (b'{"cards": {' 
+                        + b', '.join(json.dumps(card_name).encode() + b': ' + card_template.to_json_bytes() for card_name, card_template in CARD_TEMPLATES.items()) 
+                        + b'}, "laneRewards": ' + json.dumps(LANE_REWARDS).encode() + b'}')
+
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*")
 CORS(app)
@@ -59,10 +68,9 @@ def bot_move_in_game(game: Game, player_num: int) -> None:
         logger.debug(f'The bot has chosen the following move: {bot_move}')
         game_id = game.id
         with rlock(get_game_lock_redis_key(game_id)):
-            game_json = rget_json(get_game_redis_key(game_id))    
-            if not game_json:
+            game_from_json = rget_game(game_id)
+            if not game_from_json:
                 return
-            game_from_json = Game.from_json(game_json)
 
             # Should be redundant, but I think there's some issue on the first turn where this sometimes isn't true
             game_from_json.is_bot_by_player[player_num] = True 
@@ -89,16 +97,9 @@ def bot_move_in_game(game: Game, player_num: int) -> None:
                         continue
 
                 game_from_json.game_info.roll_turn(sess, game_from_json.id)
-                rdel(get_game_with_hidden_information_redis_key(game.id))
-                rset_json(get_staged_moves_redis_key(game_id, 0), {}, ex=24 * 60 * 60)
-                rset_json(get_staged_moves_redis_key(game_id, 1), {}, ex=24 * 60 * 60)
-                rdel(get_staged_game_redis_key(game_id, 0))
-                rdel(get_staged_game_redis_key(game_id, 1))
-
+                commit_turn(game_from_json, turn_rolled=True)
             else:
-                rset_json(get_staged_moves_redis_key(game_id, player_num), bot_move, ex=24 * 60 * 60)
-
-            rset_json(get_game_redis_key(game_id), game_from_json.to_json(), ex=24 * 60 * 60)
+                commit_turn(game_from_json, staged_moves_by_player={player_num: bot_move})
 
             if have_moved:
                 socketio.emit('update', room=game_id)  # type: ignore
@@ -109,19 +110,36 @@ def bot_move_in_game(game: Game, player_num: int) -> None:
                             start_new_thread(bot_move_in_game, (game, player_num))
 
 
+def commit_turn(game: Game, turn_rolled: bool = False, staged_moves_by_player: Optional[dict[int, dict]] = None) -> None:
+    # A rolled turn also clears the hidden-information snapshot and both players' staged moves and games.
+    # Everything goes out in one transaction, so nobody sees the new turn next to the old turn's staged moves.
+    with rtransaction() as transaction:
+        if turn_rolled:
+            rdel(get_game_with_hidden_information_redis_key(game.id), transaction=transaction)
+            for player_num in [0, 1]:
+                rset_json(get_staged_moves_redis_key(game.id, player_num), {}, ex=24 * 60 * 60, transaction=transaction)
+                rdel(get_staged_game_redis_key(game.id, player_num), transaction=transaction)
+        for player_num, staged_moves in (staged_moves_by_player or {}).items():
+            rset_json(get_staged_moves_redis_key(game.id, player_num), staged_moves, ex=24 * 60 * 60, transaction=transaction)
+        rset_game(game, with_animations=turn_rolled, transaction=transaction)
+
+
 def maybe_schedule_forced_turn_roll(game: Game, extra_time: int = 0) -> None:
-    if game.seconds_per_turn is not None:
-        assert game.game_info
-        Timer(game.seconds_per_turn + extra_time + COYOTE_TIME, load_and_roll_turn_in_game, [game.id, game.game_info.game_state.turn]).start()
+    assert game.game_info
+    maybe_schedule_forced_turn_roll_by_id(game.id, game.seconds_per_turn, game.game_info.game_state.turn, extra_time=extra_time)
+
+
+def maybe_schedule_forced_turn_roll_by_id(game_id: str, seconds_per_turn: Optional[int], turn: int, extra_time: int = 0) -> None:
+    if seconds_per_turn is not None:
+        Timer(seconds_per_turn + extra_time + COYOTE_TIME, load_and_roll_turn_in_game, [game_id, turn]).start()
 
 
 def load_and_roll_turn_in_game(game_id: str, only_if_turn: int) -> None:
     with SessionLocal() as sess:
         with rlock(get_game_lock_redis_key(game_id)):
-            game_json = rget_json(get_game_redis_key(game_id))
-            if not game_json:
+            game = rget_game(game_id)
+            if not game:
                 return
-            game = Game.from_json(game_json)
 
             assert game.game_info
 
@@ -145,13 +163,7 @@ def roll_turn_in_game(sess, game: Game) -> None:
         game.game_info.game_state.has_mulliganed_by_player[player_num_to_make_moves_for] = True
 
     game.game_info.roll_turn(sess, game.id)
-    rdel(get_game_with_hidden_information_redis_key(game.id))
-    rset_json(get_staged_moves_redis_key(game.id, 0), {}, ex=24 * 60 * 60)
-    rset_json(get_staged_moves_redis_key(game.id, 1), {}, ex=24 * 60 * 60)
-    rdel(get_staged_game_redis_key(game.id, 0))
-    rdel(get_staged_game_redis_key(game.id, 1))
-
-    rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+    commit_turn(game, turn_rolled=True)
 
     socketio.emit('update', room=game.id)  # type: ignore
 
@@ -197,7 +209,16 @@ def api_endpoint(func):
 @app.route('/api/card_pool', methods=['GET'])
 @api_endpoint
 def get_card_pool(sess):
-    return recurse_to_json({'cards': CARD_TEMPLATES, 'laneRewards': LANE_REWARDS})
+    return Response(CARD_POOL_JSON_BYTES, mimetype='application/json')
+
+
+@app.route('/api/card_templates', methods=['GET'])
+@api_endpoint
+def get_card_templates(sess):
+    # Games refer to cards by template version; clients look up the ones they haven't seen yet here
+    version_ids = [int(version_id) for version_id in request.args.get('versions', '').split(',') if version_id]
+    card_templates_by_version_id = {version_id: get_card_template_version(version_id) for version_id in version_ids}
+    return recurse_to_json({version_id: card_template for version_id, card_template in card_templates_by_version_id.items() if card_template is not None})
 
 
 @app.route('/api/decks', methods=['POST'])
@@ -371,7 +392,7 @@ def _host_game_inner(sess, deck_id: Optional[str], deck_name: Optional[str], use
         bot_take_mulligan(game.game_info.game_state, 1)
 
         with rlock(get_game_lock_redis_key(game.id)):
-            rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+            rset_game(game, with_animations=True)
 
         start_new_thread(bot_move_in_game, (game, 1))
 
@@ -395,7 +416,7 @@ def _host_game_inner(sess, deck_id: Optional[str], deck_name: Optional[str], use
 
     if not is_bot_game:
         with rlock(get_game_lock_redis_key(game.id)):
-            rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+            rset_game(game)
 
     return game
 
@@ -438,11 +459,9 @@ def host_game(sess):
 
 def _join_game_inner(sess, game_id: str, username: str, deck_id: Optional[str], deck_name: Optional[str]) -> Union[Game, tuple[dict, int]]:
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game = rget_game(game_id)
+        if not game:
             return {"error": "Game not found"}, 404
-        
-        game = Game.from_json(game_json)
 
         if game.usernames_by_player[0] == username:
             return {"error": "You can't join your own game"}, 400
@@ -468,7 +487,7 @@ def _join_game_inner(sess, game_id: str, username: str, deck_id: Optional[str],
 
         maybe_schedule_forced_turn_roll(game, extra_time=EXTRA_TIME_ON_FIRST_TURN)
 
-        rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+        rset_game(game, with_animations=True)
 
         socketio.emit('updateWithoutAnimating', room=game.id)  # type: ignore
 
@@ -551,18 +570,21 @@ def get_available_games(sess):
 def get_game(sess, game_id):
     player_num = int(raw_player_num) if (raw_player_num := request.args.get('playerNum')) is not None else None
 
-    staged_game_json = rget_json(get_staged_game_redis_key(game_id, player_num))
+    # Every client fetches the game on each update, so the stored JSON is sent without being parsed;
+    # json.dumps has already turned the int keys into strings when it was written
+    game_json_bytes = rget_bytes(get_staged_game_redis_key(game_id, player_num)) or rget_game_json_bytes(game_id)
 
-    if staged_game_json:
-        return recurse_to_json(staged_game_json)
-    
-    else:
-        game_json = rget_json(get_game_redis_key(game_id))
+    if not game_json_bytes:
+        return jsonify({"error": "Game not found"}), 404   
 
-        if not game_json:
-            return jsonify({"error": "Game not found"}), 404   
+    return Response(game_json_bytes, mimetype='application/json')
 
-        return recurse_to_json(game_json)
+
+@app.route('/api/games/<game_id>/animations/<int:turn>', methods=['GET'])
+@api_endpoint
+def get_game_animations(sess, game_id, turn: int):
+    # Written once when the turn rolls, so the stored JSON is sent as is
+    return Response(rget(get_game_animations_redis_key(game_id, turn)) or '[]', mimetype='application/json')
 
 
 @app.route('/api/games/<game_id>/take_turn', methods=['POST'])
@@ -584,12 +606,10 @@ def take_turn(sess, game_id):
         return jsonify({"error": "Cards mapping is required"}), 400
     
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game = rget_game(game_id)
+        if not game:
             return jsonify({"error": "Game not found"}), 404
 
-        game = Game.from_json(game_json)
-
         player_num = game.username_to_player_num(username)
         assert player_num is not None
         assert game.game_info is not None
@@ -604,17 +624,11 @@ def take_turn(sess, game_id):
         have_moved = game.game_info.game_state.all_players_have_moved()
         if have_moved:
             game.game_info.roll_turn(sess, game.id)
-            rdel(get_game_with_hidden_information_redis_key(game.id))
-            rset_json(get_staged_moves_redis_key(game_id, 0), {}, ex=24 * 60 * 60)
-            rset_json(get_staged_moves_redis_key(game_id, 1), {}, ex=24 * 60 * 60)
-            rdel(get_staged_game_redis_key(game_id, 0))
-            rdel(get_staged_game_redis_key(game_id, 1))
-
 
         if game.is_bot_by_player[1 - player_num] and not game.game_info.game_state.has_moved_by_player[1 - player_num]:
             start_new_thread(bot_move_in_game, (game, 1 - player_num))
 
-        rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+        commit_turn(game, turn_rolled=have_moved)
     
     if have_moved:
         socketio.emit('update', room=game.id)  # type: ignore
@@ -649,7 +663,7 @@ def play_card(sess, game_id):
     with rlock(get_staged_game_lock_redis_key(game_id, player_num)):
         game_json = rget_json(get_staged_game_redis_key(game_id, player_num))
         if not game_json:
-            game_json = rget_json(get_game_redis_key(game_id))
+            game_json = rget_game_json(game_id)
 
         staged_moves = rget_json(get_staged_moves_redis_key(game_id, player_num)) or {}
 
@@ -682,24 +696,24 @@ def submit_turn(sess, game_id):
         return jsonify({"error": "Player number is required"}), 400
 
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game_fields = rget_game_fields(game_id, ['has_moved_by_player'])
+        if not game_fields:
             return jsonify({"error": "Game not found"}), 404
 
-        game = Game.from_json(game_json)
-
-        assert player_num is not None
-        assert game.game_info is not None
+        has_moved_by_player = game_fields['has_moved_by_player']
+        assert has_moved_by_player is not None
 
-        game.game_info.game_state.has_moved_by_player[player_num] = True
-        have_moved = game.game_info.game_state.all_players_have_moved()
-        if have_moved:
+        has_moved_by_player[player_num] = True
+        if all(has_moved_by_player.values()):
+            game = rget_game(game_id)
+            assert game is not None
+            assert game.game_info is not None
+            game.game_info.game_state.has_moved_by_player[player_num] = True
             roll_turn_in_game(sess, game)
         else:
-            rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+            rset_game_fields(game_id, {'has_moved_by_player': has_moved_by_player})
 
-    return jsonify({"gameId": game.id,
-                    "game": game.to_json()})
+    return jsonify({"gameId": game_id})
 
 
 @app.route('/api/games/<game_id>/unsubmit_turn', methods=['POST'])
@@ -721,22 +735,20 @@ def unsubmit_turn(sess, game_id):
         return jsonify({"error": "Player number is required"}), 400
 
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game_fields = rget_game_fields(game_id, ['usernames_by_player', 'has_moved_by_player'])
+        if not game_fields:
             return jsonify({"error": "Game not found"}), 404
 
-        game = Game.from_json(game_json)
-
-        player_num = game.username_to_player_num(username)
+        player_num = next((player_num for player_num, player_username in game_fields['usernames_by_player'].items() if player_username == username), None)
+        has_moved_by_player = game_fields['has_moved_by_player']
         assert player_num is not None
-        assert game.game_info is not None
+        assert has_moved_by_player is not None
 
-        game.game_info.game_state.has_moved_by_player[player_num] = False
+        has_moved_by_player[player_num] = False
 
-        rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+        rset_game_fields(game_id, {'has_moved_by_player': has_moved_by_player})
 
-    return jsonify({"gameId": game.id,
-                    "game": game.to_json()})
+    return jsonify({"gameId": game_id})
 
 
 @app.route('/api/games/<game_id>/reset_turn', methods=['POST'])
@@ -778,24 +790,17 @@ def mulligan(sess, game_id):
         return jsonify({"error": "Cards mapping is required"}), 400
     
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game = rget_game(game_id)
+        if not game:
             return jsonify({"error": "Game not found"}), 404
 
-        game = Game.from_json(game_json)
-
         player_num = game.username_to_player_num(username)
         assert player_num is not None
         assert game.game_info is not None
 
-        random.shuffle(cards_to_mulligan)
-
-        for card_id in cards_to_mulligan:
-            game.game_info.game_state.mulligan_card(player_num, card_id)
-
-        game.game_info.game_state.has_mulliganed_by_player[player_num] = True
+        game.game_info.game_state.mulligan_cards(player_num, cards_to_mulligan)
 
-        rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+        rset_game(game)
 
     return jsonify({"gameId": game.id,
                     "game": game.to_json()})
@@ -817,12 +822,10 @@ def mulligan_all(sess, game_id):
     mulliganing = data.get('mulliganing')
 
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game = rget_game(game_id)
+        if not game:
             return jsonify({"error": "Game not found"}), 404
 
-        game = Game.from_json(game_json)
-
         player_num = game.username_to_player_num(username)
         assert player_num is not None
         assert game.game_info is not None
@@ -832,7 +835,7 @@ def mulligan_all(sess, game_id):
 
         game.game_info.game_state.has_mulliganed_by_player[player_num] = True
 
-        rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+        rset_game(game)
     
     return jsonify({"gameId": game.id,
                     "game": game.to_json()})
@@ -852,26 +855,27 @@ def be_done_with_animations(sess, game_id):
         return jsonify({"error": "Player number is required"}), 400
 
     with rlock(get_game_lock_redis_key(game_id)):
-        game_json = rget_json(get_game_redis_key(game_id))
-        if not game_json:
+        game_fields = rget_game_fields(game_id, ['done_with_animations_by_player', 'is_bot_by_player', 'seconds_per_turn', 'turn'])
+        if not game_fields:
             return jsonify({"error": "Game not found"}), 404
 
-        game = Game.from_json(game_json)
-
-        assert game.game_info is not None
+        done_with_animations_by_player = game_fields['done_with_animations_by_player']
+        assert done_with_animations_by_player is not None
 
-        if not game.game_info.game_state.done_with_animations_by_player[player_num]:
-            game.game_info.game_state.done_with_animations_by_player[player_num] = True
+        if not done_with_animations_by_player[player_num]:
+            done_with_animations_by_player[player_num] = True
+            fields_to_update = {'done_with_animations_by_player': done_with_animations_by_player}
 
-            if game.all_players_are_done_with_animations() and game.game_info.game_state.turn <= 8:
-                game.game_info.game_state.last_timer_start = datetime.now().timestamp()
-                maybe_schedule_forced_turn_roll(game)
+            all_players_are_done_with_animations = all([done_with_animations_by_player[player_num] or game_fields['is_bot_by_player'][player_num] for player_num in [0, 1]])
+            if all_players_are_done_with_animations and game_fields['turn'] <= 8:
+                fields_to_update['last_timer_start'] = datetime.now().timestamp()
+                maybe_schedule_forced_turn_roll_by_id(game_id, game_fields['seconds_per_turn'], game_fields['turn'])
 
-            rset_json(get_game_redis_key(game.id), game.to_json(), ex=24 * 60 * 60)
+            rset_game_fields(game_id, fields_to_update)
 
             socketio.emit('updateWithoutAnimating', room=game_id)  # type: ignore
 
-    return jsonify({"gameId": game.id,})
+    return jsonify({"gameId": game_id,})
 
 
 @app.route('/api/draft_pick', methods=['GET'])
@@ -963,7 +967,7 @@ def get_draft_pick_and_store_info(sess):
 @app.route('/api/games/<game_id>/rematch', methods=['POST'])
 @api_endpoint
 def rematch(sess, game_id):
-    game = rget_json(get_game_redis_key(game_id))
+    game = rget_game_json(game_id)
     if not game:
         return jsonify({"error": "Game not found"}), 404
     
@@ -1072,7 +1076,16 @@ def get_old_game_state(sess, game_state_record_id: int):
     if not game_state_record:
         return jsonify({"error": "Game state record not found"}), 404
 
-    return recurse_to_json(GameState.from_json(game_state_record.game_state).to_json())
+    # Older records carry a full snapshot; newer ones are rebuilt from the game's replay
+    if game_state_record.game_state is not None:
+        return recurse_to_json(GameState.from_json(game_state_record.game_state).to_json())
+
+    game_replay = sess.query(GameReplay).get(game_state_record.game_id)
+
+    if not game_replay:
+        return jsonify({"error": "Game replay not found"}), 404
+
+    return recurse_to_json(GameState.from_replay(game_replay.replay, game_state_record.turn).to_json())
 
 
 @socketio.on('connect')
@@ -1095,6 +1108,7 @@ def on_leave(data):
 
 if __name__ == '__main__':
     create_common_decks()
+    load_card_template_versions()
     record_card_balance_changes()
 
     if LOCAL:
@@ -0,0 +1,111 @@
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Optional
+
+from bot import NUM_RANDOM_GAMES, NUM_VECTORIZED_RANDOM_GAMES, RANDOM_CARDS_TO_PLAY, assess_intermediate_position, randomly_play_forward_game_state_with_mana_amounts
+from card import Card
+from card_templates_list import CARD_TEMPLATES
+from character import Character
+from deck import Deck
+from game_state import GameState
+from lane_rewards import LANE_REWARDS
+from vectorized_rollouts import VECTORIZED_LANE_EFFECTS, VECTORIZED_THRESHOLD_EFFECTS, can_roll_out_vectorized
+
+
+def make_sample_game_state(seed: int = 0, turns: int = 5, card_pool: Optional[list[str]] = None, lane_reward_pool: Optional[list[str]] = None) -> GameState:
+    random.seed(seed)
+    if card_pool is None:
+        card_pool = [card_name for card_name, card_template in CARD_TEMPLATES.items() if not card_template.not_in_card_pool]
+    decks_by_player = {player_num: Deck(random.choices(card_pool, k=18), f'player_{player_num}', 'Benchmark deck') for player_num in [0, 1]}
+    lane_reward_names = sorted(random.sample(lane_reward_pool or list(LANE_REWARDS), 3), key=lambda lane_reward_name: LANE_REWARDS[lane_reward_name]['priority'])
+
+    game_state = GameState({0: 'player_0', 1: 'player_1'}, decks_by_player, lane_reward_names, seed=seed)
+    game_state.do_start_of_game([])
+
+    while game_state.turn <= turns:
+        for player_num in [0, 1]:
+            mana = game_state.mana_by_player[player_num]
+            for card in game_state.hands_by_player[player_num][:]:
+                if card.template.cost <= mana and game_state.play_card(player_num, card.id, random.randint(0, 2)) is not None:
+                    mana -= card.template.cost
+        game_state.roll_turn([])
+
+    return game_state
+
+
+def time_per_call(func: Callable, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations
+
+
+def benchmark_clone(iterations: int = 500) -> None:
+    game_state = make_sample_game_state()
+    copy_time = time_per_call(game_state.copy, iterations)
+    clone_time = time_per_call(game_state.clone, iterations)
+    print(f'GameState.copy():  {copy_time * 1e6:10.1f} us per call')
+    print(f'GameState.clone(): {clone_time * 1e6:10.1f} us per call')
+    print(f'Speedup:           {copy_time / clone_time:10.1f}x')
+
+
+def benchmark_roll_turn(iterations: int = 300) -> None:
+    game_state = make_sample_game_state()
+    for headless in [False, True]:
+        game_states = [game_state.clone() for _ in range(iterations)]
+        for game_state_to_roll in game_states:
+            game_state_to_roll.headless = headless
+        game_states_to_roll = iter(game_states)
+        roll_turn_time = time_per_call(lambda: next(game_states_to_roll).roll_turn([]), iterations)
+        print(f'GameState.roll_turn() ({"headless" if headless else "with animations"}): {roll_turn_time * 1e6:10.1f} us per call')
+
+
+def bytes_allocated_per_call(func: Callable, iterations: int) -> float:
+    tracemalloc.start()
+    results = [func() for _ in range(iterations)]
+    allocated_bytes, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del results
+    return allocated_bytes / iterations
+
+
+def benchmark_memory(iterations: int = 5000) -> None:
+    game_state = make_sample_game_state()
+    card_template = CARD_TEMPLATES['Korra']
+    lane = game_state.lanes[0]
+    character_time = time_per_call(lambda: Character(card_template, lane, 0, 'player_0'), iterations)
+    card_time = time_per_call(lambda: Card(card_template), iterations)
+    print(f'Character(): {1 / character_time:12.0f} objects per second, {bytes_allocated_per_call(lambda: Character(card_template, lane, 0, "player_0"), iterations):8.0f} bytes each')
+    print(f'Card():      {1 / card_time:12.0f} objects per second, {bytes_allocated_per_call(lambda: Card(card_template), iterations):8.0f} bytes each')
+    print(f'GameState.clone(): {bytes_allocated_per_call(game_state.clone, iterations // 50):8.0f} bytes per GameState')
+
+
+def benchmark_rollouts(iterations: int = 20) -> None:
+    generic_card_names = sorted({card_name for card_names in RANDOM_CARDS_TO_PLAY.values() for card_name in card_names})
+    vectorized_lane_reward_names = [lane_reward_name for lane_reward_name, lane_reward in LANE_REWARDS.items()
+                                    if lane_reward['effect'][0] in VECTORIZED_LANE_EFFECTS or lane_reward['effect'][0] in VECTORIZED_THRESHOLD_EFFECTS]
+    game_state = make_sample_game_state(turns=3, card_pool=generic_card_names, lane_reward_pool=vectorized_lane_reward_names)
+    assert can_roll_out_vectorized(game_state)
+    mana_amounts_by_player = game_state.mana_by_player.copy()
+
+    rollout_time = time_per_call(lambda: randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player, game_state, random.getrandbits(63)), iterations * NUM_RANDOM_GAMES)
+    assessment_time = time_per_call(lambda: assess_intermediate_position(0, mana_amounts_by_player, game_state), iterations)
+    print(f'{NUM_RANDOM_GAMES} object-engine rollouts:   {rollout_time * NUM_RANDOM_GAMES * 1e3:10.2f} ms')
+    print(f'{NUM_VECTORIZED_RANDOM_GAMES} vectorized rollouts:    {assessment_time * 1e3:10.2f} ms')
+    print(f'Rollouts per second:        {1 / rollout_time:10.0f} object-engine, {NUM_VECTORIZED_RANDOM_GAMES / assessment_time:10.0f} vectorized')
+
+
+BENCHMARKS = {
+    'clone': benchmark_clone,
+    'roll_turn': benchmark_roll_turn,
+    'memory': benchmark_memory,
+    'rollouts': benchmark_rollouts,
+}
+
+
+if __name__ == '__main__':
+    for benchmark_name in sys.argv[1:] or BENCHMARKS:
+        print(f'== {benchmark_name} ==')
+        BENCHMARKS[benchmark_name]()
@@ -1,7 +1,12 @@
 from datetime import datetime, timedelta
 import random
+import time
 import traceback
+from concurrent.futures import wait
 from typing import Optional
+import numpy as np
+from bot_pool import RESULT_GRACE_SECONDS, BotPool
+from card import Card
 from card_templates_list import CARD_TEMPLATES
 from common_decks import BOT_DRAFT_DECKS, COMMON_DECKS
 from db_deck import DbDeck
@@ -9,13 +14,24 @@ from deck import Deck
 from game import Game
 from game_state import GameState
 from redis_utils import rdel, rget_json, rlock, rset_json
-from settings import BOT_DECK_USERNAME, COMMON_DECK_USERNAME
-from utils import get_game_lock_redis_key, get_game_redis_key, get_game_with_hidden_information_redis_key, run_with_timeout, sigmoid
+from settings import BOT_DECK_USERNAME, BOT_WORKER_PROCESSES, COMMON_DECK_USERNAME
+from utils import LruCache, get_game_lock_redis_key, get_game_redis_key, get_game_with_hidden_information_redis_key, sigmoid
+from vectorized_rollouts import VectorizedRollouts, can_roll_out_vectorized
 from sqlalchemy import func, not_
 import logging
 
 logger = logging.getLogger(__name__)
 
+BOT_POOL = BotPool(BOT_WORKER_PROCESSES)
+BOT_POOL_JOB_TIMEOUT_SECONDS = 60
+
+POSITION_ASSESSMENT_CACHE_SIZE = 20000
+POSITION_ASSESSMENT_CACHE = LruCache(POSITION_ASSESSMENT_CACHE_SIZE)
+
+NUM_RANDOM_GAMES = 7
+NUM_VECTORIZED_RANDOM_GAMES = 256
+CHARACTERISTIC_TOWER_HEALTH_AMOUNT = 20
+
 
 RANDOM_CARDS_TO_PLAY = {
     1: ['generic_1drop'],
@@ -64,8 +80,10 @@ def get_random_play(mana_amount: int) -> list[str]:
         return RANDOM_CARDS_TO_PLAY[mana_amount]
     
 
-def randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player: dict[int, int], game_state: GameState) -> GameState:
-    game_state = game_state.copy()
+def randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player: dict[int, int], game_state: GameState, seed: int) -> GameState:
+    game_state = game_state.clone()
+    game_state.headless = True
+    game_state.reseed(seed)
     mana_amounts_by_player_copy = mana_amounts_by_player.copy()
     game_state.mana_by_player = mana_amounts_by_player_copy
 
@@ -81,27 +99,54 @@ def randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player: d
     return game_state
 
 
-def assess_final_position(player_num: int, game_state: GameState) -> float:
-    CHARACTERISTIC_TOWER_HEALTH_AMOUNT = 20
-    probability_of_winning_each_lane = [sigmoid((lane.damage_by_player[0] - lane.damage_by_player[1]) / CHARACTERISTIC_TOWER_HEALTH_AMOUNT) for lane in game_state.lanes]
-    probability_of_winning_game = (
+def probability_of_winning_game(probability_of_winning_each_lane):
+    # Works on plain floats as well as on arrays of per-rollout probabilities
+    return (
         probability_of_winning_each_lane[0] * probability_of_winning_each_lane[1] * (1 - probability_of_winning_each_lane[2]) +
         probability_of_winning_each_lane[0] * (1 - probability_of_winning_each_lane[1]) * probability_of_winning_each_lane[2] +
         (1 - probability_of_winning_each_lane[0]) * probability_of_winning_each_lane[1] * probability_of_winning_each_lane[2] +
         probability_of_winning_each_lane[0] * probability_of_winning_each_lane[1] * probability_of_winning_each_lane[2]
     )
 
+
+def assess_final_position(player_num: int, game_state: GameState) -> float:
+    probability_of_winning_each_lane = [sigmoid((lane.damage_by_player[0] - lane.damage_by_player[1]) / CHARACTERISTIC_TOWER_HEALTH_AMOUNT) for lane in game_state.lanes]
+    probability_of_winning = probability_of_winning_game(probability_of_winning_each_lane)
+
     if player_num == 0:
-        return probability_of_winning_game
+        return probability_of_winning
     else:
-        return 1 - probability_of_winning_game
+        return 1 - probability_of_winning
+
+
+def assess_final_positions_vectorized(player_num: int, rollouts: VectorizedRollouts) -> np.ndarray:
+    damage_differences = rollouts.damage_by_player[:, :, 0] - rollouts.damage_by_player[:, :, 1]
+    probability_of_winning_each_lane = 1 / (1 + np.exp(-damage_differences / CHARACTERISTIC_TOWER_HEALTH_AMOUNT))
+    probability_of_winning = probability_of_winning_game(probability_of_winning_each_lane.T)
+
+    if player_num == 0:
+        return probability_of_winning
+    else:
+        return 1 - probability_of_winning
+
 
+def assess_intermediate_position(player_num: int, mana_amounts_by_player: dict[int, int], game_state: GameState, deadline: Optional[float] = None) -> Optional[float]:
+    # Rollout seeds come from a copy of the position's own generator, so an assessment doesn't depend on which process ran it
+    seed_rng = random.Random()
+    seed_rng.setstate(game_state.rng.getstate())
+
+    if can_roll_out_vectorized(game_state):
+        rollouts = VectorizedRollouts(game_state, mana_amounts_by_player, NUM_VECTORIZED_RANDOM_GAMES, seed_rng.getrandbits(63))
+        rollouts.play_forward(get_random_play)
+        # Scaled to the same range as the sum over NUM_RANDOM_GAMES rollouts below
+        return float(assess_final_positions_vectorized(player_num, rollouts).mean()) * NUM_RANDOM_GAMES
 
-def assess_intermediate_position(player_num: int, mana_amounts_by_player: dict[int, int], game_state: GameState) -> float:
-    NUM_RANDOM_GAMES = 7
     total_probability = 0.0
     for _ in range(NUM_RANDOM_GAMES):
-        total_probability += assess_final_position(player_num, randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player, game_state))
+        # Past the deadline nobody is waiting for the answer, so stop rather than keep a bot worker busy
+        if deadline is not None and time.time() >= deadline:
+            return None
+        total_probability += assess_final_position(player_num, randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player, game_state, seed_rng.getrandbits(63)))
     return total_probability
 
 
@@ -118,14 +163,15 @@ def find_bot_move(bot_username: str, player_num: int, game: Game) -> dict[str, i
     
     elif bot_username == 'RUFUS_THE_ROBOT':
         try:
-            rufus_move = run_with_timeout(find_bot_move_rufus, time_to_think, player_num, game.game_info.game_state)
+            logger.debug(f'Submitting Rufus move for game {game.id}; {BOT_POOL.queue_depth()} bot jobs already queued')
+            rufus_move = find_bot_move_rufus(player_num, game.game_info.game_state, deadline=time.time() + time_to_think, bot_pool=BOT_POOL)
         except Exception as e:
             logger.error(f'Error in find_bot_move_rufus in game {game.id} on turn {game.game_info.game_state.turn}: {e}')
             logger.error(traceback.print_exc())
             rufus_move = None
         else:
             if rufus_move is None:
-                logger.warning(f'Rufus timed out in game {game.id} on turn {game.game_info.game_state.turn}')
+                logger.warning(f'Rufus timed out in game {game.id} on turn {game.game_info.game_state.turn} with {BOT_POOL.queue_depth()} bot jobs queued')
             else:
                 logger.info(f'Rufus played turn {game.game_info.game_state.turn} of game {game.id} without issues: {rufus_move}')
 
@@ -165,43 +211,104 @@ def find_bot_move_randy(player_num: int, game_state: GameState) -> dict[str, int
     return best_move_spending_x_mana[game_state.mana_by_player[player_num]][2]
 
 
-def find_bot_move_rufus(player_num: int, game_state: GameState) -> dict[str, int]:
+def evaluate_intermediate_positions(player_num: int, mana_amounts_by_player: dict[int, int], game_states: list[GameState],
+                                    deadline: Optional[float] = None, bot_pool: Optional[BotPool] = None) -> list[Optional[float]]:
+    # Assessments that didn't finish before the deadline come back as None
+    if bot_pool is None:
+        return [assess_intermediate_position(player_num, mana_amounts_by_player, game_state, deadline)
+                if deadline is None or time.time() < deadline else None
+                for game_state in game_states]
+
+    pool_deadline = deadline if deadline is not None else time.time() + BOT_POOL_JOB_TIMEOUT_SECONDS
+    futures = [bot_pool.submit(assess_intermediate_position, pool_deadline, player_num, mana_amounts_by_player, game_state, pool_deadline) for game_state in game_states]
+    wait(futures, timeout=max(0, pool_deadline + RESULT_GRACE_SECONDS - time.time()))
+
+    assessments = []
+    for future in futures:
+        if future.done() and not future.cancelled() and future.exception() is None:
+            assessments.append(future.result())
+        else:
+            future.cancel()
+            assessments.append(None)
+    return assessments
+
+
+def assess_intermediate_positions(player_num: int, mana_amounts_by_player: dict[int, int], game_states: list[GameState],
+                                  deadline: Optional[float] = None, bot_pool: Optional[BotPool] = None) -> list[Optional[float]]:
+    # Different move orders often reach the same position, so each distinct position is only rolled out once
+    cache_keys = [(player_num, tuple(mana_amounts_by_player[p] for p in [0, 1]), game_state.canonical_key()) for game_state in game_states]
+    assessments_by_cache_key: dict[tuple, Optional[float]] = {cache_key: POSITION_ASSESSMENT_CACHE.get(cache_key) for cache_key in cache_keys}
+
+    game_states_to_evaluate_by_cache_key: dict[tuple, GameState] = {}
+    for cache_key, game_state in zip(cache_keys, game_states):
+        if assessments_by_cache_key[cache_key] is None:
+            game_states_to_evaluate_by_cache_key.setdefault(cache_key, game_state)
+
+    if game_states_to_evaluate_by_cache_key:
+        evaluations = evaluate_intermediate_positions(player_num, mana_amounts_by_player, list(game_states_to_evaluate_by_cache_key.values()), deadline, bot_pool)
+        for cache_key, evaluation in zip(game_states_to_evaluate_by_cache_key, evaluations):
+            assessments_by_cache_key[cache_key] = evaluation
+            if evaluation is not None:
+                POSITION_ASSESSMENT_CACHE.set(cache_key, evaluation)
+
+    return [assessments_by_cache_key[cache_key] for cache_key in cache_keys]
+
+
+def find_bot_move_rufus(player_num: int, game_state: GameState, deadline: Optional[float] = None, bot_pool: Optional[BotPool] = None) -> Optional[dict[str, int]]:
     cards_in_hand = game_state.hands_by_player[player_num][:5]
 
     logger.debug(f'My cards: {[card.to_json() for card in cards_in_hand]}')
     # Stores dict of mana spent to a tuple of (best game state, card id to lane number)
-    best_game_state_spending_x_mana = {0: (game_state.copy(), {})}
+    search_game_state = game_state.clone()
+    search_game_state.headless = True
+    best_game_state_spending_x_mana = {0: (search_game_state, {})}
+    # The search is anytime: once the deadline passes we return the best move found so far,
+    # or None if we never finished assessing even the cheapest options
+    best_move_so_far: Optional[dict[str, int]] = None
     for x in range(1, game_state.mana_by_player[player_num] + 1):
         logger.debug(f'Trying to find the best move in the position that spends {x} mana.')
         mana_amounts_by_player = game_state.mana_by_player.copy()
         mana_amounts_by_player[player_num] -= x
-        best_probability_so_far = assess_intermediate_position(player_num, mana_amounts_by_player, game_state)
-        logger.debug(f'My assessment of the base position: {best_probability_so_far}')
         best_game_state_spending_x_mana[x] = (best_game_state_spending_x_mana[x-1][0], best_game_state_spending_x_mana[x-1][1].copy())
+
+        # Every candidate at this mana level builds on cheaper levels only, so they can all be assessed at once
+        candidates: list[tuple[Card, int, GameState, dict[str, int]]] = []
         for card in cards_in_hand:
             if card.template.cost <= x:
-                logger.debug(f'Considering playing card {card.template.name}, {card.to_json()}')
-                best_game_state_playing_that_card = best_game_state_spending_x_mana[x - card.template.cost][0].copy()
+                best_game_state_playing_that_card = best_game_state_spending_x_mana[x - card.template.cost][0]
                 cards_played = best_game_state_spending_x_mana[x - card.template.cost][1]
-                logger.debug(f'Here are the cards in my hand in this scenario: {[card.to_json() for card in best_game_state_playing_that_card.hands_by_player[player_num]]}')
                 if card.id in [c.id for c in best_game_state_playing_that_card.hands_by_player[player_num]]:
                     for lane_number in [0, 1, 2]:
                         if len(best_game_state_playing_that_card.lanes[lane_number].characters_by_player[player_num]) < 4:
-                            best_game_state_playing_that_card_copy = best_game_state_playing_that_card.copy()
+                            best_game_state_playing_that_card_copy = best_game_state_playing_that_card.clone()
                             best_game_state_playing_that_card_copy.play_card(player_num, card.id, lane_number)
-                            logger.debug(f'Trying to play card: {card.to_json()} in lane: {lane_number}')
-                            probability_of_winning = assess_intermediate_position(player_num, mana_amounts_by_player, best_game_state_playing_that_card_copy)
-                            logger.debug(f'My assessment of the resulting position: {probability_of_winning}')
+                            candidates.append((card, lane_number, best_game_state_playing_that_card_copy, cards_played))
+
+        base_probability, *candidate_probabilities = assess_intermediate_positions(
+            player_num, mana_amounts_by_player, [game_state, *[candidate[2] for candidate in candidates]], deadline, bot_pool)
+
+        if base_probability is None:
+            logger.debug(f'Ran out of time to think while spending {x} mana; going with {best_move_so_far}')
+            return best_move_so_far
+
+        logger.debug(f'My assessment of the base position: {base_probability}')
+        best_probability_so_far = base_probability
+        for (card, lane_number, best_game_state_playing_that_card_copy, cards_played), probability_of_winning in zip(candidates, candidate_probabilities):
+            logger.debug(f'My assessment of playing {card.template.name} in lane {lane_number}: {probability_of_winning}')
+            if probability_of_winning is not None and probability_of_winning > best_probability_so_far:
+                new_cards_played = cards_played.copy()
+                new_cards_played[card.id] = lane_number
+                best_game_state_spending_x_mana[x] = (best_game_state_playing_that_card_copy, new_cards_played)
+                best_probability_so_far = probability_of_winning
 
-                            if probability_of_winning > best_probability_so_far:
-                                new_cards_played = cards_played.copy()
-                                new_cards_played[card.id] = lane_number
-                                best_game_state_spending_x_mana[x] = (best_game_state_playing_that_card_copy, new_cards_played)
-                                best_probability_so_far = probability_of_winning
+        best_move_so_far = best_game_state_spending_x_mana[x][1]
+        logger.debug(f'I think the best move that spends {x} mana is: {best_move_so_far}')
 
-        logger.debug(f'I think the best move that spends {x} mana is: {best_game_state_spending_x_mana[x][1]}')
+        if None in candidate_probabilities:
+            logger.debug(f'Ran out of time to think while spending {x} mana; going with {best_move_so_far}')
+            return best_move_so_far
 
-    return best_game_state_spending_x_mana[game_state.mana_by_player[player_num]][1]
+    return best_move_so_far if best_move_so_far is not None else {}
 
 
 def bot_take_mulligan(game_state: GameState, player_num: int) -> None:
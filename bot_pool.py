@@ -0,0 +1,73 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from card_template import CARD_TEMPLATES_BY_VERSION_ID
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Extra time we wait past a job's deadline for its answer to make it back from the worker
+RESULT_GRACE_SECONDS = 0.5
+
+
+def initialize_bot_worker(card_templates_by_version_id: dict):
+    # Build the card templates (and the rest of the engine) once per worker rather than once per move
+    import bot  # noqa: F401
+    import card_templates_list  # noqa: F401
+    # Workers may not have forked from the server (e.g. under spawn), so they get its template versions
+    # here instead of loading them from the database themselves
+    CARD_TEMPLATES_BY_VERSION_ID.update(card_templates_by_version_id)
+
+
+def run_bot_job(func: Callable, deadline: float, args: tuple, kwargs: dict) -> Any:
+    # The job may have sat in the queue past its deadline, in which case nobody is waiting for it anymore
+    if time.time() >= deadline:
+        return None
+    return func(*args, **kwargs)
+
+
+class BotPool:
+    def __init__(self, num_workers: int):
+        self.num_workers = num_workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.lock = threading.Lock()
+        self.num_queued_jobs = 0
+
+    def get_executor(self) -> ProcessPoolExecutor:
+        with self.lock:
+            if self.executor is None:
+                self.executor = ProcessPoolExecutor(max_workers=self.num_workers, initializer=initialize_bot_worker,
+                                                    initargs=(dict(CARD_TEMPLATES_BY_VERSION_ID),))
+            return self.executor
+
+    def reset_executor(self, broken_executor: ProcessPoolExecutor) -> None:
+        with self.lock:
+            if self.executor is broken_executor:
+                self.executor = None
+        broken_executor.shutdown(wait=False, cancel_futures=True)
+
+    def on_job_done(self, future: Future) -> None:
+        with self.lock:
+            self.num_queued_jobs -= 1
+
+    def submit(self, func: Callable, deadline: float, *args, **kwargs) -> Future:
+        executor = self.get_executor()
+        try:
+            future = executor.submit(run_bot_job, func, deadline, args, kwargs)
+        except BrokenProcessPool:
+            logger.warning('Bot worker pool was broken; starting a new one')
+            self.reset_executor(executor)
+            future = self.get_executor().submit(run_bot_job, func, deadline, args, kwargs)
+
+        with self.lock:
+            self.num_queued_jobs += 1
+        future.add_done_callback(self.on_job_done)
+        return future
+
+    def queue_depth(self) -> int:
+        with self.lock:
+            return self.num_queued_jobs
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 from character import Character
 
 from utils import generate_unique_id
@@ -6,9 +6,11 @@ from card_template import CardTemplate
 
 
 class Card:
-    def __init__(self, template: 'CardTemplate'):
+    __slots__ = ('template', 'id', 'attack', 'health')
+
+    def __init__(self, template: 'CardTemplate', id: Optional[str] = None):
         self.template = template
-        self.id = generate_unique_id()
+        self.id = id if id is not None else generate_unique_id()
         self.attack = template.attack
         self.health = template.health
 
@@ -22,22 +24,29 @@ class Card:
     def to_json(self):
         return {
             "id": self.id,
-            "template": self.template.to_json(),
+            "template": self.template.to_ref_json(),
             "attack": self.attack,
             "health": self.health,
         }
     
+    def clone(self) -> 'Card':
+        card = Card.__new__(Card)
+        card.template = self.template
+        card.id = self.id
+        card.attack = self.attack
+        card.health = self.health
+        return card
+    
     @staticmethod
     def from_json(json):
-        card = Card(CardTemplate.from_json(json['template']))
-        card.id = json['id']
+        card = Card(CardTemplate.from_json(json['template']), json['id'])
         card.attack = json['attack']
         card.health = json['health']
         return card
 
     @staticmethod
-    def from_template(template: 'CardTemplate'):
-        return Card(template)
+    def from_template(template: 'CardTemplate', id: Optional[str] = None):
+        return Card(template, id)
 
 
     def __repr__(self):
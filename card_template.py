@@ -1,21 +1,114 @@
-from typing import Callable, Union
+import json
+from typing import Callable, Optional, Union
 from abilities_list import ABILITIES
+from ability import Ability
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# The order each on-reveal phase checks its abilities in; the handlers are in character.ON_REVEAL_HANDLERS
+ON_REVEAL_ABILITY_NAMES_BY_PHASE = {
+    'early': [
+        'OnRevealSilenceLastEnemy',
+        'OnRevealSilenceAllCharacters',
+    ],
+    'regular': [
+        'OnRevealShackle',
+        'OnRevealShackleSeveral',
+        'OnRevealShackleAllEnemies',
+        'OnRevealPumpFriends',
+        'OnRevealPumpAttackers',
+        'OnRevealGainMana',
+        'HealFriendlyCharacterAndTower',
+        'OnRevealHealAllFriendliesAndTowers',
+        'OnRevealLaneFightsFirst',
+        'OnRevealFriendliesSwitchLanes',
+        'OnRevealDrawCards',
+        'OnRevealDamageSelf',
+    ],
+    'regular_after_earth_triggers': [
+        'OnRevealPumpFriendlyCharactersOfElement',
+        'OnRevealFillEnemyLaneWithCabbages',
+        'OnRevealSummonDesna',
+        'OnRevealHealAndPumpSelf',
+        'OnRevealDiscard',
+        'OnRevealDiscardHandAndPump',
+        'OnRevealShieldFriendlies',
+        'OnRevealPumpCardsInHand',
+        'OnRevealPumpFriendliesIfFullMatchingLane',
+    ],
+    'late': [
+        'OnRevealDiscardRandomCardAndDealDamageEqualToCost',
+        'OnRevealDamageToAll',
+        'OnRevealBonusAttack',
+        'OnRevealFriendliesMakeBonusAttack',
+        'OnRevealAllAttackersMakeBonusAttack',
+        'OnRevealStealEnemy',
+        'OnRevealEnemiesFight',
+        'OnRevealEnemiesSwitchLanes',
+    ],
+}
+
+
+AbilitySpec = Union[str, tuple[str, int], tuple[str, int, int], tuple[str, int, int, str]]
+
+# Abilities and templates are never modified once built, so identical ones are shared rather than rebuilt
+INTERNED_ABILITIES: dict[AbilitySpec, Ability] = {}
+INTERNED_CARD_TEMPLATES: dict[tuple, 'CardTemplate'] = {}
+
+# Keyed by card_balance_change_records id; a template with a version is serialized as a reference to it
+CARD_TEMPLATES_BY_VERSION_ID: dict[int, 'CardTemplate'] = {}
+
+
+def get_ability(ability: AbilitySpec) -> Ability:
+    interned_ability = INTERNED_ABILITIES.get(ability)
+    if interned_ability is None:
+        if isinstance(ability, tuple):
+            interned_ability = ABILITIES[ability[0]](*ability[1:])  # type: ignore
+        else:
+            interned_ability = ABILITIES[ability]
+        INTERNED_ABILITIES[ability] = interned_ability  # type: ignore
+    return interned_ability  # type: ignore
+
+
+def card_template_json_key(json: dict) -> tuple:
+    # Everything that distinguishes one version of a card from another; descriptions follow from the ability numbers
+    return (json["name"], json["cost"], json["attack"], json["health"], tuple(json["creatureTypes"]), json["rarity"], json.get("notInCardPool", False),
+            tuple((ability["name"], ability.get("number"), ability.get("number_2"), ability.get("creature_type")) for ability in json["abilities"]))
+
+
+def intern_card_template(card_template: 'CardTemplate') -> 'CardTemplate':
+    return INTERNED_CARD_TEMPLATES.setdefault(card_template_json_key(card_template.to_json()), card_template)
+
+
+def register_card_template_version(card_template: 'CardTemplate', version_id: int) -> None:
+    card_template.set_version_id(version_id)
+    CARD_TEMPLATES_BY_VERSION_ID[version_id] = card_template
+
+
+def get_card_template_version(version_id: int) -> Optional['CardTemplate']:
+    # Only looks in the registry, so deserializing a game never touches the database (which bot workers can't reach);
+    # card_templates_list.load_card_template_versions fills it at startup
+    return CARD_TEMPLATES_BY_VERSION_ID.get(version_id)
 
 
 class CardTemplate:
-    def __init__(self, name: str, abilities: list[Union[str, tuple[str, int], tuple[str, int, int], tuple[str, int, int, str]]], cost: int, attack: int, health: int, creature_types: list[str], rarity: str, not_in_card_pool: bool = False):
+    __slots__ = ('name', 'abilities', 'abilities_by_name', 'on_reveal_ability_names_by_phase', 'cost', 'attack', 'health', 'creature_types', 'not_in_card_pool', 'rarity',
+                 'version_id', 'cached_json', 'cached_json_bytes', 'cached_ref_json', 'frozen')
+
+    def __init__(self, name: str, abilities: list[AbilitySpec], cost: int, attack: int, health: int, creature_types: list[str], rarity: str, not_in_card_pool: bool = False):
         self.name = name
-        self.abilities = []
-        for ability in abilities:
-            if isinstance(ability, tuple):
-                if len(ability) == 2:
-                    self.abilities.append(ABILITIES[ability[0]](ability[1]))  # type: ignore
-                elif len(ability) == 3:
-                    self.abilities.append(ABILITIES[ability[0]](ability[1], ability[2]))  # type: ignore
-                elif len(ability) == 4:
-                    self.abilities.append(ABILITIES[ability[0]](ability[1], ability[2], ability[3]))  # type: ignore
-            else:
-                self.abilities.append(ABILITIES[ability])
+        self.abilities = [get_ability(ability) for ability in abilities]
+
+        # Built once and never modified, so ability checks during combat are a dict lookup; the first ability with a given name wins
+        self.abilities_by_name: dict[str, Ability] = {}
+        for ability in self.abilities:
+            self.abilities_by_name.setdefault(ability.name, ability)
+
+        self.on_reveal_ability_names_by_phase = {phase: [ability_name for ability_name in ability_names if ability_name in self.abilities_by_name]
+                                                 for phase, ability_names in ON_REVEAL_ABILITY_NAMES_BY_PHASE.items()}
 
         self.cost = cost
         self.attack = attack
@@ -23,8 +116,30 @@ class CardTemplate:
         self.creature_types = creature_types
         self.not_in_card_pool = not_in_card_pool
         self.rarity = rarity
+        self.version_id: Optional[int] = None
 
-    def to_json(self):
+        # Templates are shared by every game, so they're frozen once built and only ever serialized once
+        self.cached_json = self.build_json()
+        self.cached_json_bytes = json.dumps(self.cached_json).encode()
+        self.cached_ref_json = self.cached_json
+        self.frozen = True
+
+    def __setattr__(self, name: str, value) -> None:
+        if getattr(self, 'frozen', False):
+            raise AttributeError(f'Card template {self.name} is frozen; build a new CardTemplate instead of changing {name}')
+        object.__setattr__(self, name, value)
+
+    def __setstate__(self, state) -> None:
+        # Unpickling (e.g. in bot workers) fills in the slots of an already-frozen template
+        for name, value in state[1].items():
+            object.__setattr__(self, name, value)
+
+    def set_version_id(self, version_id: int) -> None:
+        # The only change allowed after freezing, so it has to refresh the cached reference form itself
+        object.__setattr__(self, 'version_id', version_id)
+        object.__setattr__(self, 'cached_ref_json', {"name": self.name, "template_version": version_id})
+
+    def build_json(self):
         return {
             "name": self.name,
             "abilities": [a.to_json() for a in self.abilities],
@@ -35,10 +150,37 @@ class CardTemplate:
             "rarity": self.rarity,
             **({"notInCardPool": self.not_in_card_pool} if self.not_in_card_pool else {}),
         }
+
+    # The cached forms are shared, so callers must not modify what these return
+    def to_json(self):
+        # The same dict appears wherever this template does in a game's JSON (deck, hand, draw pile, lanes),
+        # so changing it in place would change every one of those copies
+        return self.cached_json
+
+    def to_json_bytes(self) -> bytes:
+        return self.cached_json_bytes
+
+    def to_ref_json(self):
+        # Templates that have never been recorded in card_balance_change_records are written out in full
+        return self.cached_ref_json
     
     @staticmethod
     def from_json(json: dict):
-        abilities = []
+        if "template_version" in json:
+            card_template = get_card_template_version(json["template_version"])
+            if card_template is None:
+                from card_templates_list import CARD_TEMPLATES
+                logger.warning(f'Unknown card template version {json["template_version"]} for {json["name"]}; using the current template')
+                card_template = CARD_TEMPLATES[json["name"]]
+            return card_template
+
+        # Games carry a copy of every card's template, so look for one we've already built (including older balance versions)
+        key = card_template_json_key(json)
+        card_template = INTERNED_CARD_TEMPLATES.get(key)
+        if card_template is not None:
+            return card_template
+
+        abilities: list[AbilitySpec] = []
         for ability in json["abilities"]:
             number = ability.get("number")
             number_2 = ability.get("number_2")
@@ -56,8 +198,8 @@ class CardTemplate:
             else:
                 abilities.append(ability["name"])
 
-        return CardTemplate(json["name"], abilities, 
-                            json["cost"], json["attack"], json["health"], json["creatureTypes"],
-                            json["rarity"],
-                            json["notInCardPool"] if "notInCardPool" in json else False)
-    
\ No newline at end of file
+        card_template = CardTemplate(json["name"], abilities, 
+                                     json["cost"], json["attack"], json["health"], json["creatureTypes"],
+                                     json["rarity"],
+                                     json["notInCardPool"] if "notInCardPool" in json else False)
+        return INTERNED_CARD_TEMPLATES.setdefault(key, card_template)
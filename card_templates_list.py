@@ -2,9 +2,13 @@ import datetime
 import json
 import random
 from card_balance_change_record import CardBalanceChangeRecord
-from card_template import CardTemplate
+from card_template import CardTemplate, intern_card_template, register_card_template_version
 from database import SessionLocal
 
+import logging
+
+logger = logging.getLogger(__name__)
+
 
 CARD_TEMPLATES = {
     'Combustion Man': CardTemplate(
@@ -1109,6 +1113,10 @@ CARD_TEMPLATES = {
     ),
 }
 
+for card_template in CARD_TEMPLATES.values():
+    intern_card_template(card_template)
+
+
 def get_random_card_template_of_rarity(rarity: str) -> CardTemplate:
     return random.choice([card for card in CARD_TEMPLATES.values() if card.rarity == rarity and not card.not_in_card_pool])
 
@@ -1117,6 +1125,20 @@ def get_sample_card_templates_of_rarity(rarity: str, n: int) -> list[CardTemplat
     return random.sample([card for card in CARD_TEMPLATES.values() if card.rarity == rarity and not card.not_in_card_pool], n)
 
 
+def load_card_template_versions():
+    # Older versions are still referenced by stored games and replays. Run this before record_card_balance_changes,
+    # which then gives the current templates their latest version ids.
+    with SessionLocal() as sess:
+        for card_balance_change_record in sess.query(CardBalanceChangeRecord).order_by(CardBalanceChangeRecord.id):
+            try:
+                card_template = CardTemplate.from_json(json.loads(card_balance_change_record.card_template_str))  # type: ignore
+            except KeyError:
+                # An ability that has since been removed; games referring to this version fall back to the current template
+                logger.warning(f'Could not load version {card_balance_change_record.id} of {card_balance_change_record.card}')
+                continue
+            register_card_template_version(card_template, card_balance_change_record.id)  # type: ignore
+
+
 def record_card_balance_changes():
     with SessionLocal() as sess:
         for card_name, card_template in CARD_TEMPLATES.items():
@@ -1127,7 +1149,7 @@ def record_card_balance_changes():
                 .first()
             )
 
-            card_template_str = json.dumps(card_template.to_json())
+            card_template_str = card_template.to_json_bytes().decode()
 
             if card_balance_change_record is None or card_balance_change_record.card_template_str != card_template_str:  # type: ignore
                 card_balance_change_record = CardBalanceChangeRecord(
@@ -1135,4 +1157,6 @@ def record_card_balance_changes():
                     card_template_str=card_template_str,
                 )
                 sess.add(card_balance_change_record)
-                sess.commit()
\ No newline at end of file
+                sess.commit()
+
+            register_card_template_version(card_template, card_balance_change_record.id)  # type: ignore
\ No newline at end of file
@@ -2,8 +2,8 @@ from collections import defaultdict
 import random
 from card_template import CardTemplate
 from card_templates_list import CARD_TEMPLATES
-from utils import basic_lane_animation, generate_unique_id, on_reveal_animation, product
-from typing import TYPE_CHECKING, Optional
+from utils import generate_unique_id, on_reveal_animation, product
+from typing import TYPE_CHECKING, Callable, Optional
 if TYPE_CHECKING:
     from lane import Lane
     from game_state import GameState
@@ -14,6 +14,9 @@ logger = logging.getLogger(__name__)
 
 
 class Character:
+    __slots__ = ('id', 'template', 'current_health', 'max_health', 'current_attack', 'shackled_turns', 'has_attacked', 'owner_number', 'owner_username',
+                 'lane', 'new', 'escaped_death', 'did_on_reveal', 'did_end_of_turn', 'silenced', 'shielded')
+
     def __init__(self, template: CardTemplate, lane: 'Lane', owner_number: int, owner_username: str, id: str = None):
         if id is not None:
             self.id = id
@@ -40,23 +43,23 @@ class Character:
         return self.has_ability('Defender')
     
     def is_attacker(self):
-        return self.has_ability('Attacker') or self.lane.lane_reward.effect[0] == 'charactersHereFightAsAttackers'
+        return self.has_ability('Attacker') or self.lane.lane_reward.effect_handler.fights_as_attackers
     
     def has_ability(self, ability_name):
-        return (not self.silenced) and any([ability_name == ability.name for ability in self.template.abilities])
+        return (not self.silenced) and ability_name in self.template.abilities_by_name
 
     def number_of_ability(self, ability_name) -> int:
-        ability = [ability for ability in self.template.abilities if ability.name == ability_name][0]
+        ability = self.template.abilities_by_name[ability_name]
         assert ability.number is not None
         return ability.number
 
     def number_2_of_ability(self, ability_name) -> int:
-        ability = [ability for ability in self.template.abilities if ability.name == ability_name][0]
+        ability = self.template.abilities_by_name[ability_name]
         assert ability.number_2 is not None
         return ability.number_2
     
     def creature_type_of_ability(self, ability_name) -> str:
-        ability = [ability for ability in self.template.abilities if ability.name == ability_name][0]
+        ability = self.template.abilities_by_name[ability_name]
         assert ability.creature_type is not None
         return ability.creature_type
 
@@ -80,34 +83,37 @@ class Character:
         damage_dealt = self.compute_damage_to_deal(damage_by_player, combat_modification_auras, is_tower_attack=True)
         damage_by_player[self.owner_number] += damage_dealt
 
-        log.append(f"{self.owner_username}'s {self.template.name} dealt {damage_dealt} damage to the enemy player in Lane {lane_number + 1}.")
+        if not game_state.headless:
+            log.append(f"{self.owner_username}'s {self.template.name} dealt {damage_dealt} damage to the enemy player in Lane {lane_number + 1}.")
 
-        try:
-            attacking_character_array_index = [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id)
-        except Exception:
-            logger.warning('Attacking character not found')
-            attacking_character_array_index = None
+            try:
+                attacking_character_array_index = [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id)
+            except Exception:
+                logger.warning('Attacking character not found')
+                attacking_character_array_index = None
 
-        animations.append({
-                    "event_type": "TowerDamage",
-                    'data': {
-                        "lane": lane_number,
-                        "acting_player": self.owner_number,
-                        "from_character_index": attacking_character_array_index,
-                    }, 
-                    'game_state': game_state.to_json()})
+            animations.append({
+                        "event_type": "TowerDamage",
+                        'data': {
+                            "lane": lane_number,
+                            "acting_player": self.owner_number,
+                            "from_character_index": attacking_character_array_index,
+                        }, 
+                        'game_state': game_state.to_json()})
 
         if self.has_ability('OnTowerAttackDealMassDamage'):
             self.add_basic_animation(animations, game_state)
             for character in defending_characters:
                 character.sustain_damage(self.number_of_ability('OnTowerAttackDealMassDamage'), log, animations, game_state)
-                log.append(f"{self.owner_username}'s {self.template.name} dealt 2 damage to {character.owner_username}'s {character.template.name} in Lane {lane_number + 1}. "
-                            f"{character.template.name}'s health is now {character.current_health}.")
+                if not game_state.headless:
+                    log.append(f"{self.owner_username}'s {self.template.name} dealt 2 damage to {character.owner_username}'s {character.template.name} in Lane {lane_number + 1}. "
+                                f"{character.template.name}'s health is now {character.current_health}.")
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
         if self.has_ability('OnTowerAttackDrawCard'):
             game_state.draw_random_card(attacking_player)
-            log.append(f"{self.owner_username}'s {self.template.name} drew a random card.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} drew a random card.")
             self.add_basic_animation(animations, game_state)
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
@@ -117,13 +123,15 @@ class Character:
                     character.current_attack += self.number_of_ability('OnDamageTowerPumpTeam')
                     character.current_health += self.number_2_of_ability('OnDamageTowerPumpTeam')
                     character.max_health += self.number_2_of_ability('OnDamageTowerPumpTeam')
-                    log.append(f"{self.owner_username}'s {self.template.name} pumped {character.owner_username}'s {character.template.name}.")
+                    if not game_state.headless:
+                        log.append(f"{self.owner_username}'s {self.template.name} pumped {character.owner_username}'s {character.template.name}.")
             self.add_basic_animation(animations, game_state)
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
         if self.has_ability('OnTowerDamageGainMana'):
             game_state.mana_by_player[self.owner_number] += 1
-            log.append(f"{self.owner_username}'s {self.template.name} gained 1 mana.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} gained 1 mana.")
             self.add_basic_animation(animations, game_state)
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
@@ -131,7 +139,8 @@ class Character:
             self.current_attack += self.number_of_ability('HitTowerPumpSelf')
             self.current_health += self.number_2_of_ability('HitTowerPumpSelf')
             self.max_health += self.number_2_of_ability('HitTowerPumpSelf')
-            log.append(f"{self.owner_username}'s {self.template.name} pumped itself.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} pumped itself.")
             self.add_basic_animation(animations, game_state)
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
@@ -140,25 +149,26 @@ class Character:
             for character in [*self.lane.characters_by_player[self.owner_number], *defending_characters]:
                 if character.id != self.id:
                     character.sustain_damage(self.number_of_ability('HitTowerDamageAllCharacters'), log, animations, game_state)
-                    log.append(f"{self.owner_username}'s {self.template.name} dealt 2 damage to {character.owner_username}'s {character.template.name} in Lane {lane_number + 1}. "
-                                f"{character.template.name}'s health is now {character.current_health}.")
+                    if not game_state.headless:
+                        log.append(f"{self.owner_username}'s {self.template.name} dealt 2 damage to {character.owner_username}'s {character.template.name} in Lane {lane_number + 1}. "
+                                    f"{character.template.name}'s health is now {character.current_health}.")
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
         if self.has_ability('HitTowerOtherCharactersSwitchLanes'):
             if len(self.lane.characters_by_player[self.owner_number]) > 1:
-                self.on_trigger_hit_tower_ability(log, animations, game_state)
+                self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
                 for character in self.lane.characters_by_player[self.owner_number]:
                     if character.id != self.id:
                         character.switch_lanes(log, animations, game_state)
 
         if self.has_ability('HitTowerGiveShield'):
-            friendly_character = self.lane.get_random_friendly_character(self.owner_number, exclude_characters=lambda c: c.shielded or c.id == self.id)
+            friendly_character = self.lane.get_random_friendly_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.shielded or c.id == self.id)
             if friendly_character is not None:
                 friendly_character.gain_shield(log, animations, game_state)
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
 
         if self.has_ability('HitTowerShackle'):
-            enemy_character = self.lane.get_random_enemy_character(self.owner_number, exclude_characters=lambda c: c.shackled_turns > 0)
+            enemy_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.shackled_turns > 0)
             if enemy_character is not None:
                 enemy_character.shackle(self, log, animations, game_state)
             self.on_trigger_hit_tower_ability(log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
@@ -173,13 +183,14 @@ class Character:
 
 
     def on_trigger_hit_tower_ability(self, log: list[str], animations: list, game_state: 'GameState', suppress_hit_tower_bonus_attack_triggers: bool = False):
-        for character in self.lane.characters_by_player[self.owner_number]:
+        for character in self.lane.subscribers_to(self.owner_number, 'trigger_hit_tower'):
             if character.has_ability('OnTriggerHitTowerPump'):
                 self.current_attack += character.number_of_ability('OnTriggerHitTowerPump')
                 self.current_health += character.number_2_of_ability('OnTriggerHitTowerPump')
                 self.max_health += character.number_2_of_ability('OnTriggerHitTowerPump')
                 character.add_basic_animation(animations, game_state)
-                log.append(f"{character.owner_username}'s {self.template.name} got +{character.number_of_ability('OnTriggerHitTowerPump')}/+{character.number_2_of_ability('OnTriggerHitTowerPump')} for hitting the enemy tower.")
+                if not game_state.headless:
+                    log.append(f"{character.owner_username}'s {self.template.name} got +{character.number_of_ability('OnTriggerHitTowerPump')}/+{character.number_2_of_ability('OnTriggerHitTowerPump')} for hitting the enemy tower.")
 
             if (not suppress_hit_tower_bonus_attack_triggers) and character.has_ability('OnTriggerHitTowerBonusAttack'):
                 character.add_basic_animation(animations, game_state)
@@ -204,11 +215,11 @@ class Character:
         else:
             if len(defenders) == 0:
                 if len(defending_characters) > 0:
-                    target_character = random.choice(defending_characters)
+                    target_character = game_state.rng.choice(defending_characters)
                 else:
                     target_character = None
             else:
-                target_character = random.choice(defenders)
+                target_character = game_state.rng.choice(defenders)
             if target_character is not None:
                 self.fight(target_character, lane_number, combat_modification_auras, log, animations, game_state, suppress_hit_tower_bonus_attack_triggers=suppress_hit_tower_bonus_attack_triggers)
             else:
@@ -255,16 +266,17 @@ class Character:
         defending_character.sustain_damage(attacker_damage_to_deal, log, fight_animations, game_state, suppress_trigger=True)
         self.sustain_damage(defender_damage_to_deal, log, fight_animations, game_state, suppress_trigger=True)
 
-        animations.append({
-            "event_type": "FriendlyAttack" if friendly else "CharacterAttack",
-            "data": {
-                "lane": lane_number,
-                "acting_player": self.owner_number,
-                "from_character_index": from_character_index,
-                "to_character_index": to_character_index,
-            },
-            "game_state": game_state.to_json(),
-        })
+        if not game_state.headless:
+            animations.append({
+                "event_type": "FriendlyAttack" if friendly else "CharacterAttack",
+                "data": {
+                    "lane": lane_number,
+                    "acting_player": self.owner_number,
+                    "from_character_index": from_character_index,
+                    "to_character_index": to_character_index,
+                },
+                "game_state": game_state.to_json(),
+            })
 
         animations.extend(fight_animations)
 
@@ -290,8 +302,8 @@ class Character:
         if self.has_ability('KillEnemySummonNyla'):
             if len(self.lane.characters_by_player[self.owner_number]) < 4 and not any([character.template.name == 'Nyla' for character in self.lane.characters_by_player[self.owner_number]]):
                 self.add_basic_animation(animations, game_state)
-                nyla_character = Character(CARD_TEMPLATES['Nyla'], self.lane, self.owner_number, game_state.usernames_by_player[self.owner_number])
-                self.lane.characters_by_player[self.owner_number].append(nyla_character)
+                nyla_character = Character(CARD_TEMPLATES['Nyla'], self.lane, self.owner_number, game_state.usernames_by_player[self.owner_number], game_state.id_allocator.allocate())
+                self.lane.add_character(nyla_character)
                 nyla_character.do_all_on_reveal(log, animations, game_state)
             self.on_trigger_kill_enemy_ability(log, animations, game_state)
 
@@ -317,14 +329,15 @@ class Character:
             self.on_trigger_kill_enemy_ability(log, animations, game_state)
 
     def on_trigger_kill_enemy_ability(self, log: list[str], animations: list, game_state: 'GameState'):
-        for character in self.lane.characters_by_player[self.owner_number]:
+        for character in self.lane.subscribers_to(self.owner_number, 'trigger_kill_enemy'):
             if character.has_ability('OnTriggerKillEnemyHealAndPumpSelf'):
                 self.fully_heal()
                 character.current_attack += character.number_of_ability('OnTriggerKillEnemyHealAndPumpSelf')
                 character.current_health += character.number_2_of_ability('OnTriggerKillEnemyHealAndPumpSelf')
                 character.max_health += character.number_2_of_ability('OnTriggerKillEnemyHealAndPumpSelf')
                 character.add_basic_animation(animations, game_state)
-                log.append(f"{character.owner_username}'s {character.template.name} got +{character.number_of_ability('OnTriggerKillEnemyHealAndPumpSelf')}/+{character.number_2_of_ability('OnTriggerKillEnemyHealAndPumpSelf')} for killing an enemy.")
+                if not game_state.headless:
+                    log.append(f"{character.owner_username}'s {character.template.name} got +{character.number_of_ability('OnTriggerKillEnemyHealAndPumpSelf')}/+{character.number_2_of_ability('OnTriggerKillEnemyHealAndPumpSelf')} for killing an enemy.")
 
             if character.has_ability('OnTriggerKillEnemyBonusAttack'):
                 character.add_basic_animation(animations, game_state)
@@ -378,19 +391,22 @@ class Character:
             self.current_health += self.number_2_of_ability('OnSurviveDamagePump')
             self.max_health += self.number_2_of_ability('OnSurviveDamagePump')
             self.add_basic_animation(animations, game_state)
-            log.append(f"{self.owner_username}'s {self.template.name} got +{self.number_of_ability('OnSurviveDamagePump')}/+{self.number_2_of_ability('OnSurviveDamagePump')} for surviving damage.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} got +{self.number_of_ability('OnSurviveDamagePump')}/+{self.number_2_of_ability('OnSurviveDamagePump')} for surviving damage.")
             self.on_trigger_survive_ability(log, animations, game_state)
 
         if self.has_ability('OnSurviveDrawCard'):
             game_state.draw_random_card(self.owner_number)
             self.add_basic_animation(animations, game_state)
-            log.append(f"{self.owner_username}'s {self.template.name} drew a random card.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} drew a random card.")
             self.on_trigger_survive_ability(log, animations, game_state)
         
         if self.has_ability('OnSurviveGainMana'):
             game_state.mana_by_player[self.owner_number] += 1
             self.add_basic_animation(animations, game_state)
-            log.append(f"{self.owner_username}'s {self.template.name} gained 1 mana.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} gained 1 mana.")
             self.on_trigger_survive_ability(log, animations, game_state)
 
         if self.has_ability('SurviveSwitchLanes'):
@@ -413,13 +429,15 @@ class Character:
                 character.current_health += character.number_2_of_ability('OnTriggerSurvivePumpSelf')
                 character.max_health += character.number_2_of_ability('OnTriggerSurvivePumpSelf')
                 character.add_basic_animation(animations, game_state)
-                log.append(f"{character.owner_username}'s {character.template.name} got +{character.number_of_ability('OnTriggerSurvivePumpSelf')}/+{character.number_2_of_ability('OnTriggerSurvivePumpSelf')} for {self.owner_username}'s {self.template.name} surviving damage.")
+                if not game_state.headless:
+                    log.append(f"{character.owner_username}'s {character.template.name} got +{character.number_of_ability('OnTriggerSurvivePumpSelf')}/+{character.number_2_of_ability('OnTriggerSurvivePumpSelf')} for {self.owner_username}'s {self.template.name} surviving damage.")
             if character.has_ability('OnTriggerSurvivePump'):
                 self.current_attack += character.number_of_ability('OnTriggerSurvivePump')
                 self.current_health += character.number_2_of_ability('OnTriggerSurvivePump')
                 self.max_health += character.number_2_of_ability('OnTriggerSurvivePump')
                 character.add_basic_animation(animations, game_state)
-                log.append(f"{self.owner_username}'s {self.template.name} got +{character.number_of_ability('OnTriggerSurvivePump')}/+{character.number_2_of_ability('OnTriggerSurvivePump')} for surviving damage.")
+                if not game_state.headless:
+                    log.append(f"{self.owner_username}'s {self.template.name} got +{character.number_of_ability('OnTriggerSurvivePump')}/+{character.number_2_of_ability('OnTriggerSurvivePump')} for surviving damage.")
 
     def can_fight(self):
         return self.current_health > 0
@@ -446,33 +464,34 @@ class Character:
         if target_lane is None:
             return False
 
-        self.lane.characters_by_player[self.owner_number] = [character for character in self.lane.characters_by_player[self.owner_number] if character.id != self.id]
+        self.lane.remove_character(self)
         if and_fully_heal_if_switching:
             self.fully_heal()
         if self.current_health <= 0:
             return False
 
-        target_lane.characters_by_player[self.owner_number].append(self)
+        target_lane.add_character(self)
         self.lane = target_lane
 
-        animations.append(
-            {
-                "event_type": "CharacterSwitchLanes",
-                "data": {
-                    "acting_player": self.owner_number,
-                    "from_character_index": original_spot_array_index,
-                    "to_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id),
-                    "lane": original_lane_number,
-                    "to_lane": self.lane.lane_number,
-                },
-                "game_state": game_state.to_json(),
-            }
-        )
+        if not game_state.headless:
+            animations.append(
+                {
+                    "event_type": "CharacterSwitchLanes",
+                    "data": {
+                        "acting_player": self.owner_number,
+                        "from_character_index": original_spot_array_index,
+                        "to_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id),
+                        "lane": original_lane_number,
+                        "to_lane": self.lane.lane_number,
+                    },
+                    "game_state": game_state.to_json(),
+                }
+            )
 
         self.has_attacked = False
 
         # pump friendly characters with CharacterMovesHerePumps ability
-        for character in target_lane.characters_by_player[self.owner_number]:
+        for character in target_lane.subscribers_to(self.owner_number, 'character_moves_here'):
             if character.has_ability('CharacterMovesHerePumps') and character.id != self.id:
                 character.current_attack += character.number_of_ability('CharacterMovesHerePumps')
                 character.current_health += character.number_2_of_ability('CharacterMovesHerePumps')
@@ -486,12 +505,12 @@ class Character:
             if character.has_ability('OnCharacterMoveHereMakeSpirit') and character.id != self.id:
                 lane_to_spawn_in = game_state.find_random_empty_slot_in_other_lane(self.lane.lane_number, self.owner_number)
                 if lane_to_spawn_in is not None:
-                    character = Character(CARD_TEMPLATES['Spirit'], lane_to_spawn_in, self.owner_number, game_state.usernames_by_player[self.owner_number])
-                    lane_to_spawn_in.characters_by_player[self.owner_number].append(character)
+                    character = Character(CARD_TEMPLATES['Spirit'], lane_to_spawn_in, self.owner_number, game_state.usernames_by_player[self.owner_number], game_state.id_allocator.allocate())
+                    lane_to_spawn_in.add_character(character)
                     character.do_all_on_reveal(log, animations, game_state)
                 
             if character.has_ability('OnCharacterMoveHereShackle') and character.id != self.id:
-                random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, exclude_characters=lambda c: c.shackled_turns > 0)
+                random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.shackled_turns > 0)
                 if random_enemy_character is not None:
                     random_enemy_character.shackle(character, log, animations, game_state)
 
@@ -504,7 +523,7 @@ class Character:
         self.current_health = self.max_health
 
         # pump friendly characters with the PumpOnFriendlyHeal ability
-        for character in self.lane.characters_by_player[self.owner_number]:
+        for character in self.lane.subscribers_to(self.owner_number, 'friendly_heal'):
             if character.has_ability('PumpOnFriendlyHeal'):
                 if character.id != self.id:
                     self.current_attack += character.number_of_ability('PumpOnFriendlyHeal')
@@ -522,7 +541,8 @@ class Character:
         self.new = False
 
         if self.shackled_turns > 0:
-            log.append(f"{self.owner_username}'s {self.template.name} is shackled for {self.shackled_turns} more turns.")
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} is shackled for {self.shackled_turns} more turns.")
             self.shackled_turns -= 1
 
 
@@ -547,6 +567,8 @@ class Character:
 
 
     def silence(self, silencing_character: 'Character', log: list[str], animations: list, game_state: 'GameState', do_not_animate: bool = False):
+        if not self.silenced and self.exists():
+            self.lane.update_combat_modification_auras(self, -1)
         self.silenced = True
         self.current_attack = self.template.attack
         self.current_health = min(self.template.health, self.current_health)
@@ -556,8 +578,9 @@ class Character:
 
         self.break_shield(log, shield_animations, game_state)
 
-        log.append(f"{silencing_character.owner_username}'s {silencing_character.template.name} silenced {self.owner_username}'s {self.template.name}.")
-        if not do_not_animate:
+        if not game_state.headless:
+            log.append(f"{silencing_character.owner_username}'s {silencing_character.template.name} silenced {self.owner_username}'s {self.template.name}.")
+        if not do_not_animate and not game_state.headless:
             animations.append({
                 "event_type": "CharacterSilence",
                 "data": {
@@ -583,8 +606,9 @@ class Character:
         for _ in range(cards_drawn_from_shackles):
             game_state.draw_random_card(1 - self.owner_number)
 
-        log.append(f"{shackling_character.owner_username}'s {shackling_character.template.name} shackled {self.owner_username}'s {self.template.name}.")
-        if not do_not_animate:
+        if not game_state.headless:
+            log.append(f"{shackling_character.owner_username}'s {shackling_character.template.name} shackled {self.owner_username}'s {self.template.name}.")
+        if not do_not_animate and not game_state.headless:
             animations.append({
                 "event_type": "CharacterShackle",
                 "data": {
@@ -632,8 +656,8 @@ class Character:
         element_specific_defense_buffs = [character.number_2_of_ability('PumpFriendlyCharactersOfElementPlayedHere') for character in self.lane.characters_by_player[self.owner_number] 
                                             if (character.has_ability('PumpFriendlyCharactersOfElementPlayedHere') and (character.creature_type_of_ability('PumpFriendlyCharactersOfElementPlayedHere') in self.template.creature_types or 'Avatar' in self.template.creature_types)) and character.id != self.id]
         
-        lane_attack_buff = self.lane.lane_reward.effect[1] if self.lane.lane_reward is not None and self.lane.lane_reward.effect[0] == 'pumpAllCharactersPlayedHere' else 0
-        lane_defense_buff = self.lane.lane_reward.effect[2] if self.lane.lane_reward is not None and self.lane.lane_reward.effect[0] == 'pumpAllCharactersPlayedHere' else 0
+        lane_attack_buff = self.lane.lane_reward.effect_handler.played_here_attack_buff
+        lane_defense_buff = self.lane.lane_reward.effect_handler.played_here_health_buff
 
         self.current_attack += sum(attack_buffs) + sum(element_specific_attack_buffs) + lane_attack_buff  # type: ignore
         self.current_health += sum(defense_buffs) + sum(element_specific_defense_buffs) + lane_defense_buff  # type: ignore
@@ -648,7 +672,7 @@ class Character:
             self.current_attack = 0
 
     def add_basic_animation(self, animations: list, game_state: 'GameState'):
-        if self.exists():
+        if not game_state.headless and self.exists():
             animations.append(
                 on_reveal_animation(self.lane.lane_number, self.owner_number, [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id), game_state)
             )
@@ -658,215 +682,233 @@ class Character:
             return
 
         if self.new:
-            if self.has_ability('OnRevealSilenceLastEnemy'):
-                enemy_characters = self.lane.characters_by_player[1 - self.owner_number]
-                if len(enemy_characters) > 0:
-                    enemy_characters[-1].silence(self, log, animations, game_state)
-
-            if self.has_ability('OnRevealSilenceAllCharacters'):
-                for character in [*self.lane.characters_by_player[1 - self.owner_number], *self.lane.characters_by_player[self.owner_number]]:
-                    if character.id != self.id:
-                        character.silence(self, log, animations, game_state, do_not_animate=True)
-                self.add_basic_animation(animations, game_state)
+            self.run_on_reveal_handlers('early', log, animations, game_state)
 
 
     def do_regular_on_reveal(self, log: list[str], animations: list, game_state: 'GameState'):
         if self.did_on_reveal:
             return
         if self.new:
-            if self.has_ability('OnRevealShackle'):
-                random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, exclude_characters=lambda c: c.shackled_turns > 0)
-                if random_enemy_character is not None:
-                    random_enemy_character.shackle(self, log, animations, game_state)
-
-            if self.has_ability('OnRevealShackleSeveral'):
-                for _ in range(self.number_of_ability('OnRevealShackleSeveral')):
-                    random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, exclude_characters=lambda c: c.shackled_turns > 0)
-                    if random_enemy_character is not None:
-                        random_enemy_character.shackle(self, log, animations, game_state)
-
-            if self.has_ability('OnRevealShackleAllEnemies'):
-                for character in self.lane.characters_by_player[1 - self.owner_number]:
-                    if character.shackled_turns == 0:
-                        character.shackle(self, log, animations, game_state, do_not_animate=True)
-                self.add_basic_animation(animations, game_state)
-
-
-            if self.has_ability('OnRevealPumpFriends'):
-                for character in self.lane.characters_by_player[self.owner_number]:
-                    if character.id != self.id:
-                        character.current_attack += self.number_of_ability('OnRevealPumpFriends')
-                        character.current_health += self.number_2_of_ability('OnRevealPumpFriends')
-                        character.max_health += self.number_2_of_ability('OnRevealPumpFriends')
-                        log.append(f"{self.owner_username}'s {self.template.name} pumped {character.owner_username}'s {character.template.name}.")
-                self.add_basic_animation(animations, game_state)
-
-            if self.has_ability('OnRevealPumpAttackers'):
-                for character in self.lane.characters_by_player[self.owner_number]:
-                    if character.is_attacker() and character.id != self.id:
-                        character.current_attack += self.number_of_ability('OnRevealPumpAttackers')
-                        character.current_health += self.number_2_of_ability('OnRevealPumpAttackers')
-                        character.max_health += self.number_2_of_ability('OnRevealPumpAttackers')
-                        log.append(f"{self.owner_username}'s {self.template.name} pumped {character.owner_username}'s {character.template.name}.")
-                self.add_basic_animation(animations, game_state)
-
-            if self.has_ability('OnRevealGainMana'):
-                number = self.number_of_ability('OnRevealGainMana')
-                game_state.mana_by_player[self.owner_number] += number
-                log.append(f"{self.owner_username}'s {self.template.name} gained {number} mana.")
-
-            if self.has_ability('HealFriendlyCharacterAndTower'):
-                random_friendly_damaged_character = self.get_random_other_friendly_damaged_character()
-                if random_friendly_damaged_character is not None:
-                    random_friendly_damaged_character.fully_heal()
-                    animations.append(
-                        {
-                            "event_type": "CharacterHeal",
-                            "data": {
-                                "acting_player": self.owner_number,
-                                "lane": self.lane.lane_number,
-                                "from_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id),
-                                "to_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(random_friendly_damaged_character.id),
-                            },
-                            "game_state": game_state.to_json(),
-                        },
-                    )
-                self.lane.damage_by_player[1 - self.owner_number] = max(0, self.lane.damage_by_player[1 - self.owner_number] - self.number_of_ability('HealFriendlyCharacterAndTower'))
-
-            if self.has_ability('OnRevealHealAllFriendliesAndTowers'):
-                for lane in game_state.lanes:
-                    for character in lane.characters_by_player[self.owner_number]:
-                        character.fully_heal()
-                    lane.damage_by_player[1 - self.owner_number] = max(0, lane.damage_by_player[1 - self.owner_number] - self.number_of_ability('OnRevealHealAllFriendliesAndTowers'))
-                self.add_basic_animation(animations, game_state)
-
-            if self.has_ability('OnRevealLaneFightsFirst'):
-                self.lane.additional_combat_priority -= 3
-
-            if self.has_ability('OnRevealFriendliesSwitchLanes'):
-                friendlies = self.lane.characters_by_player[self.owner_number][:]
-                self.add_basic_animation(animations, game_state)                
-                for character in friendlies:
-                    character.switch_lanes(log, animations, game_state)
-
-            if self.has_ability('OnRevealDrawCards'):
-                cards_to_draw = self.number_of_ability('OnRevealDrawCards')
-                for _ in range(cards_to_draw):
-                    game_state.draw_random_card(self.owner_number)
-
-            if self.has_ability('OnRevealDamageSelf'):
-                damage_amount = self.number_of_ability('OnRevealDamageSelf')
-                self.current_health -= damage_amount
-                log.append(f"{self.owner_username}'s {self.template.name} dealt {damage_amount} damage to itself.")
-                self.add_basic_animation(animations, game_state)
+            self.run_on_reveal_handlers('regular', log, animations, game_state)
 
             if 'Earth' in self.template.creature_types or 'Avatar' in self.template.creature_types:
                 for character in self.lane.characters_by_player[self.owner_number]:
                     if character.has_ability('ShackleOnFriendlyEarth') and character.id != self.id:
-                        random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, exclude_characters=lambda c: c.shackled_turns > 0)
+                        random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.shackled_turns > 0)
                         if random_enemy_character is not None:
                             random_enemy_character.shackle(character, log, animations, game_state)
-            
-            if self.has_ability('OnRevealPumpFriendlyCharactersOfElement'):
-                for character in self.lane.characters_by_player[self.owner_number]:
-                    if (self.creature_type_of_ability('OnRevealPumpFriendlyCharactersOfElement') in character.template.creature_types or 'Avatar' in character.template.creature_types) and character.id != self.id:
-                        character.current_attack += self.number_of_ability('OnRevealPumpFriendlyCharactersOfElement')
-                        character.current_health += self.number_2_of_ability('OnRevealPumpFriendlyCharactersOfElement')
-                        character.max_health += self.number_2_of_ability('OnRevealPumpFriendlyCharactersOfElement')
-                self.add_basic_animation(animations, game_state)
 
-            if self.has_ability('OnRevealFillEnemyLaneWithCabbages'):
-                while len(self.lane.characters_by_player[1 - self.owner_number]) < 4:
-                    cabbage_character = Character(CARD_TEMPLATES['Cabbage'], self.lane, 1 - self.owner_number, game_state.usernames_by_player[1 - self.owner_number])
-                    self.lane.characters_by_player[1 - self.owner_number].append(cabbage_character)
-                    cabbage_character.do_all_on_reveal(log, animations, game_state)
-
-            if self.has_ability('OnRevealSummonDesna'):
-                if len(self.lane.characters_by_player[self.owner_number]) < 4:
-                    self.add_basic_animation(animations, game_state)
-                    desna_character = Character(CARD_TEMPLATES['Desna'], self.lane, self.owner_number, game_state.usernames_by_player[self.owner_number])
-                    self.lane.characters_by_player[self.owner_number].append(desna_character)
-                    desna_character.do_all_on_reveal(log, animations, game_state)
-
-            if self.has_ability('OnRevealHealAndPumpSelf'):
-                random_friendly_damaged_character = self.get_random_other_friendly_damaged_character()
-                if random_friendly_damaged_character is not None:
-                    amount_to_heal = random_friendly_damaged_character.max_health - random_friendly_damaged_character.current_health
-                    random_friendly_damaged_character.fully_heal()
-                    self.current_attack += amount_to_heal
-                    self.current_health += amount_to_heal
-                    self.max_health += amount_to_heal
-                    animations.append(
-                        {
-                            "event_type": "CharacterHeal",
-                            "data": {
-                                "acting_player": self.owner_number,
-                                "lane": self.lane.lane_number,
-                                "from_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id),
-                                "to_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(random_friendly_damaged_character.id),
-                            },
-                            "game_state": game_state.to_json(),
-                        },
-                    )
-
-            if self.has_ability('OnRevealDiscard'):
-                if len(game_state.hands_by_player[self.owner_number]) > 0:
-                    random_card = random.choice(game_state.hands_by_player[self.owner_number])
-                    game_state.discard_card(self.owner_number, random_card.id)
-                    log.append(f"{self.owner_username}'s {self.template.name} discarded {random_card.template.name}.")
-
-            if self.has_ability('OnRevealDiscardHandAndPump'):
-                num_cards_to_discard = len(game_state.hands_by_player[self.owner_number])
-                game_state.discard_all_cards(self.owner_number)
-                attack_multiplier = self.number_of_ability('OnRevealDiscardHandAndPump')
-                defense_multiplier = self.number_2_of_ability('OnRevealDiscardHandAndPump')
-                self.current_attack += num_cards_to_discard * attack_multiplier
-                self.current_health += num_cards_to_discard * defense_multiplier
-                self.max_health += num_cards_to_discard * defense_multiplier
-                self.add_basic_animation(animations, game_state)
-
-            if self.has_ability('OnRevealShieldFriendlies'):
-                for character in self.lane.characters_by_player[self.owner_number]:
-                    if character.id != self.id:
-                        character.gain_shield(log, animations, game_state)
-                self.add_basic_animation(animations, game_state)
+            self.run_on_reveal_handlers('regular_after_earth_triggers', log, animations, game_state)
 
-            if self.has_ability('OnRevealPumpCardsInHand'):
-                for card in game_state.hands_by_player[self.owner_number]:
-                    card.attack += self.number_of_ability('OnRevealPumpCardsInHand')
-                    card.health += self.number_2_of_ability('OnRevealPumpCardsInHand')
-                self.add_basic_animation(animations, game_state)    
-
-            if self.has_ability('OnRevealPumpFriendliesIfFullMatchingLane'):
-                if len(self.lane.characters_by_player[self.owner_number]) >= 4:
-                    for element in ['Fire', 'Water', 'Earth', 'Air']:
-                        if all([element in character.template.creature_types or 'Avatar' in character.template.creature_types for character in self.lane.characters_by_player[self.owner_number]]):
-                            for character in self.lane.characters_by_player[self.owner_number]:
-                                character.current_attack += self.number_of_ability('OnRevealPumpFriendliesIfFullMatchingLane')
-                                character.current_health += self.number_2_of_ability('OnRevealPumpFriendliesIfFullMatchingLane')
-                                character.max_health += self.number_2_of_ability('OnRevealPumpFriendliesIfFullMatchingLane')
-                            self.add_basic_animation(animations, game_state)                                
-                            break
-            
-            if self.lane.lane_reward.effect[0] == 'pumpAllCharactersPlayedHereWhenFilled' and len(self.lane.characters_by_player[self.owner_number]) >= 4:
-                for character in self.lane.characters_by_player[self.owner_number]:
-                    character.current_attack += self.lane.lane_reward.effect[1]  # type: ignore
-                    character.current_health += self.lane.lane_reward.effect[2]  # type: ignore
-                    character.max_health += self.lane.lane_reward.effect[2]  # type: ignore
-                
-                animations.append(basic_lane_animation(self.lane.lane_number, game_state))
+            self.lane.lane_reward.effect_handler.on_character_revealed_here(self, game_state, animations)
 
     def do_late_on_reveal(self, log: list[str], animations: list, game_state: 'GameState'):
         if self.did_on_reveal:
             return        
 
-        if self.has_ability('OnRevealDiscardRandomCardAndDealDamageEqualToCost'):
-            if len(game_state.hands_by_player[self.owner_number]) > 0:
-                random_card = random.choice(game_state.hands_by_player[self.owner_number])
-                game_state.discard_card(self.owner_number, random_card.id)
-                damage_to_deal = random_card.template.cost
-                defending_character = self.lane.get_random_enemy_character(self.owner_number)
-                if defending_character is not None:
+        self.run_on_reveal_handlers('late', log, animations, game_state)
+
+        self.did_on_reveal = True
+
+    def run_on_reveal_handlers(self, phase: str, log: list[str], animations: list, game_state: 'GameState'):
+        # Only the template's own on-reveal abilities for this phase, in the order the phase has always checked them.
+        # has_ability is checked again before each one since an earlier handler may have silenced this character.
+        for ability_name in self.template.on_reveal_ability_names_by_phase[phase]:
+            if self.has_ability(ability_name):
+                ON_REVEAL_HANDLERS[ability_name](self, log, animations, game_state)
+
+    def do_on_reveal_silence_last_enemy(self, log: list[str], animations: list, game_state: 'GameState'):
+        enemy_characters = self.lane.characters_by_player[1 - self.owner_number]
+        if len(enemy_characters) > 0:
+            enemy_characters[-1].silence(self, log, animations, game_state)
+
+    def do_on_reveal_silence_all_characters(self, log: list[str], animations: list, game_state: 'GameState'):
+        for character in [*self.lane.characters_by_player[1 - self.owner_number], *self.lane.characters_by_player[self.owner_number]]:
+            if character.id != self.id:
+                character.silence(self, log, animations, game_state, do_not_animate=True)
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_shackle(self, log: list[str], animations: list, game_state: 'GameState'):
+        random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.shackled_turns > 0)
+        if random_enemy_character is not None:
+            random_enemy_character.shackle(self, log, animations, game_state)
+
+    def do_on_reveal_shackle_several(self, log: list[str], animations: list, game_state: 'GameState'):
+        for _ in range(self.number_of_ability('OnRevealShackleSeveral')):
+            random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.shackled_turns > 0)
+            if random_enemy_character is not None:
+                random_enemy_character.shackle(self, log, animations, game_state)
+
+    def do_on_reveal_shackle_all_enemies(self, log: list[str], animations: list, game_state: 'GameState'):
+        for character in self.lane.characters_by_player[1 - self.owner_number]:
+            if character.shackled_turns == 0:
+                character.shackle(self, log, animations, game_state, do_not_animate=True)
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_pump_friends(self, log: list[str], animations: list, game_state: 'GameState'):
+        for character in self.lane.characters_by_player[self.owner_number]:
+            if character.id != self.id:
+                character.current_attack += self.number_of_ability('OnRevealPumpFriends')
+                character.current_health += self.number_2_of_ability('OnRevealPumpFriends')
+                character.max_health += self.number_2_of_ability('OnRevealPumpFriends')
+                if not game_state.headless:
+                    log.append(f"{self.owner_username}'s {self.template.name} pumped {character.owner_username}'s {character.template.name}.")
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_pump_attackers(self, log: list[str], animations: list, game_state: 'GameState'):
+        for character in self.lane.characters_by_player[self.owner_number]:
+            if character.is_attacker() and character.id != self.id:
+                character.current_attack += self.number_of_ability('OnRevealPumpAttackers')
+                character.current_health += self.number_2_of_ability('OnRevealPumpAttackers')
+                character.max_health += self.number_2_of_ability('OnRevealPumpAttackers')
+                if not game_state.headless:
+                    log.append(f"{self.owner_username}'s {self.template.name} pumped {character.owner_username}'s {character.template.name}.")
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_gain_mana(self, log: list[str], animations: list, game_state: 'GameState'):
+        number = self.number_of_ability('OnRevealGainMana')
+        game_state.mana_by_player[self.owner_number] += number
+        if not game_state.headless:
+            log.append(f"{self.owner_username}'s {self.template.name} gained {number} mana.")
+
+    def do_heal_friendly_character_and_tower(self, log: list[str], animations: list, game_state: 'GameState'):
+        random_friendly_damaged_character = self.get_random_other_friendly_damaged_character(game_state.rng)
+        if random_friendly_damaged_character is not None:
+            random_friendly_damaged_character.fully_heal()
+            if not game_state.headless:
+                animations.append(
+                    {
+                        "event_type": "CharacterHeal",
+                        "data": {
+                            "acting_player": self.owner_number,
+                            "lane": self.lane.lane_number,
+                            "from_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id),
+                            "to_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(random_friendly_damaged_character.id),
+                        },
+                        "game_state": game_state.to_json(),
+                    },
+                )
+        self.lane.damage_by_player[1 - self.owner_number] = max(0, self.lane.damage_by_player[1 - self.owner_number] - self.number_of_ability('HealFriendlyCharacterAndTower'))
+
+    def do_on_reveal_heal_all_friendlies_and_towers(self, log: list[str], animations: list, game_state: 'GameState'):
+        for lane in game_state.lanes:
+            for character in lane.characters_by_player[self.owner_number]:
+                character.fully_heal()
+            lane.damage_by_player[1 - self.owner_number] = max(0, lane.damage_by_player[1 - self.owner_number] - self.number_of_ability('OnRevealHealAllFriendliesAndTowers'))
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_lane_fights_first(self, log: list[str], animations: list, game_state: 'GameState'):
+        self.lane.additional_combat_priority -= 3
+
+    def do_on_reveal_friendlies_switch_lanes(self, log: list[str], animations: list, game_state: 'GameState'):
+        friendlies = self.lane.characters_by_player[self.owner_number][:]
+        self.add_basic_animation(animations, game_state)                
+        for character in friendlies:
+            character.switch_lanes(log, animations, game_state)
+
+    def do_on_reveal_draw_cards(self, log: list[str], animations: list, game_state: 'GameState'):
+        cards_to_draw = self.number_of_ability('OnRevealDrawCards')
+        for _ in range(cards_to_draw):
+            game_state.draw_random_card(self.owner_number)
+
+    def do_on_reveal_damage_self(self, log: list[str], animations: list, game_state: 'GameState'):
+        damage_amount = self.number_of_ability('OnRevealDamageSelf')
+        self.current_health -= damage_amount
+        if not game_state.headless:
+            log.append(f"{self.owner_username}'s {self.template.name} dealt {damage_amount} damage to itself.")
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_pump_friendly_characters_of_element(self, log: list[str], animations: list, game_state: 'GameState'):
+        for character in self.lane.characters_by_player[self.owner_number]:
+            if (self.creature_type_of_ability('OnRevealPumpFriendlyCharactersOfElement') in character.template.creature_types or 'Avatar' in character.template.creature_types) and character.id != self.id:
+                character.current_attack += self.number_of_ability('OnRevealPumpFriendlyCharactersOfElement')
+                character.current_health += self.number_2_of_ability('OnRevealPumpFriendlyCharactersOfElement')
+                character.max_health += self.number_2_of_ability('OnRevealPumpFriendlyCharactersOfElement')
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_fill_enemy_lane_with_cabbages(self, log: list[str], animations: list, game_state: 'GameState'):
+        while len(self.lane.characters_by_player[1 - self.owner_number]) < 4:
+            cabbage_character = Character(CARD_TEMPLATES['Cabbage'], self.lane, 1 - self.owner_number, game_state.usernames_by_player[1 - self.owner_number], game_state.id_allocator.allocate())
+            self.lane.add_character(cabbage_character)
+            cabbage_character.do_all_on_reveal(log, animations, game_state)
+
+    def do_on_reveal_summon_desna(self, log: list[str], animations: list, game_state: 'GameState'):
+        if len(self.lane.characters_by_player[self.owner_number]) < 4:
+            self.add_basic_animation(animations, game_state)
+            desna_character = Character(CARD_TEMPLATES['Desna'], self.lane, self.owner_number, game_state.usernames_by_player[self.owner_number], game_state.id_allocator.allocate())
+            self.lane.add_character(desna_character)
+            desna_character.do_all_on_reveal(log, animations, game_state)
+
+    def do_on_reveal_heal_and_pump_self(self, log: list[str], animations: list, game_state: 'GameState'):
+        random_friendly_damaged_character = self.get_random_other_friendly_damaged_character(game_state.rng)
+        if random_friendly_damaged_character is not None:
+            amount_to_heal = random_friendly_damaged_character.max_health - random_friendly_damaged_character.current_health
+            random_friendly_damaged_character.fully_heal()
+            self.current_attack += amount_to_heal
+            self.current_health += amount_to_heal
+            self.max_health += amount_to_heal
+            if not game_state.headless:
+                animations.append(
+                    {
+                        "event_type": "CharacterHeal",
+                        "data": {
+                            "acting_player": self.owner_number,
+                            "lane": self.lane.lane_number,
+                            "from_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(self.id),
+                            "to_character_index": [c.id for c in self.lane.characters_by_player[self.owner_number]].index(random_friendly_damaged_character.id),
+                        },
+                        "game_state": game_state.to_json(),
+                    },
+                )
+
+    def do_on_reveal_discard(self, log: list[str], animations: list, game_state: 'GameState'):
+        if len(game_state.hands_by_player[self.owner_number]) > 0:
+            random_card = game_state.rng.choice(game_state.hands_by_player[self.owner_number])
+            game_state.discard_card(self.owner_number, random_card.id)
+            if not game_state.headless:
+                log.append(f"{self.owner_username}'s {self.template.name} discarded {random_card.template.name}.")
+
+    def do_on_reveal_discard_hand_and_pump(self, log: list[str], animations: list, game_state: 'GameState'):
+        num_cards_to_discard = len(game_state.hands_by_player[self.owner_number])
+        game_state.discard_all_cards(self.owner_number)
+        attack_multiplier = self.number_of_ability('OnRevealDiscardHandAndPump')
+        defense_multiplier = self.number_2_of_ability('OnRevealDiscardHandAndPump')
+        self.current_attack += num_cards_to_discard * attack_multiplier
+        self.current_health += num_cards_to_discard * defense_multiplier
+        self.max_health += num_cards_to_discard * defense_multiplier
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_shield_friendlies(self, log: list[str], animations: list, game_state: 'GameState'):
+        for character in self.lane.characters_by_player[self.owner_number]:
+            if character.id != self.id:
+                character.gain_shield(log, animations, game_state)
+        self.add_basic_animation(animations, game_state)
+
+    def do_on_reveal_pump_cards_in_hand(self, log: list[str], animations: list, game_state: 'GameState'):
+        for card in game_state.hands_by_player[self.owner_number]:
+            card.attack += self.number_of_ability('OnRevealPumpCardsInHand')
+            card.health += self.number_2_of_ability('OnRevealPumpCardsInHand')
+        self.add_basic_animation(animations, game_state)    
+
+    def do_on_reveal_pump_friendlies_if_full_matching_lane(self, log: list[str], animations: list, game_state: 'GameState'):
+        if len(self.lane.characters_by_player[self.owner_number]) >= 4:
+            for element in ['Fire', 'Water', 'Earth', 'Air']:
+                if all([element in character.template.creature_types or 'Avatar' in character.template.creature_types for character in self.lane.characters_by_player[self.owner_number]]):
+                    for character in self.lane.characters_by_player[self.owner_number]:
+                        character.current_attack += self.number_of_ability('OnRevealPumpFriendliesIfFullMatchingLane')
+                        character.current_health += self.number_2_of_ability('OnRevealPumpFriendliesIfFullMatchingLane')
+                        character.max_health += self.number_2_of_ability('OnRevealPumpFriendliesIfFullMatchingLane')
+                    self.add_basic_animation(animations, game_state)                                
+                    break
+
+    def do_on_reveal_discard_random_card_and_deal_damage_equal_to_cost(self, log: list[str], animations: list, game_state: 'GameState'):
+        if len(game_state.hands_by_player[self.owner_number]) > 0:
+            random_card = game_state.rng.choice(game_state.hands_by_player[self.owner_number])
+            game_state.discard_card(self.owner_number, random_card.id)
+            damage_to_deal = random_card.template.cost
+            defending_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng)
+            if defending_character is not None:
+                if not game_state.headless:
                     animations.append({
                         "event_type": "CharacterAttack",
                         "data": {
@@ -878,49 +920,50 @@ class Character:
                         "game_state": game_state.to_json(),
                     })
 
-                    defending_character.sustain_damage(damage_to_deal, log, animations, game_state)
+                defending_character.sustain_damage(damage_to_deal, log, animations, game_state)
 
-                    self.lane.process_dying_characters(log, animations, game_state) 
+                self.lane.process_dying_characters(log, animations, game_state) 
 
-        if self.has_ability('OnRevealDamageToAll'):
-            self.add_basic_animation(animations, game_state)
-            damage_amount = self.number_of_ability('OnRevealDamageToAll')
-            for character in [*self.lane.characters_by_player[self.owner_number], *self.lane.characters_by_player[1 - self.owner_number]]:
-                character.sustain_damage(damage_amount, log, animations, game_state)
+    def do_on_reveal_damage_to_all(self, log: list[str], animations: list, game_state: 'GameState'):
+        self.add_basic_animation(animations, game_state)
+        damage_amount = self.number_of_ability('OnRevealDamageToAll')
+        for character in [*self.lane.characters_by_player[self.owner_number], *self.lane.characters_by_player[1 - self.owner_number]]:
+            character.sustain_damage(damage_amount, log, animations, game_state)
+            if not game_state.headless:
                 log.append(f"{self.owner_username}'s {self.template.name} dealt {damage_amount} damage to {character.owner_username}'s {character.template.name} in Lane {self.lane.lane_number + 1}. "
                             f"{character.template.name}'s health is now {character.current_health}.")
-            self.lane.process_dying_characters(log, animations, game_state)
-
-        if self.has_ability('OnRevealBonusAttack'):
-            for _ in range(self.number_of_ability('OnRevealBonusAttack')):
-                self.make_bonus_attack(log, animations, game_state)
-            self.lane.process_dying_characters(log, animations, game_state)
-
-        if self.has_ability('OnRevealFriendliesMakeBonusAttack'):
-            self.add_basic_animation(animations, game_state)
-            for character in self.lane.characters_by_player[self.owner_number]:
-                if character.id != self.id:
-                    character.make_bonus_attack(log, animations, game_state)
-            self.lane.process_dying_characters(log, animations, game_state)
+        self.lane.process_dying_characters(log, animations, game_state)
 
-        if self.has_ability('OnRevealAllAttackersMakeBonusAttack'):
-            characters_to_bonus_attack = [character for character in [*game_state.lanes[0].characters_by_player[self.owner_number], *game_state.lanes[1].characters_by_player[self.owner_number], *game_state.lanes[2].characters_by_player[self.owner_number]] if character.is_attacker()]
+    def do_on_reveal_bonus_attack(self, log: list[str], animations: list, game_state: 'GameState'):
+        for _ in range(self.number_of_ability('OnRevealBonusAttack')):
+            self.make_bonus_attack(log, animations, game_state)
+        self.lane.process_dying_characters(log, animations, game_state)
 
-            for character in characters_to_bonus_attack:
+    def do_on_reveal_friendlies_make_bonus_attack(self, log: list[str], animations: list, game_state: 'GameState'):
+        self.add_basic_animation(animations, game_state)
+        for character in self.lane.characters_by_player[self.owner_number]:
+            if character.id != self.id:
                 character.make_bonus_attack(log, animations, game_state)
+        self.lane.process_dying_characters(log, animations, game_state)
 
+    def do_on_reveal_all_attackers_make_bonus_attack(self, log: list[str], animations: list, game_state: 'GameState'):
+        characters_to_bonus_attack = [character for character in [*game_state.lanes[0].characters_by_player[self.owner_number], *game_state.lanes[1].characters_by_player[self.owner_number], *game_state.lanes[2].characters_by_player[self.owner_number]] if character.is_attacker()]
 
-        if self.has_ability('OnRevealStealEnemy'):
-            if len(self.lane.characters_by_player[self.owner_number]) < 4:
-                self.add_basic_animation(animations, game_state)
-                random_enemy_character = self.lane.get_random_enemy_character(self.owner_number)
-                if random_enemy_character is not None:
-                    starting_character_index = [c.id for c in self.lane.characters_by_player[1 - self.owner_number]].index(random_enemy_character.id)
-                    self.lane.characters_by_player[1 - self.owner_number] = [character for character in self.lane.characters_by_player[1 - self.owner_number] if character.id != random_enemy_character.id]
-                    self.lane.characters_by_player[self.owner_number].append(random_enemy_character)
-                    random_enemy_character.owner_number = self.owner_number
-                    random_enemy_character.owner_username = self.owner_username
+        for character in characters_to_bonus_attack:
+            character.make_bonus_attack(log, animations, game_state)
 
+    def do_on_reveal_steal_enemy(self, log: list[str], animations: list, game_state: 'GameState'):
+        if len(self.lane.characters_by_player[self.owner_number]) < 4:
+            self.add_basic_animation(animations, game_state)
+            random_enemy_character = self.lane.get_random_enemy_character(self.owner_number, game_state.rng)
+            if random_enemy_character is not None:
+                starting_character_index = [c.id for c in self.lane.characters_by_player[1 - self.owner_number]].index(random_enemy_character.id)
+                self.lane.remove_character(random_enemy_character)
+                random_enemy_character.owner_number = self.owner_number
+                random_enemy_character.owner_username = self.owner_username
+                self.lane.add_character(random_enemy_character)
+
+                if not game_state.headless:
                     animations.append({
                         'event_type': 'SwitchSides',
                         'data': {
@@ -932,36 +975,34 @@ class Character:
                         "game_state": game_state.to_json(),
                     })
 
-        if self.has_ability('OnRevealEnemiesFight'):
-            if len(self.lane.characters_by_player[1 - self.owner_number]) > 1:
-                self.add_basic_animation(animations, game_state)
-                enemy_attacker = self.lane.get_random_enemy_character(self.owner_number)
-                if enemy_attacker is not None:
-                    enemy_defender = self.lane.get_random_enemy_character(self.owner_number, exclude_characters=lambda c: c.id == enemy_attacker.id)
-                    if enemy_defender is not None:
-                        combat_modification_auras = self.lane.compute_combat_modification_auras()
-                        enemy_attacker.fight(enemy_defender, self.lane.lane_number, combat_modification_auras, log, animations, game_state, friendly=True, do_not_attack_tower=True)
-
-        if self.has_ability('OnRevealEnemiesSwitchLanes'):
+    def do_on_reveal_enemies_fight(self, log: list[str], animations: list, game_state: 'GameState'):
+        if len(self.lane.characters_by_player[1 - self.owner_number]) > 1:
             self.add_basic_animation(animations, game_state)
-            for character in self.lane.characters_by_player[1 - self.owner_number]:
-                character.switch_lanes(log, animations, game_state)
-
-        self.did_on_reveal = True
+            enemy_attacker = self.lane.get_random_enemy_character(self.owner_number, game_state.rng)
+            if enemy_attacker is not None:
+                enemy_defender = self.lane.get_random_enemy_character(self.owner_number, game_state.rng, exclude_characters=lambda c: c.id == enemy_attacker.id)
+                if enemy_defender is not None:
+                    combat_modification_auras = self.lane.compute_combat_modification_auras()
+                    enemy_attacker.fight(enemy_defender, self.lane.lane_number, combat_modification_auras, log, animations, game_state, friendly=True, do_not_attack_tower=True)
+
+    def do_on_reveal_enemies_switch_lanes(self, log: list[str], animations: list, game_state: 'GameState'):
+        self.add_basic_animation(animations, game_state)
+        for character in self.lane.characters_by_player[1 - self.owner_number]:
+            character.switch_lanes(log, animations, game_state)
 
 
-    def get_random_other_friendly_damaged_character(self) -> Optional['Character']:
+    def get_random_other_friendly_damaged_character(self, rng: random.Random) -> Optional['Character']:
         friendly_characters = [character for character in self.lane.characters_by_player[self.owner_number] if character.current_health < character.max_health]
         if len(friendly_characters) == 0:
             return None
         else:
-            return random.choice(friendly_characters)
+            return rng.choice(friendly_characters)
 
 
     def to_json(self):
         return {
             "id": self.id,
-            "template": self.template.to_json(),
+            "template": self.template.to_ref_json(),
             "current_health": self.current_health,
             "shackled_turns": self.shackled_turns,
             "max_health": self.max_health,
@@ -979,6 +1020,41 @@ class Character:
         }
 
 
+    def canonical_key(self) -> tuple:
+        return (
+            self.template.name,
+            self.current_attack,
+            self.current_health,
+            self.max_health,
+            self.shackled_turns,
+            self.has_attacked,
+            self.new,
+            self.did_on_reveal,
+            self.silenced,
+            self.shielded,
+        )
+
+    def clone(self, lane: 'Lane') -> 'Character':
+        character = Character.__new__(Character)
+        character.id = self.id
+        character.template = self.template
+        character.current_health = self.current_health
+        character.max_health = self.max_health
+        character.current_attack = self.current_attack
+        character.shackled_turns = self.shackled_turns
+        character.has_attacked = self.has_attacked
+        character.owner_number = self.owner_number
+        character.owner_username = self.owner_username
+        character.lane = lane
+        character.new = self.new
+        character.escaped_death = self.escaped_death
+        character.did_on_reveal = self.did_on_reveal
+        character.did_end_of_turn = self.did_end_of_turn
+        character.silenced = self.silenced
+        character.shielded = self.shielded
+        return character
+
+
     @staticmethod
     def from_json(json: dict, lane: 'Lane'):
         character = Character(
@@ -986,8 +1062,8 @@ class Character:
             lane=lane,
             owner_number=json['owner_number'],
             owner_username=json['owner_username'],
+            id=json['id'],
         )
-        character.id = json['id']
         character.current_health = json['current_health']
         character.shackled_turns = json['shackled_turns']
         character.max_health = json['max_health']
@@ -1001,3 +1077,37 @@ class Character:
         character.shielded = json['shielded']
         return character
 
+
+ON_REVEAL_HANDLERS: dict[str, Callable[[Character, list[str], list, 'GameState'], None]] = {
+    'OnRevealSilenceLastEnemy': Character.do_on_reveal_silence_last_enemy,
+    'OnRevealSilenceAllCharacters': Character.do_on_reveal_silence_all_characters,
+    'OnRevealShackle': Character.do_on_reveal_shackle,
+    'OnRevealShackleSeveral': Character.do_on_reveal_shackle_several,
+    'OnRevealShackleAllEnemies': Character.do_on_reveal_shackle_all_enemies,
+    'OnRevealPumpFriends': Character.do_on_reveal_pump_friends,
+    'OnRevealPumpAttackers': Character.do_on_reveal_pump_attackers,
+    'OnRevealGainMana': Character.do_on_reveal_gain_mana,
+    'HealFriendlyCharacterAndTower': Character.do_heal_friendly_character_and_tower,
+    'OnRevealHealAllFriendliesAndTowers': Character.do_on_reveal_heal_all_friendlies_and_towers,
+    'OnRevealLaneFightsFirst': Character.do_on_reveal_lane_fights_first,
+    'OnRevealFriendliesSwitchLanes': Character.do_on_reveal_friendlies_switch_lanes,
+    'OnRevealDrawCards': Character.do_on_reveal_draw_cards,
+    'OnRevealDamageSelf': Character.do_on_reveal_damage_self,
+    'OnRevealPumpFriendlyCharactersOfElement': Character.do_on_reveal_pump_friendly_characters_of_element,
+    'OnRevealFillEnemyLaneWithCabbages': Character.do_on_reveal_fill_enemy_lane_with_cabbages,
+    'OnRevealSummonDesna': Character.do_on_reveal_summon_desna,
+    'OnRevealHealAndPumpSelf': Character.do_on_reveal_heal_and_pump_self,
+    'OnRevealDiscard': Character.do_on_reveal_discard,
+    'OnRevealDiscardHandAndPump': Character.do_on_reveal_discard_hand_and_pump,
+    'OnRevealShieldFriendlies': Character.do_on_reveal_shield_friendlies,
+    'OnRevealPumpCardsInHand': Character.do_on_reveal_pump_cards_in_hand,
+    'OnRevealPumpFriendliesIfFullMatchingLane': Character.do_on_reveal_pump_friendlies_if_full_matching_lane,
+    'OnRevealDiscardRandomCardAndDealDamageEqualToCost': Character.do_on_reveal_discard_random_card_and_deal_damage_equal_to_cost,
+    'OnRevealDamageToAll': Character.do_on_reveal_damage_to_all,
+    'OnRevealBonusAttack': Character.do_on_reveal_bonus_attack,
+    'OnRevealFriendliesMakeBonusAttack': Character.do_on_reveal_friendlies_make_bonus_attack,
+    'OnRevealAllAttackersMakeBonusAttack': Character.do_on_reveal_all_attackers_make_bonus_attack,
+    'OnRevealStealEnemy': Character.do_on_reveal_steal_enemy,
+    'OnRevealEnemiesFight': Character.do_on_reveal_enemies_fight,
+    'OnRevealEnemiesSwitchLanes': Character.do_on_reveal_enemies_switch_lanes,
+}
@@ -0,0 +1,117 @@
+import json
+import random
+import sys
+from typing import Callable
+from unittest.mock import MagicMock, patch
+
+from card_templates_list import CARD_TEMPLATES
+from deck import Deck
+from game import Game
+from game_state import GameState
+from lane_rewards import LANE_REWARDS
+
+
+def make_sample_decks() -> dict[int, Deck]:
+    card_pool = [card_name for card_name, card_template in CARD_TEMPLATES.items() if not card_template.not_in_card_pool]
+    return {player_num: Deck(random.choices(card_pool, k=18), f'player_{player_num}', 'Replay check deck') for player_num in [0, 1]}
+
+
+def play_sample_game(seed: int) -> GameState:
+    # Plays out a game the way the app does: mulligans, then random moves, with the state reloaded from JSON between turns
+    random.seed(seed)
+    decks_by_player = make_sample_decks()
+    lane_reward_names = sorted(random.sample(list(LANE_REWARDS), 3), key=lambda lane_reward_name: LANE_REWARDS[lane_reward_name]['priority'])
+
+    game_state = GameState({0: 'player_0', 1: 'player_1'}, decks_by_player, lane_reward_names, seed=seed)
+    game_state.do_start_of_game([])
+    game_state.mulligan_cards(0, [card.id for card in random.sample(game_state.hands_by_player[0], 3)])
+    if seed % 2:
+        game_state.mulligan_all(1)
+
+    while game_state.turn <= 8:
+        game_state = GameState.from_json(json.loads(json.dumps(game_state.to_json())), game_state.server_state_to_json())
+        for player_num in [0, 1]:
+            mana = game_state.mana_by_player[player_num]
+            for card in game_state.hands_by_player[player_num][:]:
+                if card.template.cost <= mana and game_state.play_card(player_num, card.id, random.randint(0, 2)) is not None:
+                    mana -= card.template.cost
+        game_state.record_replay_event(['roll'])
+        game_state.roll_turn([])
+
+    return game_state
+
+
+def play_sample_game_over_http(seed: int) -> GameState:
+    # The same kind of game, played through the API endpoints against an in-memory Redis (fakeredis, from requirements-dev.txt)
+    import fakeredis
+    import app
+    import game_storage
+    import redis_utils
+
+    random.seed(seed)
+    with patch.object(redis_utils, 'redis', fakeredis.FakeRedis()), patch.object(app, 'SessionLocal', MagicMock()):
+        client = app.app.test_client()
+        game = Game({0: 'player_0', 1: 'player_1'}, make_sample_decks())  # type: ignore
+        game.start()
+        game_storage.rset_game(game, with_animations=True)
+        assert game.game_info is not None
+
+        client.post(f'/api/games/{game.id}/mulligan', json={'username': 'player_0', 'cards': [card.id for card in random.sample(game.game_info.game_state.hands_by_player[0], 3)]})
+        if seed % 2:
+            client.post(f'/api/games/{game.id}/mulligan_all', json={'username': 'player_1', 'mulliganing': True})
+
+        while True:
+            game = game_storage.rget_game(game.id)
+            assert game is not None and game.game_info is not None
+            game_state = game.game_info.game_state
+            if game_state.turn > 8:
+                break
+            for player_num in [0, 1]:
+                mana = game_state.mana_by_player[player_num]
+                # Playing a card can change the rest of the hand, so only cards still in the staged game's hand are played
+                staged_card_ids = {card.id for card in game_state.hands_by_player[player_num]}
+                for card in game_state.hands_by_player[player_num]:
+                    if card.id in staged_card_ids and card.template.cost <= mana:
+                        response = client.post(f'/api/games/{game.id}/play_card', json={'cardId': card.id, 'laneNumber': random.randint(0, 2), 'playerNum': player_num})
+                        staged_card_ids = {card_json['id'] for card_json in response.json['game']['game_info']['game_state']['hands_by_player'][str(player_num)]}  # type: ignore
+                        mana -= card.template.cost
+            for player_num in [0, 1]:
+                client.post(f'/api/games/{game.id}/submit_turn', json={'playerNum': player_num})
+
+        game_storage.GAME_CACHE.entries.clear()
+        return game_state
+
+
+def comparable_json(game_state: GameState) -> str:
+    # Replays don't keep deck ids, and mark both players as mulliganed once the first turn rolls
+    game_state_json = game_state.to_json()
+    game_state_json['decks_by_player'] = {player_num: {**deck_json, 'id': None} for player_num, deck_json in game_state_json['decks_by_player'].items()}
+    game_state_json['has_mulliganed_by_player'] = None
+    return json.dumps(game_state_json, sort_keys=True)
+
+
+def check_replays(num_games: int = 30, play_game: Callable[[int], GameState] = play_sample_game) -> int:
+    num_mismatches = 0
+    for seed in range(num_games):
+        game_state = play_game(seed)
+        try:
+            replayed_game_state = GameState.from_replay(json.loads(json.dumps(game_state.replay_to_json())))
+            matches = comparable_json(replayed_game_state) == comparable_json(game_state)
+        except Exception as e:
+            print(f'Game {seed}: replay failed with {e!r}')
+            matches = False
+        else:
+            if not matches:
+                print(f'Game {seed}: replay ended in a different state')
+        num_mismatches += not matches
+    print(f'{num_games - num_mismatches}/{num_games} games replayed identically')
+    return num_mismatches
+
+
+if __name__ == '__main__':
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    num_mismatches = 0
+    for play_game in [play_sample_game, play_sample_game_over_http]:
+        print(f'== {play_game.__name__} ==')
+        num_mismatches += check_replays(num_games, play_game)
+    sys.exit(1 if num_mismatches else 0)
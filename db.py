@@ -1,6 +1,7 @@
 import db_deck
 import db_game
 import game_state_record
+import game_replay
 import draft_pick
 import draft_choice
 import card_outcome
@@ -1,26 +1,26 @@
 from typing import Optional
 from card_templates_list import CARD_TEMPLATES
 from db_deck import DbDeck
-from utils import generate_unique_id
+from utils import IdAllocator, generate_unique_id
 
 from card import Card
 from card_template import CardTemplate
 
 class Deck:
-    def __init__(self, cards: list[str], username: str, name: str, associated_lane_reward_name: Optional[str] = None):
-        self.id = generate_unique_id()
+    def __init__(self, cards: list[str], username: str, name: str, associated_lane_reward_name: Optional[str] = None, id: Optional[str] = None):
+        self.id = id if id is not None else generate_unique_id()
         self.card_templates = [CARD_TEMPLATES[card_name] for card_name in cards]
         self.username = username
         self.name = name
         self.associated_lane_reward_name = associated_lane_reward_name
         
-    def to_draw_pile(self):
-        return [Card.from_template(card_template) for card_template in self.card_templates]
+    def to_draw_pile(self, id_allocator: IdAllocator):
+        return [Card.from_template(card_template, id_allocator.allocate()) for card_template in self.card_templates]
     
     def to_json(self):
         return {
             "id": self.id,
-            "card_templates": [card_template.to_json() for card_template in self.card_templates],
+            "card_templates": [card_template.to_ref_json() for card_template in self.card_templates],
             "username": self.username,
             "name": self.name,
             "associated_lane_reward_name": self.associated_lane_reward_name,
@@ -29,12 +29,10 @@ class Deck:
     @staticmethod
     def from_json(json):
         deck = Deck([CardTemplate.from_json(card_template).name for card_template in json['card_templates']], 
-                    json['username'], json['name'], json.get('associated_lane_reward_name'))
-        deck.id = json['id']
+                    json['username'], json['name'], json.get('associated_lane_reward_name'), json['id'])
         return deck
     
     @staticmethod
     def from_db_deck(db_deck: DbDeck):
-        deck = Deck([card.name for card in db_deck.cards], db_deck.username, db_deck.name, db_deck.associated_lane_reward_name)  # type: ignore
-        deck.id = db_deck.id
+        deck = Deck([card.name for card in db_deck.cards], db_deck.username, db_deck.name, db_deck.associated_lane_reward_name, db_deck.id)  # type: ignore
         return deck
\ No newline at end of file
@@ -26,7 +26,7 @@ import TcgCard from './TcgCard';
 import { URL, HOW_TO_PLAY_URL } from './settings';
 import { useNavigate } from 'react-router-dom';
 import { Link } from 'react-router-dom';
-import { objectToArray, generateRandomString } from './utils';
+import { objectToArray, generateRandomString, expandCardTemplates } from './utils';
 import { useSocket } from './SocketContext';
 import LaneRewardDisplay from './LaneRewardDisplay';
 import Timer from './Timer';
@@ -328,6 +328,7 @@ function DeckBuilder({ cards, laneRewards }) {
   const fetchDecks = () => {
     fetch(`${URL}/api/decks?username=${userName}&rand=${Math.random()}}`)
       .then(response => response.json())
+      .then(data => expandCardTemplates(data))
       .then(data => setDecks(data))
       .catch(error => {
         setErrorMessage("Failed to fetch decks.");
@@ -385,6 +386,7 @@ function DeckBuilder({ cards, laneRewards }) {
       }
       return response.json();
     })
+    .then(data => expandCardTemplates(data))
     .then(data => {
       setDecks(prevDecks => [...prevDecks, data]); // Assuming your backend returns the saved deck
       setCurrentDeck([]);
@@ -13,7 +13,7 @@ import Divider from '@mui/material/Divider';
 import Paper from '@mui/material/Paper';
 import { ListItemSecondaryAction, useTheme } from '@mui/material';
 import Box from '@mui/material/Box';
-import { snakeCase, getCardBackgroundColor } from './utils';
+import { snakeCase, getCardBackgroundColor, loadGameAnimations, expandCardTemplates } from './utils';
 import { Card, CardContent, Grid, Typography } from '@mui/material';
 import battleOld from './battleOld.webp';
 import './arrow.css';
@@ -1406,7 +1406,7 @@ export default function GamePage({ }) {
     const pollApiForGameUpdates = async (playAnimations) => {
         try {
             const response = await fetch(`${URL}/api/games/${gameId}?playerNum=${playerNum}`);
-            const data = await response.json();
+            const data = await expandCardTemplates(await loadGameAnimations(await response.json()));
 
             // Check the data for the conditions you want. For example:
             if (!data.game_info.game_state.has_moved_by_player[playerNum]) {
@@ -1486,6 +1486,8 @@ export default function GamePage({ }) {
         log('useEffect fetch');
         fetch(`${URL}/api/games/${gameId}?playerNum=${playerNum}`)
             .then(res => res.json())
+            .then(data => loadGameAnimations(data))
+            .then(data => expandCardTemplates(data))
             .then(data => {
                 setGame(data);
                 setGameState(data?.game_info?.game_state);
@@ -1545,6 +1547,7 @@ export default function GamePage({ }) {
         })
             .then(response => response.json())
             .then(data => {
+                // Only the game id comes back; if the turn rolled, the new game arrives through the socket's update
                 log(data);
                 if (submittedMove) {
                     setSubmittedMove(false);
@@ -1573,6 +1576,10 @@ export default function GamePage({ }) {
                 body: JSON.stringify(payload)
             })
             .then(response => response.json())
+            .then(async data => {
+                await loadGameAnimations(data.game);
+                return expandCardTemplates(data);
+            })
             .then(data => {
                 console.log(data);
                 setGame(data.game);
@@ -1696,6 +1703,7 @@ export default function GamePage({ }) {
                     onClick={() => {
                         fetch(`${URL}/api/old_game_states/${gameStateRecordId}`)
                             .then(res => res.json())
+                            .then(data => expandCardTemplates(data))
                             .then(data => {
                                 setGameState(data);
                                 setLaneData(null);
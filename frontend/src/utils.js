@@ -1,3 +1,5 @@
+import { URL } from './settings';
+
 export function snakeCase(str) {
     return str.toLowerCase().replace(/[- ]/g, '_').replace(/[\.\']/g, '');
 }
@@ -41,4 +43,104 @@ export const formatPercentage = (value) => {
         style: 'percent',
         maximumFractionDigits: 2, // You can adjust the number of decimal places
     }).format(value);
-};
\ No newline at end of file
+};
+
+function applyGameStatePatch(gameState, patch) {
+    // Each operation is ['s', path, value] (set the value at path) or ['a', path, values] (append to the list at path)
+    for (const [op, path, value] of patch) {
+        const copiedValue = JSON.parse(JSON.stringify(value));
+        if (path.length === 0) {
+            if (op === 's') {
+                gameState = copiedValue;
+            } else {
+                gameState.push(...copiedValue);
+            }
+            continue;
+        }
+        let container = gameState;
+        for (const key of path.slice(0, -1)) {
+            container = container[key];
+        }
+        const lastKey = path[path.length - 1];
+        if (op === 's') {
+            container[lastKey] = copiedValue;
+        } else {
+            container[lastKey].push(...copiedValue);
+        }
+    }
+    return gameState;
+}
+
+export function expandAnimations(animations) {
+    let gameState = null;
+    return (animations || []).map(animation => {
+        if (animation.game_state) {
+            gameState = animation.game_state;
+        } else {
+            gameState = applyGameStatePatch(JSON.parse(JSON.stringify(gameState)), animation.game_state_patch || []);
+        }
+        const { game_state_patch, ...rest } = animation;
+        return { ...rest, game_state: gameState };
+    });
+}
+
+export function expandGameAnimations(game) {
+    if (game?.game_info?.animations) {
+        game.game_info.animations = expandAnimations(game.game_info.animations);
+    }
+    return game;
+}
+
+// Each turn's animations are stored once, apart from the game, and fetched the first time a game refers to them
+const animationsByGameAndTurn = {};
+
+export async function loadGameAnimations(game) {
+    const gameInfo = game?.game_info;
+    if (gameInfo && !(gameInfo.animations?.length > 0) && gameInfo.animations_turn !== undefined && gameInfo.animations_turn !== null) {
+        const cacheKey = `${game.id}:${gameInfo.animations_turn}`;
+        if (animationsByGameAndTurn[cacheKey] === undefined) {
+            const response = await fetch(`${URL}/api/games/${game.id}/animations/${gameInfo.animations_turn}`);
+            animationsByGameAndTurn[cacheKey] = await response.json();
+        }
+        gameInfo.animations = animationsByGameAndTurn[cacheKey];
+    }
+    return expandGameAnimations(game);
+}
+
+// Games refer to recorded card templates as { name, template_version }; these are the full templates we've fetched so far
+const cardTemplatesByVersion = {};
+
+function isCardTemplateReference(value) {
+    return value !== null && typeof value === 'object' && value.template_version !== undefined && value.abilities === undefined;
+}
+
+function collectCardTemplateVersions(value, versions) {
+    if (isCardTemplateReference(value)) {
+        versions.add(value.template_version);
+    } else if (value !== null && typeof value === 'object') {
+        Object.values(value).forEach(child => collectCardTemplateVersions(child, versions));
+    }
+}
+
+function fillCardTemplates(value) {
+    if (isCardTemplateReference(value)) {
+        return cardTemplatesByVersion[value.template_version] || value;
+    }
+    if (value !== null && typeof value === 'object') {
+        for (const key of Object.keys(value)) {
+            value[key] = fillCardTemplates(value[key]);
+        }
+    }
+    return value;
+}
+
+export async function expandCardTemplates(value) {
+    const versions = new Set();
+    collectCardTemplateVersions(value, versions);
+    const missingVersions = [...versions].filter(version => cardTemplatesByVersion[version] === undefined);
+    if (missingVersions.length > 0) {
+        const response = await fetch(`${URL}/api/card_templates?versions=${missingVersions.join(',')}`);
+        Object.assign(cardTemplatesByVersion, await response.json());
+    }
+    return fillCardTemplates(value);
+}
@@ -52,6 +52,15 @@ class Game:
         return next((player_num for player_num, player_username in self.usernames_by_player.items() if player_username == username), None)
 
 
+    def clone(self) -> 'Game':
+        game = Game(self.usernames_by_player.copy(), self.decks_by_player.copy(), self.seconds_per_turn, self.id)
+        game.game_info = self.game_info.clone() if self.game_info is not None else None
+        game.created_at = self.created_at
+        game.rematch_game_id = self.rematch_game_id
+        game.is_bot_by_player = self.is_bot_by_player.copy()
+        return game
+
+
     def to_json(self):
         return {
             "id": self.id,
@@ -65,13 +74,18 @@ class Game:
         }
     
 
+    def server_state_to_json(self) -> Optional[dict]:
+        # Not for clients; see GameState.server_state_to_json
+        return self.game_info.game_state.server_state_to_json() if self.game_info is not None else None
+
+
     @staticmethod
-    def from_json(json):
+    def from_json(json, server_state_json: Optional[dict] = None):
         game = Game(json['usernames_by_player'], 
                     {k: Deck.from_json(v) if v is not None else None for k, v in json['decks_by_player'].items()},
-                    json.get('seconds_per_turn'),)
-        game.id = json['id']
-        game.game_info = GameInfo.from_json(json['game_info']) if json['game_info'] is not None else None
+                    json.get('seconds_per_turn'),
+                    json['id'])
+        game.game_info = GameInfo.from_json(json['game_info'], server_state_json) if json['game_info'] is not None else None
         game.created_at = json['created_at']
         game.rematch_game_id = json['rematch_game_id']
         game.is_bot_by_player = json['is_bot_by_player']
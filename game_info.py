@@ -1,3 +1,5 @@
+from typing import Optional
+
 from game_state import GameState
 
 
@@ -9,6 +11,8 @@ class GameInfo:
     def to_json(self) -> dict:
         return {
             "animations": self.animations,
+            # Animations are stored separately, once per turn; this is the turn to fetch them for
+            "animations_turn": self.game_state.turn if self.game_state is not None else None,
             "game_state": self.game_state.to_json() if self.game_state is not None else None,
         }
     
@@ -16,10 +20,16 @@ class GameInfo:
         self.game_state.do_start_of_game(self.animations)
 
     def roll_turn(self, sess, game_id: str):
-        self.game_state.roll_turn(self.animations, sess, game_id, self)
+        self.game_state.record_replay_event(['roll'])
+        self.game_state.roll_turn(self.animations, sess, game_id)
+
+    def clone(self) -> 'GameInfo':
+        game_info = GameInfo(self.game_state.clone())
+        game_info.animations = self.animations[:]
+        return game_info
 
     @staticmethod
-    def from_json(json: dict) -> 'GameInfo':
-        game_info = GameInfo(GameState.from_json(json['game_state']))
-        game_info.animations = json['animations']
+    def from_json(json: dict, server_state_json: Optional[dict] = None) -> 'GameInfo':
+        game_info = GameInfo(GameState.from_json(json['game_state'], server_state_json))
+        game_info.animations = json.get('animations') or []
         return game_info
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import Column, DateTime, ForeignKey, String, func
+from sqlalchemy.orm import relationship
+from database import Base
+from sqlalchemy.dialects.postgresql import JSONB
+from db_game import DbGame
+
+
+class GameReplay(Base):
+    __tablename__ = "game_replays"
+
+    game_id = Column(String, ForeignKey("db_games.id"), primary_key=True)
+    game = relationship(DbGame, backref="game_replays")
+
+    # Seed, decks, lane rewards and the ordered list of mulligans, plays and rolls; see GameState.replay_to_json
+    replay = Column(JSONB, nullable=False)
+
+    created_at = Column(DateTime, nullable=False, server_default=func.now(), index=True)
+    updated_at = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<GameReplay: Game {self.game_id}>"
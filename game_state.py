@@ -5,22 +5,29 @@ from card_template import CardTemplate
 from card_templates_list import CARD_TEMPLATES
 from db_deck import DbDeck
 from deck import Deck
+from game_replay import GameReplay
 from game_state_record import GameStateRecord
 from lane import Lane
 from card import Card
-from typing import TYPE_CHECKING, Any, Optional
+from typing import TYPE_CHECKING, Any, Iterator, Optional
 import math
 from player_outcome import PlayerOutcome
 
-from utils import sigmoid
+from utils import IdAllocator, SequentialIdAllocator, compress_animations, generate_seed, id_allocator_from_json, rng_from_json, rng_state_to_json, sigmoid
 
 if TYPE_CHECKING:
     from character import Character
-    from game_info import GameInfo
 
 
 class GameState:
-    def __init__(self, usernames_by_player: dict[int, str], decks_by_player: dict[int, Deck], lane_rewards: list[str]):
+    def __init__(self, usernames_by_player: dict[int, str], decks_by_player: dict[int, Deck], lane_rewards: list[str], headless: bool = False, seed: Optional[int] = None, 
+                 id_allocator: Optional[IdAllocator] = None):
+        # Headless game states (bot rollouts, offline simulations) skip building animations and log lines
+        self.headless = headless
+        # All of the game's randomness comes from here, so a game can be reproduced from its seed and moves
+        self.seed = seed if seed is not None else generate_seed()
+        self.rng = random.Random(self.seed)
+        self.id_allocator = id_allocator if id_allocator is not None else SequentialIdAllocator()
         self.lane_reward_names = lane_rewards
         self.lanes = [Lane(lane_number, lane_reward_str) for (lane_number, lane_reward_str) in zip(list(range(3)), lane_rewards)]
         self.turn = 0
@@ -38,11 +45,13 @@ class GameState:
         self.winner = None
         self.last_timer_start: Optional[float] = None
         self.cards_ever_drawn_by_player = {0: [card.template.name for card in self.player_0_hand], 1: [card.template.name for card in self.player_1_hand]}
+        # Mulligans, plays and rolls since the start of the game; together with the seed this is enough to rebuild the game
+        self.replay_events: list[list] = []
         self.roll_turn([])
 
     def draw_initial_hand(self, deck: Deck):
-        draw_pile = deck.to_draw_pile()
-        random.shuffle(draw_pile)
+        draw_pile = deck.to_draw_pile(self.id_allocator)
+        self.rng.shuffle(draw_pile)
         hand = draw_pile[:3]
         draw_pile = draw_pile[3:]
         return hand, draw_pile
@@ -50,6 +59,7 @@ class GameState:
     def do_start_of_game(self, animations: list, seconds_per_turn: Optional[int] = None):
         for lane in self.lanes:
             lane.do_start_of_game(self.log, animations, self)
+        compress_animations(animations)
 
     def draw_card(self, player_num: int):
         if len(self.hands_by_player[player_num]) < 7:
@@ -57,40 +67,38 @@ class GameState:
                 self.hands_by_player[player_num].append(self.draw_piles_by_player[player_num][0])
                 self.draw_piles_by_player[player_num] = self.draw_piles_by_player[player_num][1:]
                 self.cards_ever_drawn_by_player[player_num].append(self.hands_by_player[player_num][-1].template.name)
-            else:
+            elif not self.headless:
                 self.log.append(f"{self.usernames_by_player[player_num]} has no cards left in their deck.")
-        else:
+        elif not self.headless:
             self.log.append(f"{self.usernames_by_player[player_num]} has a full hand.")
         self.run_card_draw_triggers(player_num)
 
     def draw_random_card(self, player_num: int):
         if len(self.hands_by_player[player_num]) < 7:
-            random_template = random.choice([card_template for card_template in CARD_TEMPLATES.values() if not card_template.not_in_card_pool])
-            self.hands_by_player[player_num].append(Card(random_template))
+            random_template = self.rng.choice([card_template for card_template in CARD_TEMPLATES.values() if not card_template.not_in_card_pool])
+            self.hands_by_player[player_num].append(Card(random_template, self.id_allocator.allocate()))
             self.cards_ever_drawn_by_player[player_num].append(random_template.name)
-        else:
+        elif not self.headless:
             self.log.append(f"{self.usernames_by_player[player_num]} has a full hand.")
         self.run_card_draw_triggers(player_num)
 
     def run_card_draw_triggers(self, player_num: int):
-        for lane in self.lanes:
-            for character in lane.characters_by_player[player_num]:
-                if character.has_ability('OnDrawCardPump'):
-                    character.current_attack += character.number_of_ability('OnDrawCardPump')
-                    character.current_health += character.number_2_of_ability('OnDrawCardPump')
-                    character.max_health += character.number_2_of_ability('OnDrawCardPump')
+        for character in self.subscribers_to(player_num, 'draw_card'):
+            if character.has_ability('OnDrawCardPump'):
+                character.current_attack += character.number_of_ability('OnDrawCardPump')
+                character.current_health += character.number_2_of_ability('OnDrawCardPump')
+                character.max_health += character.number_2_of_ability('OnDrawCardPump')
 
     def discard_card(self, player_num: int, card_id: str):
         self.hands_by_player[player_num] = [card for card in self.hands_by_player[player_num] if card.id != card_id]
         self.run_card_discard_triggers(player_num)
 
     def run_card_discard_triggers(self, player_num: int):
-        for lane in self.lanes:
-            for character in lane.characters_by_player[player_num]:
-                if character.has_ability('OnDiscardPump'):
-                    character.current_attack += character.number_of_ability('OnDiscardPump')
-                    character.current_health += character.number_2_of_ability('OnDiscardPump')
-                    character.max_health += character.number_2_of_ability('OnDiscardPump')
+        for character in self.subscribers_to(player_num, 'discard_card'):
+            if character.has_ability('OnDiscardPump'):
+                character.current_attack += character.number_of_ability('OnDiscardPump')
+                character.current_health += character.number_2_of_ability('OnDiscardPump')
+                character.max_health += character.number_2_of_ability('OnDiscardPump')
 
     def discard_all_cards(self, player_num: int):
         card_ids = [card.id for card in self.hands_by_player[player_num]]
@@ -101,45 +109,56 @@ class GameState:
         if self.has_mulliganed_by_player[player_num]:
             return
         self.has_mulliganed_by_player[player_num] = True
-        self.log.append(f"{self.usernames_by_player[player_num]} mulliganed their hand.")
+        if not self.headless:
+            self.log.append(f"{self.usernames_by_player[player_num]} mulliganed their hand.")
+        self.record_replay_event(['mulligan_all', player_num])
         cards_in_hand = self.hands_by_player[player_num][:]
         for card in cards_in_hand:
-            self.mulligan_card(player_num, card.id)
+            self.mulligan_card_inner(player_num, card.id)
 
     def mulligan_card(self, player_num: int, card_id: str):
+        self.record_replay_event(['mulligan', player_num, [card.id for card in self.hands_by_player[player_num]].index(card_id)])
+        self.mulligan_card_inner(player_num, card_id)
+
+    def mulligan_card_inner(self, player_num: int, card_id: str):
         self.draw_piles_by_player[player_num].append([card for card in self.hands_by_player[player_num] if card.id == card_id][0])
         self.hands_by_player[player_num] = [card for card in self.hands_by_player[player_num] if card.id != card_id]
-        self.log.append(f"{self.usernames_by_player[player_num]} mulliganed a card.")
+        if not self.headless:
+            self.log.append(f"{self.usernames_by_player[player_num]} mulliganed a card.")
         self.draw_card(player_num)
 
     def mulligan_cards(self, player_num: int, cards: list[str]):
         if self.has_mulliganed_by_player[player_num]:
             return   
+        hand_card_ids = [card.id for card in self.hands_by_player[player_num]]
+        # Recorded in the order the player chose, since replaying the event repeats the shuffle with the game's rng
+        self.record_replay_event(['mulligan_cards', player_num, [hand_card_ids.index(card_id) for card_id in cards]])
         cards = cards[:]   
-        random.shuffle(cards)  
+        self.rng.shuffle(cards)  
         for card_id in cards:
-            self.mulligan_card(player_num, card_id)
+            self.mulligan_card_inner(player_num, card_id)
         self.has_mulliganed_by_player[player_num] = True
 
-    def roll_turn(self, animations: list, sess: Optional[Any] = None, game_id: Optional[str] = None, game_info: Optional['GameInfo'] = None):
-        game_state_record = None
+    def roll_turn(self, animations: list, sess: Optional[Any] = None, game_id: Optional[str] = None):
         if sess:
-            game_state_record = GameStateRecord(
+            # The turn's state can be rebuilt from the game's replay, so we don't snapshot it
+            sess.add(GameStateRecord(
                 game_id=game_id, 
                 turn=self.turn,
                 player_0_username=self.usernames_by_player[0],
                 player_1_username=self.usernames_by_player[1],
-                game_state=self.to_json(),
-            )
-            sess.add(game_state_record)
+                seed=self.seed,
+            ))
+            sess.merge(GameReplay(game_id=game_id, replay=self.replay_to_json()))
             sess.commit()
 
         animations.clear()
-        animations.append({
-            'event_type': 'StartOfRoll',
-            'data': {},
-            'game_state': self.to_json(),
-        })
+        if not self.headless:
+            animations.append({
+                'event_type': 'StartOfRoll',
+                'data': {},
+                'game_state': self.to_json(),
+            })
         for player_num in [0, 1]:
             self.mana_by_player[player_num] = self.turn + 1   
         for lane in self.lanes:
@@ -148,16 +167,19 @@ class GameState:
             lane.roll_turn(self.log, animations, self)
         for lane in self.lanes:
             lane.do_end_of_turn(self.log, animations, self)
-        animations.append({
-                        "event_type": "EndOfRoll",
-                        'data': {},
-                        'game_state': self.to_json(),
-                    })
-                    
+        if not self.headless:
+            animations.append({
+                'event_type': 'EndOfRoll',
+                'data': {},
+                'game_state': self.to_json(),
+            })
+        compress_animations(animations)
+
         if self.turn < 8:
             for player_num in [0, 1]:
                 self.draw_card(player_num)
-        self.log.append(f"Turn {self.turn}")
+        if not self.headless:
+            self.log.append(f"Turn {self.turn}")
         self.has_moved_by_player = {0: False, 1: False}
         self.done_with_animations_by_player = {0: False, 1: False}
         self.last_timer_start = None
@@ -165,34 +187,34 @@ class GameState:
         #     self.log.append("The moon rises.")
         #     self.mana_by_player = {0: 0, 1: 0}
 
-        if sess and game_info:
-            assert game_state_record is not None
-            game_state_record.game_info = game_info.to_json()  # type: ignore
-            sess.commit()
-
         if self.turn == 8:
-            self.log.append("The moon is full.")
+            if not self.headless:
+                self.log.append("The moon is full.")
             
             lane_winners = [lane.compute_winner() for lane in self.lanes]
 
             num_lanes_won_by_player = {player_num: sum([1 for lane_winner in lane_winners if lane_winner == player_num]) for player_num in [0, 1]}
 
             if num_lanes_won_by_player[0] > num_lanes_won_by_player[1]:
-                self.log.append(f"{self.usernames_by_player[0]} won the game!")
+                if not self.headless:
+                    self.log.append(f"{self.usernames_by_player[0]} won the game!")
                 self.winner = 0
 
             if num_lanes_won_by_player[1] > num_lanes_won_by_player[0]:
-                self.log.append(f"{self.usernames_by_player[1]} won the game!")
+                if not self.headless:
+                    self.log.append(f"{self.usernames_by_player[1]} won the game!")
                 self.winner = 1
 
             if num_lanes_won_by_player[0] == num_lanes_won_by_player[1]:
                 total_damage_by_player = {player_num: sum([lane.damage_by_player[player_num] for lane in self.lanes]) for player_num in [0, 1]}
                 if total_damage_by_player[0] > total_damage_by_player[1]:
-                    self.log.append(f"{self.usernames_by_player[0]} won the game!")
+                    if not self.headless:
+                        self.log.append(f"{self.usernames_by_player[0]} won the game!")
                     self.winner = 0
                 
                 if total_damage_by_player[1] > total_damage_by_player[0]:
-                    self.log.append(f"{self.usernames_by_player[1]} won the game!")
+                    if not self.headless:
+                        self.log.append(f"{self.usernames_by_player[1]} won the game!")
                     self.winner = 1
 
             if sess and self.winner is not None and self.usernames_by_player[1] not in ["GOLDA_THE_GOLDFISH", "RANDY_THE_ROBOT"]:
@@ -237,21 +259,26 @@ class GameState:
 
         self.turn += 1
 
-    def play_card(self, player_num: int, card_id: str, lane_number: int) -> Optional['Character']:
+    def play_card(self, player_num: int, card_id: str, lane_number: int, record_replay_event: bool = True) -> Optional['Character']:
+        # Plays made by effects during a roll are repeated when the replay rolls the turn, so they aren't recorded
         if len(self.lanes[lane_number].characters_by_player[player_num]) < 4:
             card = [card for card in self.hands_by_player[player_num] if card.id == card_id][0]
+            if record_replay_event:
+                self.record_replay_event(['play', player_num, self.hands_by_player[player_num].index(card), lane_number])
             self.hands_by_player[player_num] = [card for card in self.hands_by_player[player_num] if card.id != card_id]
             character = card.to_character(self.lanes[lane_number], player_num, self.usernames_by_player[player_num])
-            self.lanes[lane_number].characters_by_player[player_num].append(character)
-            self.log.append(f"{self.usernames_by_player[player_num]} played {card.template.name} in Lane {lane_number + 1}.")
+            self.lanes[lane_number].add_character(character)
+            if not self.headless:
+                self.log.append(f"{self.usernames_by_player[player_num]} played {card.template.name} in Lane {lane_number + 1}.")
             return character
 
     # Should be used only by bots
     def play_card_from_template(self, player_num: int, card_template: CardTemplate, lane_number: int):
-        card = Card(card_template)
+        card = Card(card_template, self.id_allocator.allocate())
         character = card.to_character(self.lanes[lane_number], player_num, self.usernames_by_player[player_num])
-        self.lanes[lane_number].characters_by_player[player_num].append(character)
-        self.log.append(f"{self.usernames_by_player[player_num]} played {card_template.name} in Lane {lane_number + 1}.")
+        self.lanes[lane_number].add_character(character)
+        if not self.headless:
+            self.log.append(f"{self.usernames_by_player[player_num]} played {card_template.name} in Lane {lane_number + 1}.")
 
     def all_players_have_moved(self) -> bool:
         return all([self.has_moved_by_player[player_num] for player_num in [0, 1]])
@@ -264,7 +291,7 @@ class GameState:
             return None
         probability_of_moving_to_first_other_lane = empty_slots_by_lane_number_in_other_lanes[other_lane_numbers[0]] / total_empty_slots
 
-        if random.random() < probability_of_moving_to_first_other_lane:
+        if self.rng.random() < probability_of_moving_to_first_other_lane:
             target_lane_number = other_lane_numbers[0]
         else:
             target_lane_number = other_lane_numbers[1]
@@ -276,7 +303,93 @@ class GameState:
         lanes_with_empty_slots = [lane_number for lane_number in [0, 1, 2] if len(self.lanes[lane_number].characters_by_player[player_num]) < 4]
         if lanes_with_empty_slots == []:
             return None
-        return random.choice(lanes_with_empty_slots)    
+        return self.rng.choice(lanes_with_empty_slots)    
+
+    def subscribers_to(self, player_num: int, event: str) -> Iterator['Character']:
+        # Each lane's subscriber list is only picked up once the previous lanes are done, as with a loop over every lane's characters
+        for lane in self.lanes:
+            yield from lane.subscribers_to(player_num, event)
+
+    def record_replay_event(self, event: list) -> None:
+        # Card ids aren't reproducible, so cards are referred to by their position in the hand
+        if not self.headless:
+            self.replay_events.append(event)
+
+    def replay_to_json(self) -> dict:
+        return {
+            "version": 2,
+            "seed": self.seed,
+            "usernames_by_player": self.usernames_by_player,
+            "decks_by_player": {player_num: {
+                # By template version, so that later balance changes don't change how the game replays
+                "card_templates": [card_template.to_ref_json() for card_template in deck.card_templates],
+                "username": deck.username,
+                "name": deck.name,
+                "associated_lane_reward_name": deck.associated_lane_reward_name,
+            } for player_num, deck in self.decks_by_player.items()},
+            "lane_reward_names": self.lane_reward_names,
+            "events": self.replay_events,
+        }
+
+    @staticmethod
+    def from_replay(replay_json: dict, turn: Optional[int] = None) -> 'GameState':
+        # Rebuilds the game as it was when turn `turn` was about to be rolled, or as it is now if no turn is given
+        decks_by_player = {int(player_num): Deck(deck_json.get('cards', []), deck_json['username'], deck_json['name'], deck_json.get('associated_lane_reward_name'))
+                           for player_num, deck_json in replay_json['decks_by_player'].items()}
+        for player_num, deck_json in replay_json['decks_by_player'].items():
+            # Version 1 replays only have card names, which are played with the current templates
+            if 'card_templates' in deck_json:
+                decks_by_player[int(player_num)].card_templates = [CardTemplate.from_json(card_template_json) for card_template_json in deck_json['card_templates']]
+        game_state = GameState({int(k): v for k, v in replay_json['usernames_by_player'].items()}, decks_by_player, replay_json['lane_reward_names'], seed=replay_json['seed'])
+        game_state.do_start_of_game([])
+
+        for event in replay_json['events']:
+            if event[0] == 'mulligan':
+                _, player_num, hand_index = event
+                game_state.mulligan_card(player_num, game_state.hands_by_player[player_num][hand_index].id)
+            elif event[0] == 'mulligan_cards':
+                _, player_num, hand_indices = event
+                game_state.mulligan_cards(player_num, [game_state.hands_by_player[player_num][hand_index].id for hand_index in hand_indices])
+            elif event[0] == 'mulligan_all':
+                _, player_num = event
+                game_state.mulligan_all(player_num)
+            elif event[0] == 'play':
+                _, player_num, hand_index, lane_number = event
+                game_state.play_card(player_num, game_state.hands_by_player[player_num][hand_index].id, lane_number)
+                game_state.has_moved_by_player[player_num] = True
+            elif event[0] == 'roll':
+                if game_state.turn == turn:
+                    break
+                game_state.record_replay_event(event)
+                game_state.has_mulliganed_by_player = {0: True, 1: True}
+                game_state.roll_turn([])
+
+        return game_state
+
+    def reseed(self, seed: int) -> None:
+        self.seed = seed
+        self.rng = random.Random(seed)
+
+    def canonical_key(self) -> tuple:
+        # Identifies a position regardless of character ids and the order characters were played in.
+        # Rollouts play and discard the cards in hand and draw from the draw pile, so those cards are part of it too.
+        return (
+            self.turn,
+            tuple(self.mana_by_player[player_num] for player_num in [0, 1]),
+            tuple(tuple(sorted(card.template.name for card in self.hands_by_player[player_num])) for player_num in [0, 1]),
+            tuple(tuple(sorted(card.template.name for card in self.draw_piles_by_player[player_num])) for player_num in [0, 1]),
+            tuple(lane.canonical_key() for lane in self.lanes),
+        )
+
+    def server_state_to_json(self) -> dict:
+        # Kept out of to_json, which is sent to clients: with the rng state they could predict every draw and random effect,
+        # and they have no use for the id counter or the replay log
+        return {
+            "seed": self.seed,
+            "rng_state": rng_state_to_json(self.rng),
+            "next_entity_id": self.id_allocator.to_json(),
+            "replay_events": self.replay_events,
+        }
 
     def to_json(self):
         return {
@@ -298,9 +411,11 @@ class GameState:
         }
     
     @staticmethod
-    def from_json(json):
+    def from_json(json, server_state_json: Optional[dict] = None):
+        # Game states saved before the server state was stored separately carry it in json
+        server_state_json = server_state_json or json
         decks_by_player_json = {int(k): Deck.from_json(v) for k, v in json['decks_by_player'].items()} if json.get('decks_by_player') else {0: Deck([], '', ''), 1: Deck([], '', '')}
-        game_state = GameState({int(k): v for k, v in json['usernames_by_player'].items()}, decks_by_player_json, json['lane_reward_names'])
+        game_state = GameState({int(k): v for k, v in json['usernames_by_player'].items()}, decks_by_player_json, json['lane_reward_names'], seed=server_state_json.get('seed'))
         game_state.lanes = [Lane.from_json(lane_json) for lane_json in json['lanes']]
         game_state.turn = json['turn']
         game_state.hands_by_player = {int(player_num): [Card.from_json(card_json) for card_json in json['hands_by_player'][player_num]] for player_num in json['hands_by_player']}
@@ -313,8 +428,43 @@ class GameState:
         game_state.winner = json.get('winner')
         game_state.last_timer_start = json.get('last_timer_start')
         game_state.cards_ever_drawn_by_player = {int(k): v for k, v in json['cards_ever_drawn_by_player'].items()}
+        game_state.replay_events = server_state_json.get('replay_events') or []
+        if server_state_json.get('rng_state') is not None:
+            game_state.rng = rng_from_json(server_state_json['rng_state'])
+        # Games saved before ids were allocated per game have random ids, which can't collide with counted ones
+        game_state.id_allocator = id_allocator_from_json(server_state_json.get('next_entity_id', 0))
 
         return game_state
     
     def copy(self):
-        return GameState.from_json(self.to_json())
\ No newline at end of file
+        game_state = GameState.from_json(self.to_json(), self.server_state_to_json())
+        game_state.headless = self.headless
+        return game_state
+
+    def clone(self) -> 'GameState':
+        # Copies only mutable state; card templates, lane rewards and decks are shared with the original
+        game_state = GameState.__new__(GameState)
+        game_state.headless = self.headless
+        game_state.seed = self.seed
+        game_state.rng = random.Random()
+        game_state.rng.setstate(self.rng.getstate())
+        game_state.id_allocator = self.id_allocator.clone()
+        game_state.lane_reward_names = self.lane_reward_names
+        game_state.lanes = [lane.clone() for lane in self.lanes]
+        game_state.turn = self.turn
+        game_state.usernames_by_player = self.usernames_by_player
+        game_state.hands_by_player = {player_num: [card.clone() for card in hand] for player_num, hand in self.hands_by_player.items()}
+        game_state.draw_piles_by_player = {player_num: [card.clone() for card in draw_pile] for player_num, draw_pile in self.draw_piles_by_player.items()}
+        game_state.player_0_hand, game_state.player_1_hand = game_state.hands_by_player[0], game_state.hands_by_player[1]
+        game_state.player_0_draw_pile, game_state.player_1_draw_pile = game_state.draw_piles_by_player[0], game_state.draw_piles_by_player[1]
+        game_state.has_moved_by_player = self.has_moved_by_player.copy()
+        game_state.has_mulliganed_by_player = self.has_mulliganed_by_player.copy()
+        game_state.done_with_animations_by_player = self.done_with_animations_by_player.copy()
+        game_state.log = self.log[:]
+        game_state.mana_by_player = self.mana_by_player.copy()
+        game_state.decks_by_player = self.decks_by_player.copy()
+        game_state.winner = self.winner
+        game_state.last_timer_start = self.last_timer_start
+        game_state.cards_ever_drawn_by_player = {player_num: cards[:] for player_num, cards in self.cards_ever_drawn_by_player.items()}
+        game_state.replay_events = self.replay_events[:]
+        return game_state
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, String, func
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, func
 from sqlalchemy.orm import relationship
 from database import Base
 from sqlalchemy.dialects.postgresql import JSONB
@@ -18,6 +18,8 @@ class GameStateRecord(Base):
     player_0_username = Column(String)
     player_1_username = Column(String)
 
+    seed = Column(BigInteger)
+
     game_state = Column(JSONB)
     game_info = Column(JSONB, none_as_null=True)
 
@@ -0,0 +1,170 @@
+import json
+from typing import Any, Callable, Optional
+
+from redis.exceptions import ResponseError
+
+from game import Game
+from redis_utils import RedisTransaction, rget, rget_bytes, rget_json, rhget_bytes, rhget_json, rhgetall_json, rhset_json, rset_json, rtransaction
+from utils import LruCache, get_game_animations_redis_key, get_game_redis_key, get_game_version_redis_key
+
+
+GAME_EXPIRY_SECONDS = 24 * 60 * 60
+
+# Games are stored as a Redis hash. Endpoints that only flip one of these small game state flags
+# read and write just that field instead of the whole serialized game.
+HOT_GAME_STATE_FIELDS = ['has_moved_by_player', 'done_with_animations_by_player', 'last_timer_start']
+
+# Copies of values that only change when the whole game is written, so that the endpoints above don't need the whole game either
+GAME_SUMMARY_FIELDS = ['usernames_by_player', 'is_bot_by_player', 'seconds_per_turn']
+
+# Saved by GameState.server_state_to_json, which older games kept inside their game state
+SERVER_STATE_KEYS = ['seed', 'rng_state', 'next_entity_id', 'replay_events']
+
+GAME_CACHE_SIZE = 256
+
+# Deserialized games by id, each with the version of the stored game it matches. Every write to a game
+# increments its version in Redis, so a cached game is only used while no process has written the game since.
+GAME_CACHE = LruCache(GAME_CACHE_SIZE)
+
+
+def game_json_to_fields(game_json: dict) -> dict[str, Any]:
+    # The game, its game info and its game state each get their own field, so that rget_game_json_bytes
+    # can put them back together, with the hot fields, without parsing any of them
+    fields = {summary_field: game_json[summary_field] for summary_field in GAME_SUMMARY_FIELDS}
+    game_json = game_json.copy()
+    game_info_json = game_json.pop('game_info')
+    if game_info_json is not None:
+        game_state_json = game_info_json['game_state'].copy()
+        for hot_field in HOT_GAME_STATE_FIELDS:
+            fields[hot_field] = game_state_json.pop(hot_field)
+        fields['turn'] = game_state_json['turn']
+        if 'rng_state' in game_state_json:
+            # Saved before the server state was kept out of the game JSON
+            fields['server_state'] = {key: game_state_json.pop(key) for key in SERVER_STATE_KEYS if key in game_state_json}
+        # Animations live under their own key, written by rset_game when a turn produces them
+        fields['game_info'] = {key: value for key, value in game_info_json.items() if key not in ['animations', 'game_state']}
+        fields['game_state'] = game_state_json
+    fields['game'] = game_json
+    return fields
+
+
+def fields_to_game_json(fields: dict[str, Any]) -> dict:
+    game_json = fields['game']
+    if 'game_state' in fields:
+        game_json['game_info'] = {**fields['game_info'], 'game_state': {**fields['game_state'], **{hot_field: fields[hot_field] for hot_field in HOT_GAME_STATE_FIELDS}}}
+    elif 'game_info' not in game_json:
+        game_json['game_info'] = None
+    elif game_json['game_info'] is not None:
+        # Stored before the game info and game state had fields of their own
+        game_json['game_info']['game_state'].update({hot_field: fields[hot_field] for hot_field in HOT_GAME_STATE_FIELDS})
+    return game_json
+
+
+def add_json_object_members(raw_json_object: bytes, raw_members: list[tuple[str, bytes]]) -> bytes:
+    # Adds members to a serialized JSON object without parsing it; raw_json_object is always json.dumps of a dict
+    raw_body = raw_json_object.strip()[1:-1].strip()
+    return b'{' + b', '.join([*([raw_body] if raw_body else []), *[json.dumps(key).encode() + b': ' + raw_value for key, raw_value in raw_members]]) + b'}'
+
+
+def rget_game_json_and_server_state(game_id: str) -> tuple[Optional[dict], Optional[dict]]:
+    try:
+        fields = rhgetall_json(get_game_redis_key(game_id))
+    except ResponseError:
+        # Stored before games were kept as hashes, with the server state still inside the game state
+        return rget_json(get_game_redis_key(game_id)), None
+    return (fields_to_game_json(fields), fields.get('server_state')) if fields is not None else (None, None)
+
+
+def rget_game_json(game_id: str) -> Optional[dict]:
+    return rget_game_json_and_server_state(game_id)[0]
+
+
+def rget_game_json_bytes(game_id: str) -> Optional[bytes]:
+    # The game as it would be serialized, assembled from the stored JSON without parsing it
+    try:
+        raw_game, raw_game_info, raw_game_state, *raw_hot_values = rhget_bytes(get_game_redis_key(game_id), ['game', 'game_info', 'game_state', *HOT_GAME_STATE_FIELDS])
+    except ResponseError:
+        # Stored before games were kept as hashes, already the whole game
+        return rget_bytes(get_game_redis_key(game_id))
+    if raw_game is None:
+        return None
+    if raw_game_info is None or raw_game_state is None:
+        # Games that haven't started (or were stored before they had these fields) are small, so they're just parsed
+        return json.dumps(rget_game_json(game_id)).encode()
+    raw_game_state = add_json_object_members(raw_game_state, [(hot_field, raw_hot_value if raw_hot_value is not None else b'null') for hot_field, raw_hot_value in zip(HOT_GAME_STATE_FIELDS, raw_hot_values)])
+    raw_game_info = add_json_object_members(raw_game_info, [('game_state', raw_game_state)])
+    return add_json_object_members(raw_game, [('game_info', raw_game_info)])
+
+
+def rget_game(game_id: str) -> Optional[Game]:
+    # Callers mutate the game they get, so a cached game is handed out only once; the next write caches it again
+    cached = GAME_CACHE.pop(game_id)
+    if cached is not None:
+        version, game = cached
+        if rget(get_game_version_redis_key(game_id)) == str(version):
+            return game
+    game_json, server_state_json = rget_game_json_and_server_state(game_id)
+    return Game.from_json(game_json, server_state_json) if game_json is not None else None
+
+
+def rincr_game_version(game_id: str, transaction: RedisTransaction, callback: Callable[[int], None]) -> None:
+    transaction.pipeline.incr(get_game_version_redis_key(game_id))
+    transaction.on_result(callback)
+    transaction.pipeline.expire(get_game_version_redis_key(game_id), GAME_EXPIRY_SECONDS)
+
+
+def rset_game(game: Game, with_animations: bool = False, transaction: Optional[RedisTransaction] = None) -> None:
+    # with_animations is for the writes right after a game starts or a turn rolls, the only times new animations exist
+    if transaction is None:
+        with rtransaction() as transaction:
+            rset_game(game, with_animations=with_animations, transaction=transaction)
+        return
+
+    game_json = game.to_json()
+    if with_animations and game_json['game_info'] is not None:
+        rset_json(get_game_animations_redis_key(game.id, game_json['game_info']['animations_turn']), game_json['game_info']['animations'], ex=GAME_EXPIRY_SECONDS, transaction=transaction)
+    fields = game_json_to_fields(game_json)
+    if game.game_info is not None:
+        # Kept next to the game JSON rather than in it, since that is sent to clients as is
+        fields['server_state'] = game.server_state_to_json()
+    rhset_json(get_game_redis_key(game.id), fields, ex=GAME_EXPIRY_SECONDS, replace=True, transaction=transaction)
+    # Copied because the caller may keep changing the game after writing it
+    cached_game = game.clone()
+    rincr_game_version(game.id, transaction, lambda version: GAME_CACHE.set(game.id, (version, cached_game)))
+
+
+def rget_game_fields(game_id: str, fields: list[str]) -> Optional[dict[str, Any]]:
+    try:
+        return rhget_json(get_game_redis_key(game_id), fields)
+    except ResponseError:
+        game_json = rget_json(get_game_redis_key(game_id))
+        if game_json is None:
+            return None
+        # Rewritten as a hash so that the caller can update single fields
+        game_fields = game_json_to_fields(game_json)
+        rhset_json(get_game_redis_key(game_id), game_fields, ex=GAME_EXPIRY_SECONDS, replace=True)
+        return {field: game_fields.get(field) for field in fields}
+
+
+def rset_game_fields(game_id: str, values_by_field: dict[str, Any], transaction: Optional[RedisTransaction] = None) -> None:
+    if transaction is None:
+        with rtransaction() as transaction:
+            rset_game_fields(game_id, values_by_field, transaction=transaction)
+        return
+
+    rhset_json(get_game_redis_key(game_id), values_by_field, ex=GAME_EXPIRY_SECONDS, transaction=transaction)
+    rincr_game_version(game_id, transaction, lambda version: update_cached_game_fields(game_id, values_by_field, version))
+
+
+def update_cached_game_fields(game_id: str, values_by_field: dict[str, Any], version: int) -> None:
+    # If the cached game matches the version just before this write, no other write came in between,
+    # so applying the same fields brings it up to date
+    cached = GAME_CACHE.pop(game_id)
+    if cached is None or cached[0] != version - 1 or not set(values_by_field) <= set(HOT_GAME_STATE_FIELDS):
+        return
+    game = cached[1]
+    if game.game_info is None:
+        return
+    for field, value in values_by_field.items():
+        setattr(game.game_info.game_state, field, value.copy() if isinstance(value, dict) else value)
+    GAME_CACHE.set(game_id, (version, game))
@@ -2,101 +2,106 @@ from collections import defaultdict
 from typing import TYPE_CHECKING, Callable
 import random
 from typing import Optional
-from card_templates_list import CARD_TEMPLATES
 from character import Character
-from lane_rewards import LANE_REWARDS, LaneReward
+from lane_rewards import LANE_REWARD_OBJECTS
 from utils import basic_lane_animation, shuffled
 if TYPE_CHECKING:
     from game_state import GameState
 
 
+COMBAT_MODIFICATION_AURA_ABILITY_NAMES = ['FriendliesDealDamageEqualToCurrentHealth', 
+                                          'AttackersDontDealDamage', 
+                                          'MoreStrengthMeansDoubleDamage', 
+                                          'ShieldedCharactersDealExtraDamage', 
+                                          'FriendlyAttackersAreInvincibleWhileAttacking']
+
+# Engine events, and the abilities that make a character care about each of them
+TRIGGER_EVENT_ABILITY_NAMES = {
+    'draw_card': ['OnDrawCardPump'],
+    'discard_card': ['OnDiscardPump'],
+    'trigger_hit_tower': ['OnTriggerHitTowerPump', 'OnTriggerHitTowerBonusAttack'],
+    'trigger_kill_enemy': ['OnTriggerKillEnemyHealAndPumpSelf', 'OnTriggerKillEnemyBonusAttack'],
+    'friendly_heal': ['PumpOnFriendlyHeal', 'OnFriendlyHealPumpMyself'],
+    'character_moves_here': ['CharacterMovesHerePumps', 'CharacterMovesHereThatCharacterPumps', 'OnCharacterMoveHereMakeSpirit', 'OnCharacterMoveHereShackle'],
+    'friendly_character_death': ['OnFriendlyCharacterDeathHealFullyAndSwitchLanes'],
+}
+
+
 class Lane:
     def __init__(self, lane_number: int, lane_reward_str: str):
         self.damage_by_player: dict[int, int] = {0: 0, 1: 0}
         self.characters_by_player: dict[int, list[Character]] = {0: [], 1: []}
         self.lane_number = lane_number
         self.additional_combat_priority = 0
-        self.lane_reward = LaneReward.from_json(LANE_REWARDS[lane_reward_str])
+        self.lane_reward = LANE_REWARD_OBJECTS[lane_reward_str]
         self.earned_rewards_by_player: dict[int, bool] = {0: False, 1: False}
+        # Kept up to date as characters enter, leave or get silenced, so combat doesn't rescan the lane before every attack
+        self.combat_modification_auras: dict[int, defaultdict[str, int]] = {0: defaultdict(int), 1: defaultdict(int)}
+        # Characters here that have an ability for each event, in the same order as characters_by_player.
+        # Like characters_by_player, entering appends in place and leaving replaces the list, so a trigger
+        # loop in progress sees exactly the characters it would have seen looping over the whole lane.
+        # Silenced characters are dropped the next time the list is replaced; has_ability skips them until then.
+        self.trigger_subscribers: dict[int, dict[str, list[Character]]] = {player_num: {event: [] for event in TRIGGER_EVENT_ABILITY_NAMES} for player_num in [0, 1]}
+
+
+    def add_character(self, character: Character) -> None:
+        self.characters_by_player[character.owner_number].append(character)
+        self.update_combat_modification_auras(character, 1)
+        if not character.silenced:
+            for event, ability_names in TRIGGER_EVENT_ABILITY_NAMES.items():
+                if any(ability_name in character.template.abilities_by_name for ability_name in ability_names):
+                    self.trigger_subscribers[character.owner_number][event].append(character)
+
+
+    def remove_character(self, character: Character) -> None:
+        self.characters_by_player[character.owner_number] = [c for c in self.characters_by_player[character.owner_number] if c.id != character.id]
+        self.update_combat_modification_auras(character, -1)
+        self.trigger_subscribers[character.owner_number] = {event: [c for c in subscribers if c.id != character.id and not c.silenced]
+                                                            for event, subscribers in self.trigger_subscribers[character.owner_number].items()}
+
+
+    def subscribers_to(self, player_num: int, event: str) -> list[Character]:
+        return self.trigger_subscribers[player_num][event]
+
+
+    def recompute_trigger_subscribers(self) -> None:
+        self.trigger_subscribers = {player_num: {event: [character for character in self.characters_by_player[player_num]
+                                                         if not character.silenced and any(ability_name in character.template.abilities_by_name for ability_name in ability_names)]
+                                                 for event, ability_names in TRIGGER_EVENT_ABILITY_NAMES.items()}
+                                    for player_num in [0, 1]}
+
+
+    def update_combat_modification_auras(self, character: Character, sign: int) -> None:
+        if not character.silenced:
+            for ability in character.template.abilities:
+                if ability.name in COMBAT_MODIFICATION_AURA_ABILITY_NAMES:
+                    self.combat_modification_auras[character.owner_number][ability.name] += sign * (1 if ability.number is None else ability.number)
+
+
+    def recompute_combat_modification_auras(self) -> None:
+        self.combat_modification_auras = {0: defaultdict(int), 1: defaultdict(int)}
+        for player_num in [0, 1]:
+            for character in self.characters_by_player[player_num]:
+                self.update_combat_modification_auras(character, 1)
 
 
     def maybe_give_lane_reward(self, player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
         if not self.earned_rewards_by_player[player_num] and self.lane_reward.threshold is not None and self.damage_by_player[player_num] >= self.lane_reward.threshold:
-            early_animation = self.lane_reward.effect[0] in ['bonusAttackAllFriendlies', 'playAllCardsInHandForFree', 
-                                                             'healAllFriendlies', 'friendlyCharactersInThisLaneSwitchLanes']
+            early_animation = self.lane_reward.effect_handler.early_animation
             self.earned_rewards_by_player[player_num] = True
-            if early_animation:
+            if early_animation and not game_state.headless:
                 animations.append(basic_lane_animation(self.lane_number, game_state))
             self.give_lane_reward(player_num, game_state, log, animations)
-            if not early_animation:
+            if not early_animation and not game_state.headless:
                 animations.append(basic_lane_animation(self.lane_number, game_state))
 
 
     def give_lane_reward(self, player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
-        if self.lane_reward.effect[0] == 'pumpAllFriendlies':
-            for lane in game_state.lanes:
-                for character in lane.characters_by_player[player_num]:
-                    character.current_attack += self.lane_reward.effect[1]  # type: ignore
-                    character.current_health += self.lane_reward.effect[2]  # type: ignore
-                    character.max_health += self.lane_reward.effect[2]  # type: ignore
-        elif self.lane_reward.effect[0] == 'spawn':
-            lane_to_spawn_in = game_state.find_random_empty_slot_in_other_lane(self.lane_number, player_num)
-            if lane_to_spawn_in is not None:
-                character = Character(CARD_TEMPLATES[self.lane_reward.effect[1]], lane_to_spawn_in, player_num, game_state.usernames_by_player[player_num])  # type: ignore
-                lane_to_spawn_in.characters_by_player[player_num].append(character)
-                character.do_all_on_reveal(log, animations, game_state)
-        elif self.lane_reward.effect[0] == 'drawRandomCards':
-            for _ in range(self.lane_reward.effect[1]):  # type: ignore
-                game_state.draw_random_card(player_num)
-        elif self.lane_reward.effect[0] == 'bonusAttackAllFriendlies':
-            characters_to_bonus_attack = [*game_state.lanes[0].characters_by_player[player_num], *game_state.lanes[1].characters_by_player[player_num], *game_state.lanes[2].characters_by_player[player_num]]
-
-            for character in characters_to_bonus_attack:
-                character.make_bonus_attack(log, animations, game_state)
-
-
-        elif self.lane_reward.effect[0] == 'discardHand':
-            game_state.discard_all_cards(player_num)
-
-        elif self.lane_reward.effect[0] == 'gainMana':
-            game_state.mana_by_player[player_num] += self.lane_reward.effect[1]  # type: ignore
-
-        elif self.lane_reward.effect[0] == 'playAllCardsInHandForFree':
-            for card in game_state.hands_by_player[player_num]:
-                lane_to_play_in = game_state.find_random_empty_slot_in_other_lane(self.lane_number, player_num)
-                if lane_to_play_in is not None:
-                    character = game_state.play_card(player_num, card.id, lane_to_play_in.lane_number)
-                    if character is not None:
-                        character.do_all_on_reveal(log, animations, game_state)
-
-        elif self.lane_reward.effect[0] == 'pumpRandomCharacterInAnotherLane':
-            lanes_to_find_characters_in = [lane for lane in game_state.lanes if not lane.lane_number == self.lane_number]
-            
-            if len(lanes_to_find_characters_in) > 0:
-                possible_characters_to_pump = [*lanes_to_find_characters_in[0].characters_by_player[player_num], *lanes_to_find_characters_in[1].characters_by_player[player_num]]
-                if len(possible_characters_to_pump) > 0:
-                    character_to_pump = random.choice(possible_characters_to_pump)
-
-                    character_to_pump.current_attack += self.lane_reward.effect[1]  # type: ignore
-                    character_to_pump.current_health += self.lane_reward.effect[2]  # type: ignore
-                    character_to_pump.max_health += self.lane_reward.effect[2]  # type: ignore
-
-        elif self.lane_reward.effect[0] == 'healAllFriendlies':
-            for lane in game_state.lanes:
-                for character in lane.characters_by_player[player_num]:
-                    character.fully_heal()
-
-        elif self.lane_reward.effect[0] == 'friendlyCharactersInThisLaneSwitchLanes':
-            for character in self.characters_by_player[player_num]:
-                character.switch_lanes(log, animations, game_state)
+        self.lane_reward.effect_handler.on_threshold(self, player_num, game_state, log, animations)
 
 
     def do_start_of_game(self, log: list[str], animations: list, game_state: 'GameState') -> None:
-        if self.lane_reward.effect[0] == 'spawnAtStart':
-            for player_num in [0, 1]:
-                for _ in range(self.lane_reward.effect[2]):  # type: ignore
-                    character = Character(CARD_TEMPLATES[self.lane_reward.effect[1]], self, player_num, game_state.usernames_by_player[player_num])  # type: ignore
-                    self.characters_by_player[player_num].append(character)
+        self.lane_reward.effect_handler.on_start_of_game(self, game_state)
         self.do_start_of_turn(log, animations, game_state)
         self.do_end_of_turn(log, animations, game_state)
 
@@ -109,7 +114,7 @@ class Lane:
 
         characters_to_do_on_reveal = [*[character for character in self.characters_by_player[0] if not character.did_on_reveal], 
                                       *[character for character in self.characters_by_player[1] if not character.did_on_reveal]]
-        random.shuffle(characters_to_do_on_reveal)
+        game_state.rng.shuffle(characters_to_do_on_reveal)
 
         for character in characters_to_do_on_reveal:
             character.do_very_early_on_reveal(log, animations, game_state)
@@ -139,25 +144,7 @@ class Lane:
             for character in self.characters_by_player[player_num]:
                 character.do_end_of_turn(log, animations, game_state)
 
-        if self.lane_reward.effect[0] == 'healAllCharactersHereAtEndOfTurn':
-            for character in [*self.characters_by_player[0], *self.characters_by_player[1]]:
-                character.fully_heal()
-            if game_state.turn > 1:
-                animations.append(basic_lane_animation(self.lane_number, game_state))
-
-        if self.lane_reward.effect[0] == 'dealDamageToAllCharactersHereAtEndOfTurn':
-            for character in [*self.characters_by_player[0], *self.characters_by_player[1]]:
-                character.sustain_damage(self.lane_reward.effect[1], log, animations, game_state)  # type: ignore
-            if game_state.turn > 1:
-                animations.append(basic_lane_animation(self.lane_number, game_state))
-
-            self.process_dying_characters(log, animations, game_state)
-
-        if self.lane_reward.effect[0] == 'firstCharacterSwitchesLanesAtEndOfTurn':
-            for player_num in [0, 1]:
-                if len(self.characters_by_player[player_num]) > 0:
-                    character_to_switch = self.characters_by_player[player_num][0]
-                    character_to_switch.switch_lanes(log, animations, game_state)
+        self.lane_reward.effect_handler.on_end_of_turn(self, game_state, log, animations)
 
 
     def resolve_combat(self, 
@@ -177,24 +164,23 @@ class Lane:
                              log: list[str], 
                              animations: list,
                              game_state: 'GameState',
-                             first_strikers_only: bool = False,
-                             attacking_player: Optional[int] = None) -> None:
-        if attacking_player is None:
-            # The player with more characters attacks first
-            player_0_characters = [c for c in self.characters_by_player[0] if not first_strikers_only or c.has_ability('EarlyFighter')]
-            player_1_characters = [c for c in self.characters_by_player[1] if not first_strikers_only or c.has_ability('EarlyFighter')]
-
-            attacking_player = (0 if len(player_0_characters) > len(player_1_characters)
-                                else 1 if len(player_1_characters) > len(player_0_characters) 
-                                else random.randint(0, 1))
-        self.player_single_attack(attacking_player, done_attacking_by_player, log, animations, game_state, first_strikers_only=first_strikers_only)
-        if done_attacking_by_player[1 - attacking_player]:
-            if done_attacking_by_player[attacking_player]:
-                return
+                             first_strikers_only: bool = False) -> None:
+        # The player with more characters attacks first
+        player_0_characters = [c for c in self.characters_by_player[0] if not first_strikers_only or c.has_ability('EarlyFighter')]
+        player_1_characters = [c for c in self.characters_by_player[1] if not first_strikers_only or c.has_ability('EarlyFighter')]
+
+        attacking_player = (0 if len(player_0_characters) > len(player_1_characters)
+                            else 1 if len(player_1_characters) > len(player_0_characters) 
+                            else game_state.rng.randint(0, 1))
+
+        # Players alternate attacks until one is done, then the other attacks until they're done too
+        while True:
+            self.player_single_attack(attacking_player, done_attacking_by_player, log, animations, game_state, first_strikers_only=first_strikers_only)
+            if done_attacking_by_player[1 - attacking_player]:
+                if done_attacking_by_player[attacking_player]:
+                    return
             else:
-                self.resolve_combat_inner(done_attacking_by_player, log, animations, game_state, first_strikers_only=first_strikers_only, attacking_player=attacking_player)
-        else:
-            self.resolve_combat_inner(done_attacking_by_player, log, animations, game_state, first_strikers_only=first_strikers_only, attacking_player=1 - attacking_player)
+                attacking_player = 1 - attacking_player
 
 
     def process_dying_characters(self, log: list[str], animations: list, game_state: 'GameState') -> None:
@@ -204,8 +190,8 @@ class Lane:
 
         for dying_character in dying_characters:
             was_saved = False
-            for lane in shuffled([lane for lane in game_state.lanes if not lane.lane_number == self.lane_number]):
-                for character in lane.characters_by_player[dying_character.owner_number]:
+            for lane in shuffled([lane for lane in game_state.lanes if not lane.lane_number == self.lane_number], game_state.rng):
+                for character in lane.subscribers_to(dying_character.owner_number, 'friendly_character_death'):
                     if character.has_ability('OnFriendlyCharacterDeathHealFullyAndSwitchLanes'):
                         if dying_character.switch_lanes(log, animations, game_state, lane_number=lane.lane_number, and_fully_heal_if_switching=True):
                             was_saved = True
@@ -216,18 +202,17 @@ class Lane:
                     dying_character.escaped_death = True      
             
             if not dying_character.escaped_death and not was_saved:
-                if dying_character.lane.lane_reward.effect[0] == 'ownerGainsManaNextTurnWhenCharacterDiesHere':
-                    game_state.mana_by_player[dying_character.owner_number] += dying_character.lane.lane_reward.effect[1]  # type: ignore
+                dying_character.lane.lane_reward.effect_handler.on_death_here(dying_character, game_state)
 
                 truly_dead_characters.append(dying_character)
 
-        for player_num in self.characters_by_player:
-            self.characters_by_player[player_num] = [character for character in self.characters_by_player[player_num] if character.current_health > 0]
+        for character in [character for character in self.characters_by_player[0] + self.characters_by_player[1] if character.current_health <= 0]:
+            self.remove_character(character)
 
         for dead_character in truly_dead_characters:
             if dead_character.has_ability('DeathMoveCharactersHereAndPumpThem'):
                 friendly_characters_not_in_this_lane = [character for character in [*game_state.lanes[0].characters_by_player[dead_character.owner_number], *game_state.lanes[1].characters_by_player[dead_character.owner_number], *game_state.lanes[2].characters_by_player[dead_character.owner_number]] if not character.lane.lane_number == self.lane_number]
-                random.shuffle(friendly_characters_not_in_this_lane)
+                game_state.rng.shuffle(friendly_characters_not_in_this_lane)
 
                 for character_to_switch in friendly_characters_not_in_this_lane:
                     if len(self.characters_by_player[dead_character.owner_number]) < 4:
@@ -238,25 +223,8 @@ class Lane:
 
 
     def compute_combat_modification_auras(self) -> dict[int, defaultdict[str, int]]:
-        combat_modification_auras = {
-            0: defaultdict(int),
-            1: defaultdict(int),
-        }
-
-        aura_ability_names = ['FriendliesDealDamageEqualToCurrentHealth', 
-                              'AttackersDontDealDamage', 
-                              'MoreStrengthMeansDoubleDamage', 
-                              'ShieldedCharactersDealExtraDamage', 
-                              'FriendlyAttackersAreInvincibleWhileAttacking']
-
-        for player_num in [0, 1]:
-            for character in self.characters_by_player[player_num]:
-                if not character.silenced:
-                    for ability in character.template.abilities:
-                        if ability.name in aura_ability_names:
-                            combat_modification_auras[player_num][ability.name] += 1 if ability.number is None else ability.number
-
-        return combat_modification_auras
+        # A snapshot, so that characters entering or leaving mid-attack don't change the auras that attack sees
+        return {player_num: self.combat_modification_auras[player_num].copy() for player_num in [0, 1]}
 
 
     def player_single_attack(self, 
@@ -285,13 +253,13 @@ class Lane:
         self.process_dying_characters(log, animations, game_state)
 
 
-    def get_random_enemy_character(self, player_num: int, exclude_characters: Optional[Callable] = None) -> Optional[Character]:
+    def get_random_enemy_character(self, player_num: int, rng: random.Random, exclude_characters: Optional[Callable] = None) -> Optional[Character]:
         characters_available = [character for character in self.characters_by_player[1 - player_num] if character.can_fight() and (exclude_characters is None or not exclude_characters(character))]
-        return random.choice(characters_available) if len(characters_available) > 0 else None
+        return rng.choice(characters_available) if len(characters_available) > 0 else None
 
-    def get_random_friendly_character(self, player_num: int, exclude_characters: Optional[Callable] = None) -> Optional[Character]:
+    def get_random_friendly_character(self, player_num: int, rng: random.Random, exclude_characters: Optional[Callable] = None) -> Optional[Character]:
         characters_available = [character for character in self.characters_by_player[player_num] if character.can_fight() and (exclude_characters is None or not exclude_characters(character))]
-        return random.choice(characters_available) if len(characters_available) > 0 else None
+        return rng.choice(characters_available) if len(characters_available) > 0 else None
 
 
     def compute_winner(self) -> Optional[int]:
@@ -312,10 +280,33 @@ class Lane:
             "earned_rewards_by_player": self.earned_rewards_by_player.copy(),
         }
 
+    def canonical_key(self) -> tuple:
+        return (
+            self.lane_reward.name,
+            self.additional_combat_priority,
+            tuple(self.damage_by_player[player_num] for player_num in [0, 1]),
+            tuple(self.earned_rewards_by_player[player_num] for player_num in [0, 1]),
+            tuple(tuple(sorted(character.canonical_key() for character in self.characters_by_player[player_num])) for player_num in [0, 1]),
+        )
+
+    def clone(self) -> 'Lane':
+        lane = Lane.__new__(Lane)
+        lane.damage_by_player = self.damage_by_player.copy()
+        lane.characters_by_player = {player_num: [character.clone(lane) for character in characters] for player_num, characters in self.characters_by_player.items()}
+        lane.lane_number = self.lane_number
+        lane.additional_combat_priority = self.additional_combat_priority
+        lane.lane_reward = self.lane_reward
+        lane.earned_rewards_by_player = self.earned_rewards_by_player.copy()
+        lane.combat_modification_auras = {player_num: auras.copy() for player_num, auras in self.combat_modification_auras.items()}
+        lane.recompute_trigger_subscribers()
+        return lane
+
     @staticmethod
     def from_json(json):
         lane = Lane(json["lane_number"], json["lane_reward"]["name"])
         lane.damage_by_player = {int(k): v for k, v in json["damage_by_player"].items()}
         lane.characters_by_player = {int(player): [Character.from_json(character, lane) for character in json["characters_by_player"][player]] for player in json["characters_by_player"]}
         lane.earned_rewards_by_player = {int(k): v for k, v in json["earned_rewards_by_player"].items()}
+        lane.recompute_combat_modification_auras()
+        lane.recompute_trigger_subscribers()
         return lane
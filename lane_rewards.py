@@ -1,4 +1,10 @@
-from typing import Union
+from typing import TYPE_CHECKING, Union
+from card_templates_list import CARD_TEMPLATES
+from character import Character
+from utils import basic_lane_animation
+if TYPE_CHECKING:
+    from lane import Lane
+    from game_state import GameState
 
 
 LANE_REWARDS = {reward['name']: {**reward, 'priority': i} for i, reward in enumerate([
@@ -160,6 +166,204 @@ LANE_REWARDS = {reward['name']: {**reward, 'priority': i} for i, reward in enume
     },
 ])}
 
+
+class LaneRewardEffect:
+    # Base effect: every hook is a no-op, so each effect only overrides the hooks it cares about
+    early_animation = False
+    fights_as_attackers = False
+
+    def __init__(self, effect: list[Union[str, int]]):
+        self.effect = effect
+        self.played_here_attack_buff = 0
+        self.played_here_health_buff = 0
+
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        pass
+
+    def on_start_of_game(self, lane: 'Lane', game_state: 'GameState') -> None:
+        pass
+
+    def on_end_of_turn(self, lane: 'Lane', game_state: 'GameState', log: list[str], animations: list) -> None:
+        pass
+
+    def on_death_here(self, dying_character: Character, game_state: 'GameState') -> None:
+        pass
+
+    def on_character_revealed_here(self, character: Character, game_state: 'GameState', animations: list) -> None:
+        pass
+
+
+class PumpAllFriendliesEffect(LaneRewardEffect):
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        for other_lane in game_state.lanes:
+            for character in other_lane.characters_by_player[player_num]:
+                character.current_attack += self.effect[1]  # type: ignore
+                character.current_health += self.effect[2]  # type: ignore
+                character.max_health += self.effect[2]  # type: ignore
+
+
+class SpawnEffect(LaneRewardEffect):
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        lane_to_spawn_in = game_state.find_random_empty_slot_in_other_lane(lane.lane_number, player_num)
+        if lane_to_spawn_in is not None:
+            character = Character(CARD_TEMPLATES[self.effect[1]], lane_to_spawn_in, player_num, game_state.usernames_by_player[player_num], game_state.id_allocator.allocate())  # type: ignore
+            lane_to_spawn_in.add_character(character)
+            character.do_all_on_reveal(log, animations, game_state)
+
+
+class DrawRandomCardsEffect(LaneRewardEffect):
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        for _ in range(self.effect[1]):  # type: ignore
+            game_state.draw_random_card(player_num)
+
+
+class BonusAttackAllFriendliesEffect(LaneRewardEffect):
+    early_animation = True
+
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        characters_to_bonus_attack = [*game_state.lanes[0].characters_by_player[player_num], *game_state.lanes[1].characters_by_player[player_num], *game_state.lanes[2].characters_by_player[player_num]]
+
+        for character in characters_to_bonus_attack:
+            character.make_bonus_attack(log, animations, game_state)
+
+
+class DiscardHandEffect(LaneRewardEffect):
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        game_state.discard_all_cards(player_num)
+
+
+class GainManaEffect(LaneRewardEffect):
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        game_state.mana_by_player[player_num] += self.effect[1]  # type: ignore
+
+
+class PlayAllCardsInHandForFreeEffect(LaneRewardEffect):
+    early_animation = True
+
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        for card in game_state.hands_by_player[player_num]:
+            lane_to_play_in = game_state.find_random_empty_slot_in_other_lane(lane.lane_number, player_num)
+            if lane_to_play_in is not None:
+                character = game_state.play_card(player_num, card.id, lane_to_play_in.lane_number, record_replay_event=False)
+                if character is not None:
+                    character.do_all_on_reveal(log, animations, game_state)
+
+
+class PumpRandomCharacterInAnotherLaneEffect(LaneRewardEffect):
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        lanes_to_find_characters_in = [other_lane for other_lane in game_state.lanes if not other_lane.lane_number == lane.lane_number]
+
+        if len(lanes_to_find_characters_in) > 0:
+            possible_characters_to_pump = [*lanes_to_find_characters_in[0].characters_by_player[player_num], *lanes_to_find_characters_in[1].characters_by_player[player_num]]
+            if len(possible_characters_to_pump) > 0:
+                character_to_pump = game_state.rng.choice(possible_characters_to_pump)
+
+                character_to_pump.current_attack += self.effect[1]  # type: ignore
+                character_to_pump.current_health += self.effect[2]  # type: ignore
+                character_to_pump.max_health += self.effect[2]  # type: ignore
+
+
+class HealAllFriendliesEffect(LaneRewardEffect):
+    early_animation = True
+
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        for other_lane in game_state.lanes:
+            for character in other_lane.characters_by_player[player_num]:
+                character.fully_heal()
+
+
+class FriendlyCharactersInThisLaneSwitchLanesEffect(LaneRewardEffect):
+    early_animation = True
+
+    def on_threshold(self, lane: 'Lane', player_num: int, game_state: 'GameState', log: list[str], animations: list) -> None:
+        for character in lane.characters_by_player[player_num]:
+            character.switch_lanes(log, animations, game_state)
+
+
+class SpawnAtStartEffect(LaneRewardEffect):
+    def on_start_of_game(self, lane: 'Lane', game_state: 'GameState') -> None:
+        for player_num in [0, 1]:
+            for _ in range(self.effect[2]):  # type: ignore
+                character = Character(CARD_TEMPLATES[self.effect[1]], lane, player_num, game_state.usernames_by_player[player_num], game_state.id_allocator.allocate())  # type: ignore
+                lane.add_character(character)
+
+
+class PumpAllCharactersPlayedHereEffect(LaneRewardEffect):
+    def __init__(self, effect: list[Union[str, int]]):
+        super().__init__(effect)
+        self.played_here_attack_buff = effect[1]
+        self.played_here_health_buff = effect[2]
+
+
+class PumpAllCharactersPlayedHereWhenFilledEffect(LaneRewardEffect):
+    def on_character_revealed_here(self, character: Character, game_state: 'GameState', animations: list) -> None:
+        if len(character.lane.characters_by_player[character.owner_number]) >= 4:
+            for friendly_character in character.lane.characters_by_player[character.owner_number]:
+                friendly_character.current_attack += self.effect[1]  # type: ignore
+                friendly_character.current_health += self.effect[2]  # type: ignore
+                friendly_character.max_health += self.effect[2]  # type: ignore
+
+            if not game_state.headless:
+                animations.append(basic_lane_animation(character.lane.lane_number, game_state))
+
+
+class HealAllCharactersHereAtEndOfTurnEffect(LaneRewardEffect):
+    def on_end_of_turn(self, lane: 'Lane', game_state: 'GameState', log: list[str], animations: list) -> None:
+        for character in [*lane.characters_by_player[0], *lane.characters_by_player[1]]:
+            character.fully_heal()
+        if game_state.turn > 1 and not game_state.headless:
+            animations.append(basic_lane_animation(lane.lane_number, game_state))
+
+
+class DealDamageToAllCharactersHereAtEndOfTurnEffect(LaneRewardEffect):
+    def on_end_of_turn(self, lane: 'Lane', game_state: 'GameState', log: list[str], animations: list) -> None:
+        for character in [*lane.characters_by_player[0], *lane.characters_by_player[1]]:
+            character.sustain_damage(self.effect[1], log, animations, game_state)  # type: ignore
+        if game_state.turn > 1 and not game_state.headless:
+            animations.append(basic_lane_animation(lane.lane_number, game_state))
+
+        lane.process_dying_characters(log, animations, game_state)
+
+
+class FirstCharacterSwitchesLanesAtEndOfTurnEffect(LaneRewardEffect):
+    def on_end_of_turn(self, lane: 'Lane', game_state: 'GameState', log: list[str], animations: list) -> None:
+        for player_num in [0, 1]:
+            if len(lane.characters_by_player[player_num]) > 0:
+                character_to_switch = lane.characters_by_player[player_num][0]
+                character_to_switch.switch_lanes(log, animations, game_state)
+
+
+class CharactersHereFightAsAttackersEffect(LaneRewardEffect):
+    fights_as_attackers = True
+
+
+class OwnerGainsManaNextTurnWhenCharacterDiesHereEffect(LaneRewardEffect):
+    def on_death_here(self, dying_character: Character, game_state: 'GameState') -> None:
+        game_state.mana_by_player[dying_character.owner_number] += self.effect[1]  # type: ignore
+
+
+LANE_REWARD_EFFECTS: dict[str, type[LaneRewardEffect]] = {
+    'pumpAllFriendlies': PumpAllFriendliesEffect,
+    'spawn': SpawnEffect,
+    'drawRandomCards': DrawRandomCardsEffect,
+    'bonusAttackAllFriendlies': BonusAttackAllFriendliesEffect,
+    'discardHand': DiscardHandEffect,
+    'gainMana': GainManaEffect,
+    'playAllCardsInHandForFree': PlayAllCardsInHandForFreeEffect,
+    'pumpRandomCharacterInAnotherLane': PumpRandomCharacterInAnotherLaneEffect,
+    'healAllFriendlies': HealAllFriendliesEffect,
+    'friendlyCharactersInThisLaneSwitchLanes': FriendlyCharactersInThisLaneSwitchLanesEffect,
+    'spawnAtStart': SpawnAtStartEffect,
+    'pumpAllCharactersPlayedHere': PumpAllCharactersPlayedHereEffect,
+    'pumpAllCharactersPlayedHereWhenFilled': PumpAllCharactersPlayedHereWhenFilledEffect,
+    'healAllCharactersHereAtEndOfTurn': HealAllCharactersHereAtEndOfTurnEffect,
+    'dealDamageToAllCharactersHereAtEndOfTurn': DealDamageToAllCharactersHereAtEndOfTurnEffect,
+    'firstCharacterSwitchesLanesAtEndOfTurn': FirstCharacterSwitchesLanesAtEndOfTurnEffect,
+    'charactersHereFightAsAttackers': CharactersHereFightAsAttackersEffect,
+    'ownerGainsManaNextTurnWhenCharacterDiesHere': OwnerGainsManaNextTurnWhenCharacterDiesHereEffect,
+}
+
+
 class LaneReward:
     def __init__(self, name: str, threshold: int, reward_description: str, effect: list[Union[str, int]], priority: int):
         self.name = name
@@ -167,6 +371,7 @@ class LaneReward:
         self.reward_description = reward_description
         self.effect = effect
         self.priority = priority
+        self.effect_handler = LANE_REWARD_EFFECTS.get(effect[0], LaneRewardEffect)(effect)  # type: ignore
 
     def to_json(self):
         return {
@@ -180,4 +385,7 @@ class LaneReward:
     @staticmethod
     def from_json(json: dict):
         return LaneReward(json["name"], json["threshold"], json["reward_description"], json["effect"], json["priority"])
-    
\ No newline at end of file
+
+
+# Lane rewards never change during a game, so every lane shares one LaneReward per name
+LANE_REWARD_OBJECTS = {lane_reward_name: LaneReward.from_json(lane_reward) for lane_reward_name, lane_reward in LANE_REWARDS.items()}
@@ -1,15 +1,20 @@
 import redis as r
-from typing import Optional, Any
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, Any
 from redis_lock import Lock
 import json
 
 redis = r.Redis(connection_pool=r.ConnectionPool(host='localhost', port=6379, db=11))
 
 def rget(key: str) -> Optional[str]:
-    raw_result = redis.get(key)
+    raw_result = rget_bytes(key)
     return raw_result.decode('utf-8') if raw_result is not None else None
 
 
+def rget_bytes(key: str) -> Optional[bytes]:
+    return redis.get(key)
+
+
 def can_be_inted(x):
     try:
         int(x)
@@ -29,16 +34,75 @@ def rget_json(key: str):
     return json.loads(raw_result, object_hook=jsonKeys2int) if raw_result is not None else None
 
 
-def rset(key: str, value: Any, ex: Optional[int] = None) -> None:
-    redis.set(key, value, ex=ex)
+class RedisTransaction:
+    # Writes queued on pipeline are sent as one MULTI/EXEC when the rtransaction block exits,
+    # so they cost a single round trip and other clients see all of them or none of them
+    def __init__(self) -> None:
+        self.pipeline = redis.pipeline(transaction=True)
+        self.result_callbacks: list[tuple[int, Callable[[Any], None]]] = []
+
+    def on_result(self, callback: Callable[[Any], None]) -> None:
+        # Calls callback with the result of the command queued most recently, once the transaction has run
+        self.result_callbacks.append((len(self.pipeline) - 1, callback))
+
+    def execute(self) -> None:
+        results = self.pipeline.execute()
+        for index, callback in self.result_callbacks:
+            callback(results[index])
+
+
+@contextmanager
+def rtransaction() -> Iterator[RedisTransaction]:
+    transaction = RedisTransaction()
+    try:
+        yield transaction
+        transaction.execute()
+    finally:
+        transaction.pipeline.reset()
+
+
+def rset(key: str, value: Any, ex: Optional[int] = None, transaction: Optional[RedisTransaction] = None) -> None:
+    (transaction.pipeline if transaction is not None else redis).set(key, value, ex=ex)
+
+
+def rset_json(key: str, value: Any, ex: Optional[int] = None, transaction: Optional[RedisTransaction] = None) -> None:
+    rset(key, json.dumps(value), ex=ex, transaction=transaction)
+
+
+def rdel(key: str, transaction: Optional[RedisTransaction] = None) -> None:
+    (transaction.pipeline if transaction is not None else redis).delete(key)
+
+
+def rhget_bytes(key: str, fields: list[str]) -> list[Optional[bytes]]:
+    return redis.hmget(key, fields)
+
+
+def rhget_json(key: str, fields: list[str]) -> Optional[dict[str, Any]]:
+    raw_values = rhget_bytes(key, fields)
+    if all(raw_value is None for raw_value in raw_values):
+        return None
+    return {field: json.loads(raw_value, object_hook=jsonKeys2int) if raw_value is not None else None for field, raw_value in zip(fields, raw_values)}
+
 
+def rhgetall_json(key: str) -> Optional[dict[str, Any]]:
+    raw_result = redis.hgetall(key)
+    if not raw_result:
+        return None
+    return {field.decode('utf-8'): json.loads(raw_value, object_hook=jsonKeys2int) for field, raw_value in raw_result.items()}
 
-def rset_json(key: str, value: Any, ex: Optional[int] = None) -> None:
-    rset(key, json.dumps(value), ex=ex)
 
+def rhset_json(key: str, values_by_field: dict[str, Any], ex: Optional[int] = None, replace: bool = False, transaction: Optional[RedisTransaction] = None) -> None:
+    # With replace, fields that aren't in values_by_field are dropped
+    if transaction is None:
+        with rtransaction() as transaction:
+            rhset_json(key, values_by_field, ex=ex, replace=replace, transaction=transaction)
+        return
 
-def rdel(key: str) -> None:
-    redis.delete(key)
+    if replace:
+        transaction.pipeline.delete(key)
+    transaction.pipeline.hset(key, mapping={field: json.dumps(value) for field, value in values_by_field.items()})
+    if ex is not None:
+        transaction.pipeline.expire(key, ex)
 
 
 def rlock(key: str):
@@ -0,0 +1,34 @@
+from unittest.mock import MagicMock
+
+import fakeredis
+import pytest
+
+import game_storage
+import redis_utils
+from deck import Deck
+from game import Game
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake_redis = fakeredis.FakeRedis()
+    monkeypatch.setattr(redis_utils, 'redis', fake_redis)
+    game_storage.GAME_CACHE.entries.clear()
+    yield fake_redis
+    game_storage.GAME_CACHE.entries.clear()
+
+
+@pytest.fixture
+def client(fake_redis, monkeypatch):
+    import app
+    # Rolling a turn records it in Postgres, which the tests don't need
+    monkeypatch.setattr(app, 'SessionLocal', MagicMock())
+    return app.app.test_client()
+
+
+def make_started_game(card_name: str = 'Foot Soldier') -> Game:
+    # Every card in both decks is the same one-mana card, so any card in hand can be played on the first turn
+    decks_by_player = {player_num: Deck([card_name] * 18, f'player_{player_num}', 'Test deck') for player_num in [0, 1]}
+    game = Game({0: 'player_0', 1: 'player_1'}, decks_by_player)  # type: ignore
+    game.start()
+    return game
@@ -0,0 +1,47 @@
+import json
+
+import game_state as game_state_module
+from card_templates_list import CARD_TEMPLATES
+from conftest import make_started_game
+from utils import compress_animations, expand_animations
+
+
+def test_expanded_animations_match_the_frames_before_compression(monkeypatch):
+    game = make_started_game()
+    assert game.game_info is not None
+    game_state = game.game_info.game_state
+    for player_num in [0, 1]:
+        game_state.play_card(player_num, game_state.hands_by_player[player_num][0].id, 0)
+    template_json_before = json.dumps(CARD_TEMPLATES['Foot Soldier'].to_json())
+
+    uncompressed_animations = []
+    compressed_animations = []
+    compress_animations = game_state_module.compress_animations
+    def record_and_compress_animations(animations):
+        # Recorded as JSON because to_json shares live lists (e.g. the log) that keep changing after the roll
+        uncompressed_animations.extend(json.loads(json.dumps(animations)))
+        compress_animations(animations)
+        compressed_animations.extend(json.loads(json.dumps(animations)))
+    monkeypatch.setattr(game_state_module, 'compress_animations', record_and_compress_animations)
+    game.game_info.roll_turn(None, game.id)  # type: ignore
+
+    assert len(compressed_animations) > 2 and 'game_state_patch' in compressed_animations[-1]
+    assert expand_animations(compressed_animations) == uncompressed_animations
+    # In memory the frames share the cached CardTemplate dicts, so patching them must leave the templates alone
+    animations = game.game_info.animations
+    assert json.loads(json.dumps(expand_animations(animations))) == expand_animations(json.loads(json.dumps(animations)))
+    assert json.dumps(CARD_TEMPLATES['Foot Soldier'].to_json()) == template_json_before
+
+
+def test_expanding_a_patch_to_a_shared_dict_changes_only_that_copy():
+    template_json = {'name': 'Foot Soldier', 'attack': 3}
+    animations = [
+        {'event_type': 'Play', 'game_state': {'hand': [template_json, template_json]}},
+        {'event_type': 'Transform', 'game_state': {'hand': [{'name': 'Foot Soldier', 'attack': 5}, template_json]}},
+    ]
+    compress_animations(animations)
+    assert animations[1]['game_state_patch'] == [['s', ['hand', 0, 'attack'], 5]]
+
+    expanded_animations = expand_animations(animations)
+    assert [[card['attack'] for card in animation['game_state']['hand']] for animation in expanded_animations] == [[3, 3], [5, 3]]
+    assert template_json['attack'] == 3
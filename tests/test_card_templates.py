@@ -0,0 +1,28 @@
+import json
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import card_template
+import card_templates_list
+from card_balance_change_record import CardBalanceChangeRecord
+from card_template import CardTemplate
+from card_templates_list import CARD_TEMPLATES, load_card_template_versions
+
+
+def test_older_template_versions_are_loaded_up_front(monkeypatch):
+    engine = create_engine('sqlite://')
+    CardBalanceChangeRecord.__table__.create(engine)  # type: ignore
+    session_maker = sessionmaker(bind=engine)
+    older_template_json = {**CARD_TEMPLATES['Foot Soldier'].to_json(), 'attack': 1}
+    with session_maker() as sess:
+        sess.add(CardBalanceChangeRecord(card='Foot Soldier', card_template_str=json.dumps(older_template_json)))
+        sess.commit()
+    monkeypatch.setattr(card_templates_list, 'SessionLocal', session_maker)
+    monkeypatch.setattr(card_template, 'CARD_TEMPLATES_BY_VERSION_ID', {})
+
+    load_card_template_versions()
+    # Deserializing only looks in the registry; the database is no longer reachable
+    monkeypatch.setattr(card_templates_list, 'SessionLocal', None)
+    assert CardTemplate.from_json({'name': 'Foot Soldier', 'template_version': 1}).attack == 1
+    assert CardTemplate.from_json({'name': 'Foot Soldier', 'template_version': 2}) is CARD_TEMPLATES['Foot Soldier']
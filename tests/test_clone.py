@@ -0,0 +1,54 @@
+import json
+import random
+
+import pytest
+
+from check_replays import make_sample_decks
+from conftest import make_started_game
+from game_state import GameState
+
+
+def snapshot(game_state: GameState) -> list:
+    return json.loads(json.dumps([game_state.to_json(), game_state.server_state_to_json()]))
+
+
+def play_random_turn(game_state: GameState, move_rng: random.Random) -> None:
+    for player_num in [0, 1]:
+        mana = game_state.mana_by_player[player_num]
+        for card in game_state.hands_by_player[player_num][:]:
+            if card.template.cost <= mana and game_state.play_card(player_num, card.id, move_rng.randint(0, 2)) is not None:
+                mana -= card.template.cost
+    game_state.record_replay_event(['roll'])
+    game_state.roll_turn([])
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_clone_matches_and_plays_on_like_the_original(seed):
+    random.seed(seed)
+    game_state = GameState({0: 'player_0', 1: 'player_1'}, make_sample_decks(), ['Fire Nation', 'Southern Air Temple', 'Full Moon Bay'], seed=seed)
+    game_state.do_start_of_game([])
+
+    while game_state.turn <= 8:
+        clone = game_state.clone()
+        assert snapshot(clone) == snapshot(game_state)
+        assert clone.canonical_key() == game_state.canonical_key()
+
+        original_snapshot = snapshot(game_state)
+        play_random_turn(clone, random.Random(game_state.turn))
+        assert snapshot(game_state) == original_snapshot
+
+        play_random_turn(game_state, random.Random(game_state.turn))
+        assert snapshot(clone) == snapshot(game_state)
+
+
+def test_game_clone_matches_the_original():
+    game = make_started_game()
+    clone = game.clone()
+    assert json.loads(json.dumps(clone.to_json())) == json.loads(json.dumps(game.to_json()))
+    assert clone.server_state_to_json() == game.server_state_to_json()
+
+    assert game.game_info is not None and clone.game_info is not None
+    original_json = json.loads(json.dumps(game.to_json()))
+    clone_game_state = clone.game_info.game_state
+    clone_game_state.play_card(0, clone_game_state.hands_by_player[0][0].id, 0)
+    assert json.loads(json.dumps(game.to_json())) == original_json
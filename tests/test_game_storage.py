@@ -0,0 +1,43 @@
+import json
+
+from conftest import make_started_game
+from game import Game
+from game_storage import GAME_CACHE, SERVER_STATE_KEYS, rget_game, rget_game_json_bytes, rset_game, rset_game_fields
+
+
+def test_server_state_is_stored_but_not_sent_to_clients(fake_redis):
+    game = make_started_game()
+    assert game.game_info is not None
+    game.game_info.game_state.mulligan_cards(0, [game.game_info.game_state.hands_by_player[0][0].id])
+    rset_game(game, with_animations=True)
+    GAME_CACHE.entries.clear()
+
+    game_json_bytes = rget_game_json_bytes(game.id)
+    assert game_json_bytes is not None
+    client_game_state_json = json.loads(game_json_bytes)['game_info']['game_state']
+    assert not set(SERVER_STATE_KEYS) & set(client_game_state_json)
+
+    loaded_game = rget_game(game.id)
+    assert loaded_game is not None
+    assert loaded_game.server_state_to_json() == json.loads(json.dumps(game.server_state_to_json()))
+
+
+def expected_client_json(game: Game) -> dict:
+    game_json = game.to_json()
+    if game_json['game_info'] is not None:
+        # Clients fetch animations separately
+        del game_json['game_info']['animations']
+    return json.loads(json.dumps(game_json))
+
+
+def test_served_bytes_match_the_game_json(fake_redis):
+    unstarted_game = Game({0: 'player_0', 1: None}, {0: None, 1: None})
+    game = make_started_game()
+    for game_to_store in [unstarted_game, game]:
+        rset_game(game_to_store, with_animations=True)
+        assert json.loads(rget_game_json_bytes(game_to_store.id)) == expected_client_json(game_to_store)  # type: ignore
+
+    assert game.game_info is not None
+    game.game_info.game_state.has_moved_by_player[1] = True
+    rset_game_fields(game.id, {'has_moved_by_player': game.game_info.game_state.has_moved_by_player})
+    assert json.loads(rget_game_json_bytes(game.id)) == expected_client_json(game)  # type: ignore
@@ -0,0 +1,36 @@
+import json
+import random
+
+import pytest
+
+from check_replays import comparable_json, play_sample_game, play_sample_game_over_http
+from deck import Deck
+from game_state import GameState
+
+
+def replay(game_state: GameState) -> GameState:
+    return GameState.from_replay(json.loads(json.dumps(game_state.replay_to_json())))
+
+
+@pytest.mark.parametrize('seed', range(10))
+def test_game_with_mulligans_replays_identically(seed):
+    game_state = play_sample_game(seed)
+    assert comparable_json(replay(game_state)) == comparable_json(game_state)
+
+
+@pytest.mark.parametrize('seed', range(6))
+def test_game_with_mulligans_through_the_api_replays_identically(seed):
+    # Covers the /mulligan and /mulligan_all endpoints and staged moves rolled by /submit_turn
+    game_state = play_sample_game_over_http(seed)
+    assert comparable_json(replay(game_state)) == comparable_json(game_state)
+
+
+def test_mulligan_uses_the_game_rng():
+    decks_by_player = {player_num: Deck(['Foot Soldier', 'Tyro', 'Cabbage Man', 'Southern Raider'] * 4, f'player_{player_num}', 'Test deck') for player_num in [0, 1]}
+    game_states = []
+    for global_seed in [1, 2]:
+        random.seed(global_seed)
+        game_state = GameState({0: 'player_0', 1: 'player_1'}, decks_by_player, ['Fire Nation', 'Southern Air Temple', 'Full Moon Bay'], seed=5)
+        game_state.mulligan_cards(0, [card.id for card in game_state.hands_by_player[0]])
+        game_states.append(game_state)
+    assert comparable_json(game_states[0]) == comparable_json(game_states[1])
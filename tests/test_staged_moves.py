@@ -0,0 +1,23 @@
+from conftest import make_started_game
+from game_storage import rget_game, rset_game
+
+
+def test_staged_move_is_played_when_the_turn_rolls(client):
+    game = make_started_game()
+    rset_game(game, with_animations=True)
+    assert game.game_info is not None
+    card = game.game_info.game_state.hands_by_player[0][0]
+    turn = game.game_info.game_state.turn
+
+    response = client.post(f'/api/games/{game.id}/play_card', json={'cardId': card.id, 'laneNumber': 0, 'playerNum': 0})
+    assert response.status_code == 200
+    for player_num in [0, 1]:
+        response = client.post(f'/api/games/{game.id}/submit_turn', json={'playerNum': player_num})
+        assert response.status_code == 200
+
+    rolled_game = rget_game(game.id)
+    assert rolled_game is not None and rolled_game.game_info is not None
+    game_state = rolled_game.game_info.game_state
+    assert game_state.turn == turn + 1
+    assert card.id not in [card_in_hand.id for card_in_hand in game_state.hands_by_player[0]]
+    assert 'player_0 played Foot Soldier in Lane 1.' in game_state.log
@@ -0,0 +1,59 @@
+import random
+
+import numpy as np
+import pytest
+
+from bot import assess_final_position, assess_final_positions_vectorized, get_random_play, randomly_play_forward_game_state_with_mana_amounts
+from card_templates_list import CARD_TEMPLATES
+from deck import Deck
+from game_state import GameState
+from lane_rewards import LANE_REWARDS
+from vectorized_rollouts import VECTORIZED_LANE_EFFECTS, VECTORIZED_THRESHOLD_EFFECTS, VectorizedRollouts, can_roll_out_vectorized
+
+GENERIC_CARD_NAMES = ['generic_1drop', 'generic_2drop', 'generic_3drop', 'generic_4drop']
+NUM_ROLLOUTS = 400
+# The seeds are fixed, so this is deterministic; a correct engine stays well inside it
+MAX_Z_SCORE = 4
+
+
+def make_vectorizable_game_state(seed: int) -> GameState:
+    # A position partway through a game of vanilla characters, with some of them not yet revealed
+    random.seed(seed)
+    supported_lane_reward_names = [name for name, lane_reward in LANE_REWARDS.items() if lane_reward['effect'][0] in VECTORIZED_LANE_EFFECTS | VECTORIZED_THRESHOLD_EFFECTS]
+    lane_reward_names = sorted(random.sample(supported_lane_reward_names, 3), key=lambda lane_reward_name: LANE_REWARDS[lane_reward_name]['priority'])
+    decks_by_player = {player_num: Deck(random.choices(GENERIC_CARD_NAMES, k=18), f'player_{player_num}', 'Test deck') for player_num in [0, 1]}
+    game_state = GameState({0: 'player_0', 1: 'player_1'}, decks_by_player, lane_reward_names, seed=seed)
+    game_state.do_start_of_game([])
+
+    num_turns = random.randint(1, 5)
+    while True:
+        for player_num in [0, 1]:
+            for _ in range(random.randint(0, 2)):
+                lane_number = game_state.get_random_lane_with_empty_slot(player_num)
+                if lane_number is not None:
+                    game_state.play_card_from_template(player_num, CARD_TEMPLATES[random.choice(GENERIC_CARD_NAMES)], lane_number)
+        if game_state.turn > num_turns:
+            return game_state
+        game_state.roll_turn([])
+
+
+def z_scores(object_values: np.ndarray, vectorized_values: np.ndarray) -> np.ndarray:
+    standard_error = np.sqrt(object_values.var(0) / len(object_values) + vectorized_values.var(0) / len(vectorized_values))
+    return (object_values.mean(0) - vectorized_values.mean(0)) / np.maximum(standard_error, 1e-9)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_vectorized_rollouts_agree_with_object_rollouts(seed):
+    game_state = make_vectorizable_game_state(seed)
+    assert can_roll_out_vectorized(game_state)
+    mana_amounts_by_player = {0: game_state.turn + 1, 1: game_state.turn}
+
+    final_game_states = [randomly_play_forward_game_state_with_mana_amounts(mana_amounts_by_player, game_state, rollout_seed) for rollout_seed in range(NUM_ROLLOUTS)]
+    rollouts = VectorizedRollouts(game_state, mana_amounts_by_player, NUM_ROLLOUTS, seed)
+    rollouts.play_forward(get_random_play)
+
+    object_damage = np.array([[[lane.damage_by_player[player_num] for player_num in [0, 1]] for lane in final_game_state.lanes] for final_game_state in final_game_states])
+    assert np.abs(z_scores(object_damage, rollouts.damage_by_player)).max() < MAX_Z_SCORE
+
+    object_assessments = np.array([assess_final_position(0, final_game_state) for final_game_state in final_game_states])
+    assert abs(z_scores(object_assessments, assess_final_positions_vectorized(0, rollouts))) < MAX_Z_SCORE
@@ -1,9 +1,11 @@
+from collections import OrderedDict
 from multiprocessing import Process, Queue
 import secrets
+import threading
 import random
 import math
 
-from typing import TYPE_CHECKING, Optional
+from typing import TYPE_CHECKING, Any, Hashable, Optional
 if TYPE_CHECKING:
     from game_state import GameState
 
@@ -17,6 +19,40 @@ def generate_unique_id():
     return secrets.token_hex(10)
 
 
+class IdAllocator:
+    # Random ids are unique across games; anything created outside a GameState (games, decks) uses these
+    def allocate(self) -> str:
+        return generate_unique_id()
+
+    def clone(self) -> 'IdAllocator':
+        return self
+
+    def to_json(self) -> Optional[int]:
+        return None
+
+
+class SequentialIdAllocator(IdAllocator):
+    # Card and character ids only need to be unique within their game, so they just count up.
+    # They aren't bare numbers, since rget_json would turn them into ints when they're used as keys (e.g. in staged moves).
+    def __init__(self, next_id: int = 0):
+        self.next_id = next_id
+
+    def allocate(self) -> str:
+        entity_id = f'e{self.next_id}'
+        self.next_id += 1
+        return entity_id
+
+    def clone(self) -> 'SequentialIdAllocator':
+        return SequentialIdAllocator(self.next_id)
+
+    def to_json(self) -> Optional[int]:
+        return self.next_id
+
+
+def id_allocator_from_json(next_id: Optional[int]) -> IdAllocator:
+    return SequentialIdAllocator(next_id) if next_id is not None else IdAllocator()
+
+
 def plural(x):
     return 's' if x != 1 else ''
 
@@ -29,11 +65,28 @@ def element_to_color(element):
         'Air': 'yellow',
     }[element]
 
-def shuffled(l):
+def shuffled(l, rng: random.Random = random):  # type: ignore
     l = l[:]
-    random.shuffle(l)
+    rng.shuffle(l)
     return l
 
+
+def generate_seed() -> int:
+    # Fits in a signed 64-bit column
+    return secrets.randbits(63)
+
+
+def rng_state_to_json(rng: random.Random) -> list:
+    version, internal_state, gauss_next = rng.getstate()
+    return [version, list(internal_state), gauss_next]
+
+
+def rng_from_json(rng_state_json: list) -> random.Random:
+    rng = random.Random()
+    version, internal_state, gauss_next = rng_state_json
+    rng.setstate((version, tuple(internal_state), gauss_next))
+    return rng
+
 def sigmoid(x):
     return 1 / (1 + math.exp(-x))
 
@@ -43,6 +96,13 @@ def get_game_redis_key(game_id):
 def get_game_with_hidden_information_redis_key(game_id):
     return f'game:{game_id}:hidden'
 
+def get_game_animations_redis_key(game_id, turn):
+    return f'game:{game_id}:animations:{turn}'
+
+def get_game_version_redis_key(game_id):
+    return f'game:{game_id}:version'
+
+
 def get_game_lock_redis_key(game_id):
     return f'game:{game_id}:lock'
 
@@ -81,6 +141,101 @@ def basic_lane_animation(lane_number: int, game_state: 'GameState') -> dict:
         "game_state": game_state.to_json(),
     }
 
+def compute_json_patch(old, new, path: Optional[list] = None, patch: Optional[list] = None) -> list:
+    # A patch is a list of operations: ['s', path, value] sets the value at path, and
+    # ['a', path, values] appends values to the list at path (e.g. new log lines).
+    if path is None:
+        path = []
+    if patch is None:
+        patch = []
+
+    if old == new:
+        return patch
+
+    if isinstance(old, dict) and isinstance(new, dict) and old.keys() == new.keys():
+        for key in new:
+            compute_json_patch(old[key], new[key], [*path, key], patch)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) == len(new):
+        for index in range(len(new)):
+            compute_json_patch(old[index], new[index], [*path, index], patch)
+    elif isinstance(old, list) and isinstance(new, list) and len(old) < len(new) and new[:len(old)] == old:
+        patch.append(['a', path, new[len(old):]])
+    else:
+        patch.append(['s', path, new])
+
+    return patch
+
+
+def copy_json(value):
+    # Unlike deepcopy, this doesn't keep shared references: game state JSON holds the same cached
+    # CardTemplate dict in several places, and patching one of them must not change the others.
+    if isinstance(value, dict):
+        return {key: copy_json(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [copy_json(child) for child in value]
+    return value
+
+
+def _get_json_child(container, key):
+    if isinstance(container, dict) and key not in container:
+        # JSON round trips turn integer keys into strings and vice versa
+        key = str(key) if not isinstance(key, str) else int(key)
+    return container[key], key
+
+
+def apply_json_patch(value, patch: list):
+    # Modifies value in place, so it must not share anything with other frames (see copy_json)
+    for op, path, op_value in patch:
+        if len(path) == 0:
+            if op == 's':
+                value = copy_json(op_value)
+            else:
+                value.extend(copy_json(op_value))
+            continue
+
+        container = value
+        for key in path[:-1]:
+            container, _ = _get_json_child(container, key)
+        key = path[-1]
+        if op == 's':
+            if isinstance(container, dict) and key not in container and str(key) in container:
+                key = str(key)
+            container[key] = copy_json(op_value)
+        else:
+            _get_json_child(container, key)[0].extend(copy_json(op_value))
+
+    return value
+
+
+def compress_animations(animations: list) -> None:
+    # Keep a full snapshot only in the first frame; every later frame stores a patch against the frame before it.
+    # expand_animations below undoes this, as does expandAnimations in frontend/src/utils.js for the client.
+    previous_game_state = None
+    for animation in animations:
+        if 'game_state' not in animation:
+            return
+        game_state = animation['game_state']
+        if previous_game_state is not None:
+            animation['game_state_patch'] = compute_json_patch(previous_game_state, game_state)
+            del animation['game_state']
+        previous_game_state = game_state
+
+
+def expand_animations(animations: list) -> list:
+    expanded_animations = []
+    game_state = None
+    for animation in animations:
+        if 'game_state' in animation:
+            game_state = animation['game_state']
+        else:
+            game_state = apply_json_patch(copy_json(game_state), animation['game_state_patch'])
+        expanded_animations.append({
+            **{k: v for k, v in animation.items() if k != 'game_state_patch'},
+            'game_state': game_state,
+        })
+    return expanded_animations
+
+
 def product(l):
     result = 1
     for x in l:
@@ -107,3 +262,32 @@ def run_with_timeout(func, timeout, *args, **kwargs):
         return None
 
     return queue.get()
+
+
+
+class LruCache:
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            return self.entries.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,262 @@
+from typing import Callable
+
+import numpy as np
+
+from card_template import ON_REVEAL_ABILITY_NAMES_BY_PHASE
+from card_templates_list import CARD_TEMPLATES
+from game_state import GameState
+
+
+SLOTS_PER_LANE = 4
+SLOTS = np.arange(SLOTS_PER_LANE)
+
+# Fields of the per-character array
+ATTACK = 0
+HEALTH = 1
+MAX_HEALTH = 2
+IS_ATTACKER = 3
+IS_DEFENDER = 4
+HAS_ATTACKED = 5
+SHACKLED_TURNS = 6
+UNREVEALED = 7
+NUM_CHARACTER_FIELDS = 8
+
+ON_REVEAL_ABILITY_NAMES = {ability_name for ability_names in ON_REVEAL_ABILITY_NAMES_BY_PHASE.values() for ability_name in ability_names}
+COMBAT_ABILITY_NAMES = {'Attacker', 'Defender'}
+
+# Threshold rewards that only touch the hand don't matter here, since rollouts only ever play generic cards
+VECTORIZED_THRESHOLD_EFFECTS = {'pumpAllFriendlies', 'healAllFriendlies', 'gainMana', 'drawRandomCards', 'discardHand'}
+VECTORIZED_LANE_EFFECTS = {
+    'spawnAtStart',
+    'pumpAllCharactersPlayedHere',
+    'pumpAllCharactersPlayedHereWhenFilled',
+    'healAllCharactersHereAtEndOfTurn',
+    'dealDamageToAllCharactersHereAtEndOfTurn',
+    'charactersHereFightAsAttackers',
+    'ownerGainsManaNextTurnWhenCharacterDiesHere',
+}
+
+
+def character_can_be_vectorized(character) -> bool:
+    if character.shielded:
+        return False
+    if character.silenced:
+        return True
+    other_ability_names = set(character.template.abilities_by_name) - COMBAT_ABILITY_NAMES
+    # On-reveal abilities do nothing once they've fired
+    return not other_ability_names or (character.did_on_reveal and other_ability_names <= ON_REVEAL_ABILITY_NAMES)
+
+
+def can_roll_out_vectorized(game_state: GameState) -> bool:
+    for lane in game_state.lanes:
+        if lane.additional_combat_priority != 0:
+            return False
+        effect_name = lane.lane_reward.effect[0]
+        if effect_name not in VECTORIZED_LANE_EFFECTS and effect_name not in VECTORIZED_THRESHOLD_EFFECTS:
+            if lane.lane_reward.threshold is None or not all(lane.earned_rewards_by_player.values()):
+                return False
+        for player_num in [0, 1]:
+            if len(lane.characters_by_player[player_num]) > SLOTS_PER_LANE:
+                return False
+            if not all(character_can_be_vectorized(character) for character in lane.characters_by_player[player_num]):
+                return False
+    return True
+
+
+class VectorizedRollouts:
+    # Plays many random continuations of one position in lock-step, one row per rollout. Only positions that pass
+    # can_roll_out_vectorized are supported: every character fights like a vanilla Attacker, Defender or plain character.
+    def __init__(self, game_state: GameState, mana_amounts_by_player: dict[int, int], num_rollouts: int, seed: int):
+        self.num_rollouts = num_rollouts
+        self.rng = np.random.default_rng(seed)
+        self.turn = game_state.turn
+        self.lane_rewards = [lane.lane_reward for lane in game_state.lanes]
+
+        characters = np.zeros((3, 2, SLOTS_PER_LANE, NUM_CHARACTER_FIELDS), dtype=np.int32)
+        counts = np.zeros((3, 2), dtype=np.int32)
+        for lane in game_state.lanes:
+            for player_num in [0, 1]:
+                counts[lane.lane_number, player_num] = len(lane.characters_by_player[player_num])
+                for slot, character in enumerate(lane.characters_by_player[player_num]):
+                    characters[lane.lane_number, player_num, slot] = [
+                        character.current_attack,
+                        character.current_health,
+                        character.max_health,
+                        character.has_ability('Attacker'),
+                        character.has_ability('Defender'),
+                        character.has_attacked,
+                        character.shackled_turns,
+                        not character.did_on_reveal,
+                    ]
+
+        self.characters = np.repeat(characters[None], num_rollouts, axis=0)
+        self.counts = np.repeat(counts[None], num_rollouts, axis=0)
+        self.damage_by_player = np.repeat(np.array([[lane.damage_by_player[player_num] for player_num in [0, 1]] for lane in game_state.lanes], dtype=np.int32)[None], num_rollouts, axis=0)
+        self.earned_rewards_by_player = np.repeat(np.array([[lane.earned_rewards_by_player[player_num] for player_num in [0, 1]] for lane in game_state.lanes])[None], num_rollouts, axis=0)
+        self.mana_by_player = np.repeat(np.array([mana_amounts_by_player[player_num] for player_num in [0, 1]], dtype=np.int32)[None], num_rollouts, axis=0)
+        self.all_rows = np.arange(num_rollouts)
+
+    def random_choice(self, options: np.ndarray) -> np.ndarray:
+        # Picks a uniformly random True index along the last axis of each row, or -1 for rows with no options
+        keys = self.rng.random(options.shape)
+        keys[~options] = -1
+        choices = keys.argmax(axis=-1)
+        choices[~options.any(axis=-1)] = -1
+        return choices
+
+    def play_forward(self, get_random_play: Callable[[int], list[str]]) -> None:
+        max_mana = 13
+        plays = [get_random_play(mana) for mana in range(max_mana + 1)]
+        play_templates = [CARD_TEMPLATES[card_name] for card_name in sorted({card_name for play in plays for card_name in play})]
+        template_index_by_name = {card_template.name: template_index for template_index, card_template in enumerate(play_templates)}
+        play_table = np.full((max_mana + 1, max(len(play) for play in plays)), -1)
+        for mana, play in enumerate(plays):
+            play_table[mana, :len(play)] = [template_index_by_name[card_name] for card_name in play]
+        template_characters = np.array([[card_template.attack, card_template.health, card_template.health, 'Attacker' in card_template.abilities_by_name,
+                                         'Defender' in card_template.abilities_by_name, False, 0, True] for card_template in play_templates], dtype=np.int32)
+
+        while self.turn < 10:
+            for player_num in [0, 1]:
+                template_indices_to_play = play_table[np.clip(self.mana_by_player[:, player_num], 0, max_mana)]
+                for template_indices in template_indices_to_play.T:
+                    lane_numbers = self.random_choice((self.counts[:, :, player_num] < SLOTS_PER_LANE) & (template_indices >= 0)[:, None])
+                    rows = np.nonzero(lane_numbers >= 0)[0]
+                    lane_numbers = lane_numbers[rows]
+                    self.characters[rows, lane_numbers, player_num, self.counts[rows, lane_numbers, player_num]] = template_characters[template_indices[rows]]
+                    self.counts[rows, lane_numbers, player_num] += 1
+            self.roll_turn()
+
+    def roll_turn(self) -> None:
+        self.mana_by_player[:] = self.turn + 1
+        for lane_number in range(3):
+            self.do_start_of_turn(lane_number)
+        for lane_number in range(3):
+            self.resolve_combat(lane_number)
+            shackled_turns = self.characters[:, lane_number, :, :, SHACKLED_TURNS]
+            np.maximum(shackled_turns - 1, 0, out=shackled_turns)
+        for lane_number in range(3):
+            self.do_end_of_turn(lane_number)
+        self.turn += 1
+
+    def do_start_of_turn(self, lane_number: int) -> None:
+        lane = self.characters[:, lane_number]
+        effect = self.lane_rewards[lane_number].effect
+        unrevealed = lane[..., UNREVEALED] == 1
+        if not unrevealed.any():
+            return
+
+        if effect[0] == 'pumpAllCharactersPlayedHere':
+            lane[..., ATTACK] += unrevealed * effect[1]
+            lane[..., HEALTH] += unrevealed * effect[2]
+            lane[..., MAX_HEALTH] += unrevealed * effect[2]
+        lane[..., HEALTH] = np.where(unrevealed, np.maximum(lane[..., HEALTH], 1), lane[..., HEALTH])
+        lane[..., MAX_HEALTH] = np.where(unrevealed, np.maximum(lane[..., MAX_HEALTH], 1), lane[..., MAX_HEALTH])
+        lane[..., ATTACK] = np.where(unrevealed, np.maximum(lane[..., ATTACK], 0), lane[..., ATTACK])
+
+        if effect[0] == 'pumpAllCharactersPlayedHereWhenFilled':
+            # Every character revealed into a full side pumps that whole side
+            num_pumps = np.where(self.counts[:, lane_number] >= SLOTS_PER_LANE, unrevealed.sum(axis=-1), 0)[..., None]
+            lane[..., ATTACK] += num_pumps * effect[1]
+            lane[..., HEALTH] += num_pumps * effect[2]
+            lane[..., MAX_HEALTH] += num_pumps * effect[2]
+
+        lane[..., UNREVEALED] = 0
+
+    def resolve_combat(self, lane_number: int) -> None:
+        counts = self.counts[:, lane_number]
+        attacking_players = np.where(counts[:, 0] > counts[:, 1], 0, np.where(counts[:, 1] > counts[:, 0], 1, self.rng.integers(0, 2, self.num_rollouts)))
+        done_attacking_by_player = np.zeros((self.num_rollouts, 2), dtype=bool)
+
+        rows = self.all_rows
+        while len(rows) > 0:
+            self.player_single_attack(lane_number, rows, attacking_players[rows], done_attacking_by_player)
+            other_player_done = done_attacking_by_player[rows, 1 - attacking_players[rows]]
+            this_player_done = done_attacking_by_player[rows, attacking_players[rows]]
+            attacking_players[rows] = np.where(other_player_done, attacking_players[rows], 1 - attacking_players[rows])
+            rows = rows[~(other_player_done & this_player_done)]
+
+    def player_single_attack(self, lane_number: int, rows: np.ndarray, attacking_players: np.ndarray, done_attacking_by_player: np.ndarray) -> None:
+        lane = self.characters[:, lane_number]
+        counts = self.counts[:, lane_number]
+        attackers = lane[rows, attacking_players]
+        can_attack = ((SLOTS < counts[rows, attacking_players][:, None]) & (attackers[..., HAS_ATTACKED] == 0)
+                      & (attackers[..., SHACKLED_TURNS] == 0) & (attackers[..., ATTACK] > 0))
+        attacks = can_attack.any(axis=1)
+        done_attacking_by_player[rows[~attacks], attacking_players[~attacks]] = True
+
+        rows = rows[attacks]
+        attacking_players = attacking_players[attacks]
+        defending_players = 1 - attacking_players
+        attacker_slots = can_attack[attacks].argmax(axis=1)
+        attackers = attackers[attacks, attacker_slots]
+        lane[rows, attacking_players, attacker_slots, HAS_ATTACKED] = 1
+
+        defending_characters = SLOTS < counts[rows, defending_players][:, None]
+        defenders = defending_characters & (lane[rows, defending_players, :, IS_DEFENDER] == 1)
+        has_defenders = defenders.any(axis=1)
+        is_attacker = (attackers[:, IS_ATTACKER] == 1) | self.lane_rewards[lane_number].effect_handler.fights_as_attackers
+        fights = has_defenders | (is_attacker & defending_characters.any(axis=1))
+
+        if not fights.all():
+            tower_rows = rows[~fights]
+            tower_players = attacking_players[~fights]
+            self.damage_by_player[tower_rows, lane_number, tower_players] += attackers[~fights, ATTACK]
+            self.maybe_give_lane_rewards(lane_number, tower_rows, tower_players)
+
+        if not fights.any():
+            return
+        fight_rows = rows[fights]
+        defending_players = defending_players[fights]
+        target_slots = self.random_choice(np.where(has_defenders[:, None], defenders, defending_characters)[fights])
+        lane[fight_rows, defending_players, target_slots, HEALTH] -= attackers[fights, ATTACK]
+        lane[fight_rows, attacking_players[fights], attacker_slots[fights], HEALTH] -= np.maximum(lane[fight_rows, defending_players, target_slots, ATTACK], 0)
+        self.process_dying_characters(lane_number, fight_rows)
+
+    def maybe_give_lane_rewards(self, lane_number: int, rows: np.ndarray, player_nums: np.ndarray) -> None:
+        lane_reward = self.lane_rewards[lane_number]
+        if lane_reward.threshold is None or len(rows) == 0:
+            return
+        earned = ~self.earned_rewards_by_player[rows, lane_number, player_nums] & (self.damage_by_player[rows, lane_number, player_nums] >= lane_reward.threshold)
+        rows = rows[earned]
+        player_nums = player_nums[earned]
+        self.earned_rewards_by_player[rows, lane_number, player_nums] = True
+
+        effect = lane_reward.effect
+        if effect[0] == 'pumpAllFriendlies':
+            self.characters[rows, :, player_nums, :, ATTACK] += effect[1]
+            self.characters[rows, :, player_nums, :, HEALTH] += effect[2]
+            self.characters[rows, :, player_nums, :, MAX_HEALTH] += effect[2]
+        elif effect[0] == 'healAllFriendlies':
+            self.characters[rows, :, player_nums, :, HEALTH] = self.characters[rows, :, player_nums, :, MAX_HEALTH]
+        elif effect[0] == 'gainMana':
+            self.mana_by_player[rows, player_nums] += effect[1]
+
+    def process_dying_characters(self, lane_number: int, rows: np.ndarray) -> None:
+        lane = self.characters[rows, lane_number]
+        in_lane = SLOTS < self.counts[rows, lane_number][..., None]
+        dying = in_lane & (lane[..., HEALTH] <= 0)
+        has_deaths = dying.any(axis=(1, 2))
+        if not has_deaths.any():
+            return
+
+        rows = rows[has_deaths]
+        surviving = in_lane[has_deaths] & ~dying[has_deaths]
+        effect = self.lane_rewards[lane_number].effect
+        if effect[0] == 'ownerGainsManaNextTurnWhenCharacterDiesHere':
+            self.mana_by_player[rows] += dying[has_deaths].sum(axis=-1) * effect[1]
+
+        # Survivors keep their order at the front of each side
+        order = np.argsort(~surviving, axis=-1, kind='stable')
+        self.characters[rows, lane_number] = np.take_along_axis(lane[has_deaths], order[..., None], axis=-2)
+        self.counts[rows, lane_number] = surviving.sum(axis=-1)
+
+    def do_end_of_turn(self, lane_number: int) -> None:
+        lane = self.characters[:, lane_number]
+        lane[..., HAS_ATTACKED] = 0
+
+        effect = self.lane_rewards[lane_number].effect
+        if effect[0] == 'healAllCharactersHereAtEndOfTurn':
+            lane[..., HEALTH] = lane[..., MAX_HEALTH]
+        elif effect[0] == 'dealDamageToAllCharactersHereAtEndOfTurn':
+            lane[..., HEALTH] -= effect[1]
+            self.process_dying_characters(lane_number, self.all_rows)